@@ -1,32 +1,90 @@
 # -*- coding: utf-8 -*-
 # Flask API：校友/毕业生管理系统（前后端分离版本）
-from flask import Flask, request, jsonify, session
+from flask import Flask, Response, g, request, session
 from flask_cors import CORS
-import pymysql.cursors
-from services.ai_query import ai_expand_query
+from services.ai_query import QueryExpander, set_default_expander
 from dotenv import load_dotenv
 import os
+import itertools
+import json
+import threading
+import time
 import init_db
 from werkzeug.security import generate_password_hash, check_password_hash
 
 load_dotenv()  # 让 .env 生效
 
+# =========================
+# 数据库连接（连接池）
+# =========================
+from services.db_pool import create_pool_from_env, TimedSSDictCursor
+db_pool = create_pool_from_env()
+
+def get_db_connection():
+    """从连接池借出一个连接，需配合 with 使用，块结束时自动归还"""
+    return db_pool.connection()
+
+# =========================
+# 大模型客户端与响应缓存
+# =========================
 from services.llm_client import LLMClient
-llm = LLMClient()
+from services import llm_client
+from services.kv_store import make_store
+from services.llm_cache import CachedLLMClient
+from services.read_cache import DbVersions
+from services import prompt_builder
+
+# LLM 响应缓存：LLM_CACHE_URL 为空时是进程内 LRU，设为 redis://... 时多个 worker 共享
+# 进程内缓存时标签版本号放在 MySQL 中，按标签失效（如校友资料变更）对所有 worker 生效
+_llm_store = make_store(os.getenv('LLM_CACHE_URL'), max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', 2000)),
+                        namespace='ams:llm')
+llm = CachedLLMClient(
+    LLMClient(),
+    _llm_store,
+    ttl=int(os.getenv('LLM_CACHE_TTL', 86400)),
+    versions=DbVersions(db_pool, memo_ttl=float(os.getenv('READ_CACHE_VERSION_TTL', 1)))
+    if _llm_store.stats()['backend'] == 'memory' else None,
+)
+
+# 查询扩展：扩展结果按规范化查询缓存，与 LLM 缓存共用同一类后端
+query_expander = QueryExpander(
+    llm.client,
+    make_store(os.getenv('LLM_CACHE_URL'), max_entries=int(os.getenv('SEARCH_EXPAND_MAX_ENTRIES', 5000)),
+               namespace='ams:expand'),
+    ttl=int(os.getenv('SEARCH_EXPAND_TTL', 7 * 86400)),
+)
+set_default_expander(query_expander)
 
 # =========================
-# 数据库连接
+# 列表分页
 # =========================
-def get_db_connection():
-    return pymysql.connect(
-        host=os.getenv('DB_HOST', 'localhost'),
-        port=int(os.getenv('DB_PORT', 3306)),
-        user=os.getenv('DB_USER', 'root'),
-        password=os.getenv('DB_PASSWORD', ''),
-        db=os.getenv('DB_NAME', 'alumni_mgmt'),
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
+from services.pagination import parse_page_args, parse_offset, parse_fields, parse_ids, build_page, CountCache, PageArgsError
+from services import search
+from services.search_index import InvertedIndex, IndexUnavailable
+from services.bulk_import import BulkImporter, RowError, validate_user, validate_user_patch, iter_rows, detect_format, FORMATS, IMPORT_MODES, USER_COLUMNS
+from services import export
+from services import changes
+from services import alumni_stats
+from services import filters
+
+# 列表总数缓存（每个 worker 一份，只有传 with_total=1 时才计数）
+count_cache = CountCache(ttl=int(os.getenv('COUNT_CACHE_TTL', 30)))
+
+# 校友读缓存：单个校友与列表 / 搜索结果页，写入后按版本号失效；READ_CACHE_TTL=0 关闭
+# 进程内缓存时版本号放在 MySQL 中，每个 worker 记住 READ_CACHE_VERSION_TTL 秒，其他 worker 的写入最多晚这么久失效
+from services.read_cache import ReadCache
+from services import http_cache
+_read_store = make_store(os.getenv('READ_CACHE_URL'), max_entries=int(os.getenv('READ_CACHE_MAX_ENTRIES', 10000)),
+                         namespace='ams:read')
+read_cache = ReadCache(
+    _read_store,
+    ttl=int(os.getenv('READ_CACHE_TTL', 60)),
+    versions=DbVersions(db_pool, memo_ttl=float(os.getenv('READ_CACHE_VERSION_TTL', 1)))
+    if _read_store.stats()['backend'] == 'memory' else None,
+)
+
+def _want_total():
+    return request.args.get('with_total', '').lower() in ('1', 'true', 'yes')
 
 # =========================
 # Flask 基本配置
@@ -35,15 +93,108 @@ app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', "a-very-secret-key")
 
 # =========================
-# 自动初始化数据库
+# 请求指标（最先注册，计时覆盖登录检查等所有 before_request）
 # =========================
-try:
-    init_db.init_database()
-except Exception as e:
-    print(f"警告: 数据库初始化失败 - {e}")
+from services import metrics
+from services import serializer
+metrics.registry.slow_ms = float(os.getenv('SLOW_REQUEST_MS', 1000))
+# 每个 worker 定期把指标快照写到该目录，/api/metrics 汇总所有 worker；留空则只输出当前 worker
+METRICS_DIR = os.getenv('METRICS_DIR', '/tmp/ams_metrics').strip()
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '').strip()
+
+@app.before_request
+def _metrics_begin():
+    metrics.registry.begin_request()
+
+@app.after_request
+def _metrics_end(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    elapsed, phases = metrics.registry.end_request(request.method, route, response.status_code)
+    # 各阶段耗时附加到 Server-Timing，浏览器开发者工具可直接查看
+    existing = response.headers.get('Server-Timing')
+    timing = [f"{p};dur={round(v[0] * 1000, 1)}" for p, v in phases.items()
+              if not (existing and f"{p};" in existing)]
+    timing.append(f"app;dur={round(elapsed * 1000, 1)}")
+    response.headers['Server-Timing'] = ", ".join(([existing] if existing else []) + timing)
+    return response
+
+def _metrics_snapshot():
+    pool = db_pool.stats()
+    gauges = {metrics.gauge_key('ams_db_pool_connections', {'state': state}): pool[state]
+              for state in ('in_use', 'idle')}
+    # 连接池事件是本进程启动以来的累计值，按计数器上报：worker 退出后其累计值保留在汇总中
+    counters = {metrics.gauge_key('ams_db_pool_events_total', {'event': event}): pool[event]
+                for event in ('created', 'recycled', 'ping_failed', 'discarded', 'checkouts', 'wait_timeouts')}
+    return metrics.registry.snapshot(gauges, counters)
+
+def _metrics_flush_loop():
+    interval = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+    while True:
+        time.sleep(interval)
+        try:
+            metrics.write_snapshot(METRICS_DIR, _metrics_snapshot())
+        except Exception as e:
+            print("Metrics flush error:", e)
+
+if METRICS_DIR:
+    threading.Thread(target=_metrics_flush_loop, name='metrics-flush', daemon=True).start()
+
+# =========================
+# 登录会话
+# =========================
+# SESSION_STORE_URL 留空时沿用签名 Cookie 会话；memory://（单 worker）或 redis://（多 worker 共享）时改为服务端会话
+from services import sessions
+SESSION_STORE_URL = os.getenv('SESSION_STORE_URL', '').strip()
+if SESSION_STORE_URL:
+    app.session_interface = sessions.ServerSessionInterface(
+        make_store(SESSION_STORE_URL, max_entries=int(os.getenv('SESSION_MAX_ENTRIES', 100000)),
+                   namespace='ams:sess'),
+        ttl=int(os.getenv('SESSION_TTL', 7 * 86400)),
+    )
+# 禁用 / 删除账户后，其已登录的会话立即失效（其他 worker 在 SESSION_REVOCATION_REFRESH 秒内生效）
+revocations = sessions.RevocationIndex(db_pool, refresh_interval=float(os.getenv('SESSION_REVOCATION_REFRESH', 5)))
+
+def _session_user(user):
+    """会话中保存的用户信息：session_gen 与签发时间用于吊销检查"""
+    return {
+        'id': user['id'],
+        'username': user['username'],
+        'role': user['role'],
+        'gen': user.get('session_gen', 0),
+        'iat': time.time(),
+    }
+
+def _public_user(user):
+    return {'id': user['id'], 'username': user['username'], 'role': user['role']}
+
+# =========================
+# 检查数据库版本
+# =========================
+# worker 启动时只读一次 schema_version；版本落后时才执行迁移（有命名锁，只有一个 worker 真正执行）。
+# 生产环境建议设置 DB_AUTO_MIGRATE=0，在发布时单独运行 `python init_db.py upgrade`。
+def _check_schema_on_boot():
+    try:
+        with get_db_connection() as conn:
+            current, latest = init_db.check_schema(conn)
+    except Exception as e:
+        current, latest = None, None
+        print(f"警告: 读取数据库版本失败 - {e}")
+
+    if current is not None and current >= latest:
+        return
+    if os.getenv('DB_AUTO_MIGRATE', '1') == '0':
+        print(f"警告: 数据库版本落后（当前 {current}，需要 {latest}），请运行 python init_db.py upgrade")
+        return
+    try:
+        init_db.init_database()
+    except Exception as e:
+        print(f"警告: 数据库初始化失败 - {e}")
+
+_check_schema_on_boot()
 
 # 启用 CORS，允许前端跨域访问
-CORS(app, supports_credentials=True)
+# 前端跨域时需要读取 ETag / Last-Modified 才能自行发起条件请求
+CORS(app, supports_credentials=True, expose_headers=['ETag', 'Last-Modified'])
 
 # =========================
 # 根路径和健康检查
@@ -73,19 +224,63 @@ def health():
 # =========================
 # 统一响应格式
 # =========================
+# 编码器见 services/serializer.py（有 orjson 时用 orjson），格式与 jsonify 相同
+def _json_response(body):
+    return Response(body, mimetype='application/json')
+
 def success_response(data=None, message="操作成功"):
-    return jsonify({
-        "code": 200,
-        "message": message,
-        "data": data
-    })
+    with metrics.registry.phase('serialize'):
+        return _json_response(serializer.envelope(data, message, 200))
 
 def error_response(message="操作失败", code=500):
-    return jsonify({
-        "code": code,
-        "message": message,
-        "data": None
-    }), code
+    with metrics.registry.phase('serialize'):
+        return _json_response(serializer.envelope(None, message, code)), code
+
+# limit 不小于该值的游标分页列表直接从服务端游标边读边编码输出（0 表示不流式输出）
+JSON_STREAM_MIN_LIMIT = int(os.getenv('JSON_STREAM_MIN_LIMIT', 200))
+STREAM_FETCH_SIZE = 500
+
+def _stream_page(sql, params, limit, message, extra=None):
+    """
+    按 id 游标分页的列表（sql 需 ORDER BY id LIMIT limit + 1）从服务端游标逐批读取、逐块编码输出，
+    响应与 success_response(build_page(...)) 相同，不在内存中拼出整个列表与 body。
+    extra 为 data 中的其他字段（如 total）。与导出一样，连接在生成器内借出，先取第一块再返回响应：
+    查询出错时抛出异常由调用方返回错误响应；生成器结束、出错或被关闭（响应关闭、客户端断开）时归还连接。
+    """
+    def generate():
+        pc = db_pool.acquire()
+        complete = False
+        try:
+            cursor = pc.conn.cursor(TimedSSDictCursor)
+            cursor.execute(sql, params)
+
+            def rows():
+                while True:
+                    batch = cursor.fetchmany(STREAM_FETCH_SIZE)
+                    if not batch:
+                        return
+                    yield from batch
+
+            page = serializer.PageStream(rows(), limit)
+            yield from serializer.iter_envelope(page, message, tail=lambda: {**page.tail(), **(extra or {})})
+            # 最多还剩多查的那一条，读完后连接可以放回池中
+            cursor.fetchall()
+            cursor.close()
+            complete = True
+        finally:
+            # 没读完的服务端游标会占住连接，直接丢弃
+            db_pool.release(pc, discard=not complete)
+
+    body = generate()
+    try:
+        first = next(body)
+    except Exception:
+        body.close()
+        raise
+    resp = Response(itertools.chain([first], body), mimetype='application/json')
+    # 响应没有被迭代完（或根本没有被迭代）时，WSGI 服务器关闭响应也会关闭生成器
+    resp.call_on_close(body.close)
+    return resp
 
 # =========================
 # 登录拦截中间件（可选）
@@ -93,13 +288,26 @@ def error_response(message="操作失败", code=500):
 @app.before_request
 def _require_login():
     # 允许的路径（不需要登录）
-    allowed_paths = ['/', '/api/health', '/api/auth/login', '/api/auth/register', '/static']
+    allowed_paths = ['/', '/api/health', '/api/auth/login', '/api/auth/register', '/static', '/api/metrics']
     if request.path in allowed_paths or request.path.startswith('/static'):
         return
 
-    # 检查登录状态
-    if not session.get('user'):
+    # 检查登录状态：会话中有用户，且该账户未被禁用 / 删除（内存中的吊销索引，不查数据库）
+    start = time.perf_counter()
+    user = session.get('user')
+    if not user:
         return error_response("未登录，请先登录", 401)
+    try:
+        valid = revocations.is_valid(user)
+    except Exception as e:
+        # 首次检查该用户时需要查一次数据库；失败时不清除会话，稍后重试即可
+        print("Session revocation check error:", e)
+        return error_response("登录状态检查失败，请稍后重试", 503)
+    sessions.stats.record('auth_check', time.perf_counter() - start)
+    if not valid:
+        session.clear()
+        sessions.stats.incr('revoked_requests')
+        return error_response("登录已失效，请重新登录", 401)
 
 # =========================
 # 权限检查装饰器
@@ -130,10 +338,9 @@ def login():
         return error_response("用户名和密码不能为空", 400)
 
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             # 查询用户
-            cursor.execute("SELECT id, username, password_hash, role, is_active FROM auth_user WHERE username=%s", (username,))
+            cursor.execute("SELECT id, username, password_hash, role, is_active, session_gen FROM auth_user WHERE username=%s", (username,))
             user = cursor.fetchone()
 
             if not user:
@@ -150,20 +357,11 @@ def login():
             cursor.execute("UPDATE auth_user SET last_login=NOW() WHERE id=%s", (user['id'],))
 
             # 保存用户信息到 Session
-            session['user'] = {
-                'id': user['id'],
-                'username': user['username'],
-                'role': user['role']
-            }
+            session['user'] = _session_user(user)
 
             conn.commit()
-            conn.close()
 
-            return success_response({
-                'id': user['id'],
-                'username': user['username'],
-                'role': user['role']
-            }, "登录成功")
+            return success_response(_public_user(user), "登录成功")
 
     except Exception as e:
         print("Login error:", e)
@@ -186,8 +384,7 @@ def register():
         return error_response("密码至少 6 个字符", 400)
 
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             # 检查用户名是否已存在
             cursor.execute("SELECT id FROM auth_user WHERE username=%s", (username,))
             if cursor.fetchone():
@@ -203,16 +400,10 @@ def register():
             )
 
             new_user_id = cursor.lastrowid
-
-            # 保存用户信息到 Session
-            session['user'] = {
-                'id': new_user_id,
-                'username': username,
-                'role': 'user'
-            }
-
             conn.commit()
-            conn.close()
+
+            # 提交之后再写入 Session：签发时间晚于账户可见的时间
+            session['user'] = _session_user({'id': new_user_id, 'username': username, 'role': 'user'})
 
             return success_response({
                 'id': new_user_id,
@@ -235,28 +426,47 @@ def get_current_user():
     """获取当前登录用户"""
     user = session.get('user')
     if user:
-        return success_response(user)
+        return success_response(_public_user(user))
     return error_response("未登录", 401)
 
 # =========================
 # 用户管理 API（仅管理员）
 # =========================
 
+AUTH_USER_FIELDS = ['id', 'username', 'role', 'is_active', 'created_at', 'last_login']
+
 @app.route('/api/admin/users', methods=['GET'])
 @require_admin
 def get_auth_users():
-    """获取所有用户列表（仅管理员）"""
+    """获取用户列表（仅管理员，支持 after/limit 游标分页、fields 投影、with_total）"""
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT id, username, role, is_active, created_at, last_login
-                FROM auth_user
-                ORDER BY id
-            """)
-            users = cursor.fetchall()
-        conn.close()
-        return success_response(users, "获取用户列表成功")
+        after, limit = parse_page_args(request.args)
+        fields = parse_fields(request.args.get('fields'), AUTH_USER_FIELDS, AUTH_USER_FIELDS)
+    except PageArgsError as e:
+        return error_response(str(e), 400)
+
+    sql = f"""
+        SELECT {', '.join(fields)}
+        FROM auth_user
+        WHERE id > %s
+        ORDER BY id
+        LIMIT %s
+    """
+    try:
+        extra = {}
+        if _want_total():
+            def _count():
+                with get_db_connection() as conn, conn.cursor() as cursor:
+                    cursor.execute("SELECT COUNT(*) AS cnt FROM auth_user")
+                    return cursor.fetchone()['cnt']
+            extra['total'] = count_cache.get_or_compute(('auth_user',), _count)
+        if JSON_STREAM_MIN_LIMIT and limit >= JSON_STREAM_MIN_LIMIT:
+            return _stream_page(sql, (after, limit + 1), limit, "获取用户列表成功", extra)
+
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(sql, (after, limit + 1))
+            page = build_page(cursor.fetchall(), limit)
+        return success_response({**page, **extra}, "获取用户列表成功")
     except Exception as e:
         print("Get users error:", e)
         return error_response(f"获取用户列表失败: {str(e)}", 500)
@@ -266,8 +476,7 @@ def get_auth_users():
 def toggle_user_status(user_id):
     """启用/禁用用户（仅管理员）"""
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             # 查询当前状态
             cursor.execute("SELECT is_active FROM auth_user WHERE id=%s", (user_id,))
             result = cursor.fetchone()
@@ -277,10 +486,13 @@ def toggle_user_status(user_id):
 
             # 切换状态
             new_status = not result['is_active']
-            cursor.execute("UPDATE auth_user SET is_active=%s WHERE id=%s", (new_status, user_id))
+            # 同时吊销该账户已登录的会话（禁用后立即失效；重新启用后需要重新登录）
+            cursor.execute("UPDATE auth_user SET is_active=%s, session_gen=session_gen+1 WHERE id=%s",
+                           (new_status, user_id))
+            sessions.record_revocation(cursor, user_id)
 
             conn.commit()
-            conn.close()
+            revocations.revoke(user_id, active=new_status)
 
             status_text = "启用" if new_status else "禁用"
             return success_response({'user_id': user_id, 'is_active': new_status}, f"用户已{status_text}")
@@ -294,8 +506,7 @@ def delete_auth_user(user_id):
     """删除用户（仅管理员）"""
     user = session.get('user')
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             # 不允许删除自己
             if user_id == user['id']:
                 return error_response("不能删除自己", 400)
@@ -305,70 +516,606 @@ def delete_auth_user(user_id):
             if not cursor.fetchone():
                 return error_response("用户不存在", 404)
 
-            # 删除用户
+            # 删除用户（先写入吊销记录，其他 worker 据此得知账户已不存在）
+            sessions.record_revocation(cursor, user_id, deleted=True)
             cursor.execute("DELETE FROM auth_user WHERE id=%s", (user_id,))
             conn.commit()
-            conn.close()
+            revocations.revoke(user_id)
 
             return success_response(None, "用户删除成功")
     except Exception as e:
         print("Delete user error:", e)
         return error_response(f"删除失败: {str(e)}", 500)
 
+@app.route('/api/admin/db/pool', methods=['GET'])
+@require_admin
+def get_db_pool_stats():
+    """查看当前 worker 的数据库连接池统计（仅管理员）"""
+    return success_response(db_pool.stats(), "获取连接池统计成功")
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus 文本格式的指标，汇总所有 worker。
+    设置了 METRICS_TOKEN 时需要 Authorization: Bearer <token>，否则需要管理员登录。
+    """
+    if METRICS_TOKEN:
+        if request.headers.get('Authorization', '') != f"Bearer {METRICS_TOKEN}":
+            return error_response("指标令牌无效", 401)
+    elif (session.get('user') or {}).get('role') != 'admin':
+        return error_response("需要管理员权限", 403)
+    try:
+        snapshot = _metrics_snapshot()
+        if METRICS_DIR:
+            metrics.write_snapshot(METRICS_DIR, snapshot)
+            snapshots = metrics.read_snapshots(METRICS_DIR)
+        else:
+            snapshots = [snapshot]
+        body = metrics.render(metrics.merge(snapshots))
+    except Exception as e:
+        print("Metrics error:", e)
+        return error_response(f"获取指标失败: {str(e)}", 500)
+    return Response(body, mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/admin/metrics/slow', methods=['GET'])
+@require_admin
+def get_slow_requests():
+    """当前 worker 最近的慢请求（超过 SLOW_REQUEST_MS）及各阶段耗时（仅管理员）"""
+    return success_response({
+        'threshold_ms': metrics.registry.slow_ms,
+        'items': list(reversed(metrics.registry.slow_log)),
+    }, "获取慢请求成功")
+
+@app.route('/api/admin/sessions/stats', methods=['GET'])
+@require_admin
+def get_session_stats():
+    """会话后端、登录检查与会话加载耗时、吊销索引状态（当前 worker，仅管理员）"""
+    data = sessions.stats.snapshot()
+    data['backend'] = 'server' if SESSION_STORE_URL else 'cookie'
+    if SESSION_STORE_URL:
+        data['store'] = app.session_interface.store.stats()
+    data['revocation'] = revocations.stats()
+    return success_response(data, "获取会话统计成功")
+
+@app.route('/api/admin/read_cache', methods=['GET'])
+@require_admin
+def get_read_cache_stats():
+    """校友读缓存统计：单个校友 / 列表 / 搜索结果各自的命中率（当前 worker）与后端状态（仅管理员）"""
+    return success_response(read_cache.stats(), "获取读缓存统计成功")
+
+@app.route('/api/admin/read_cache/invalidate', methods=['POST'])
+@require_admin
+def invalidate_read_cache():
+    """手动使全部列表 / 搜索结果缓存失效，{"ids": [...]} 时同时失效这些校友（直接改库后使用）"""
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids') or []
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        return error_response("ids 必须是整数数组", 400)
+    read_cache.invalidate(*ids)
+    return success_response(None, "读缓存已失效")
+
+@app.route('/api/admin/llm/stats', methods=['GET'])
+@require_admin
+def get_llm_stats():
+    """查看当前 worker 的大模型调用统计：次数、失败、重试、延迟分位数、缓存命中率（仅管理员）"""
+    data = llm_client.stats.snapshot()
+    data['cache'] = llm.stats()
+    data['ai_search_prompt'] = prompt_builder.stats.snapshot()
+    return success_response(data, "获取 LLM 调用统计成功")
+
+@app.route('/api/admin/llm/cache/invalidate', methods=['POST'])
+@require_admin
+def invalidate_llm_cache():
+    """让 LLM 缓存失效（仅管理员）：body 传 {"tag": "user:12"}，不传 tag 则全部失效"""
+    data = request.get_json(silent=True) or {}
+    tag = (data.get('tag') or '').strip() or None
+    llm.invalidate(tag)
+    return success_response({'tag': tag or 'all'}, "缓存已失效")
+
+@app.route('/api/admin/search_index', methods=['GET'])
+@require_admin
+def get_search_index_stats():
+    """查看当前 worker 的内存搜索索引状态与内存占用（仅管理员）"""
+    if search_index is None:
+        return error_response("内存搜索索引未启用（SEARCH_MODE 不是 memory）", 400)
+    return success_response(search_index.stats(), "获取索引状态成功")
+
+@app.route('/api/admin/search_index/check', methods=['POST'])
+@require_admin
+def check_search_index():
+    """逐行核对内存索引与数据库是否一致（仅管理员，全表扫描，较慢）"""
+    if search_index is None:
+        return error_response("内存搜索索引未启用（SEARCH_MODE 不是 memory）", 400)
+    try:
+        with get_db_connection() as conn:
+            report = search_index.check_consistency(conn)
+        return success_response(report, "核对完成")
+    except Exception as e:
+        print("Check search index error:", e)
+        return error_response(f"核对失败: {str(e)}", 500)
+
+@app.route('/api/admin/vector_index', methods=['GET'])
+@require_admin
+def get_vector_index_stats():
+    """查看当前 worker 的向量索引状态（仅管理员）"""
+    if vector_index is None:
+        return error_response("向量索引未启用（VECTOR_INDEX 不是 1）", 400)
+    return success_response(vector_index.stats(), "获取索引状态成功")
+
+@app.route('/api/admin/vector_index/rebuild', methods=['POST'])
+@require_admin
+def rebuild_vector_index():
+    """全量重建当前 worker 的向量索引并写入磁盘（重新计算 IDF，仅管理员）"""
+    if vector_index is None:
+        return error_response("向量索引未启用（VECTOR_INDEX 不是 1）", 400)
+    try:
+        with get_db_connection() as conn:
+            vector_index.build(conn)
+        vector_index.save()
+        return success_response(vector_index.stats(), "重建完成")
+    except Exception as e:
+        print("Rebuild vector index error:", e)
+        return error_response(f"重建失败: {str(e)}", 500)
+
+@app.route('/api/admin/search_index/rebuild', methods=['POST'])
+@require_admin
+def rebuild_search_index():
+    """全量重建当前 worker 的内存索引（仅管理员）"""
+    if search_index is None:
+        return error_response("内存搜索索引未启用（SEARCH_MODE 不是 memory）", 400)
+    try:
+        with get_db_connection() as conn:
+            search_index.build(conn)
+        return success_response(search_index.stats(), "重建完成")
+    except Exception as e:
+        print("Rebuild search index error:", e)
+        return error_response(f"重建失败: {str(e)}", 500)
+
 # =========================
 # 校友管理 API
 # =========================
+# 列表接口允许投影的字段；默认不返回时间戳
+USER_FIELDS = ['id', 'name', 'gender', 'age', 'phone', 'email', 'grad_year', 'degree',
+               'major', 'city', 'country', 'bio', 'created_at', 'updated_at']
+USER_LIST_DEFAULT_FIELDS = USER_FIELDS[:12]
+# 批量获取 / 更新 / 删除一次最多处理的校友数
+USER_BATCH_MAX = int(os.getenv('USER_BATCH_MAX', 500))
+
+# =========================
+# 进程内搜索索引（SEARCH_MODE=memory 时启用）
+# =========================
+search_index = None
+
+def _search_index_sync_loop():
+    """后台线程：启动时全量构建，之后定期按 updated_at 追平其他 worker 的改动、核对删除"""
+    poll_interval = float(os.getenv('SEARCH_INDEX_POLL_INTERVAL', 5))
+    reconcile_interval = float(os.getenv('SEARCH_INDEX_RECONCILE_INTERVAL', 60))
+    last_reconcile = time.monotonic()
+    while True:
+        try:
+            with get_db_connection() as conn:
+                if not search_index.ready and search_index.disabled_reason is None:
+                    search_index.build(conn)
+                    last_reconcile = time.monotonic()
+                elif search_index.ready:
+                    search_index.poll(conn, poll_interval)
+                    if time.monotonic() - last_reconcile >= reconcile_interval:
+                        search_index.reconcile_ids(conn)
+                        last_reconcile = time.monotonic()
+        except Exception as e:
+            print("Search index sync error:", e)
+        time.sleep(poll_interval)
+
+def _sync_search_index(cursor, *user_ids):
+    """本 worker 写入后立即更新内存索引与向量索引（重新读一次，保证与数据库中的值一致）"""
+    indexes = [i for i in (search_index, vector_index) if i is not None and i.ready]
+    if not indexes or not user_ids:
+        return
+    cursor.execute(f"""
+        SELECT {', '.join(USER_LIST_DEFAULT_FIELDS)} FROM tb_user
+        WHERE id IN ({', '.join(['%s'] * len(user_ids))})
+    """, user_ids)
+    rows = {r['id']: r for r in cursor.fetchall()}
+    for index in indexes:
+        for user_id in user_ids:
+            if user_id in rows:
+                index.upsert(rows[user_id])
+            else:
+                index.remove(user_id)
+
+if search.default_mode() == 'memory':
+    search_index = InvertedIndex(
+        USER_LIST_DEFAULT_FIELDS,
+        max_docs=int(os.getenv('SEARCH_INDEX_MAX_DOCS', 1_000_000)),
+        max_bytes=int(os.getenv('SEARCH_INDEX_MAX_MB', 512)) * 1024 * 1024,
+    )
+    threading.Thread(target=_search_index_sync_loop, name='search-index-sync', daemon=True).start()
+
+# =========================
+# 本地向量索引（VECTOR_INDEX=1 时启用）：AI 搜索按语义相似度取候选，需要 numpy
+# =========================
+vector_index = None
+
+def _vector_index_sync_loop():
+    """后台线程：优先从磁盘加载，否则全量构建并保存；之后与内存索引一样轮询追平，定期落盘"""
+    poll_interval = float(os.getenv('SEARCH_INDEX_POLL_INTERVAL', 5))
+    reconcile_interval = float(os.getenv('SEARCH_INDEX_RECONCILE_INTERVAL', 60))
+    save_interval = float(os.getenv('VECTOR_INDEX_SAVE_INTERVAL', 300))
+    last_reconcile = time.monotonic()
+    while True:
+        try:
+            with get_db_connection() as conn:
+                if not vector_index.ready and vector_index.disabled_reason is None:
+                    if not vector_index.load():
+                        vector_index.build(conn)
+                        vector_index.save()
+                    last_reconcile = 0.0
+                if vector_index.ready:
+                    vector_index.poll(conn, poll_interval)
+                    if time.monotonic() - last_reconcile >= reconcile_interval:
+                        vector_index.reconcile_ids(conn)
+                        last_reconcile = time.monotonic()
+                    if vector_index.dirty and time.monotonic() - vector_index.last_save >= save_interval:
+                        vector_index.save()
+        except Exception as e:
+            print("Vector index sync error:", e)
+        time.sleep(poll_interval)
+
+if os.getenv('VECTOR_INDEX', '0') in ('1', 'true'):
+    from services.vector_index import VectorIndex, IndexUnavailable as VectorIndexUnavailable
+    vector_index = VectorIndex(
+        dim=int(os.getenv('VECTOR_INDEX_DIM', 256)),
+        path=os.getenv('VECTOR_INDEX_PATH', 'data/vector_index'),
+        max_docs=int(os.getenv('SEARCH_INDEX_MAX_DOCS', 1_000_000)),
+    )
+    threading.Thread(target=_vector_index_sync_loop, name='vector-index-sync', daemon=True).start()
+
+def _vector_candidates(text, limit):
+    """向量索引可用时按语义相似度返回候选（带 similarity），否则返回 None"""
+    if vector_index is None:
+        return None
+    try:
+        hits = vector_index.search(text, k=limit)
+    except VectorIndexUnavailable:
+        return None
+    if not hits:
+        return []
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT {', '.join(USER_LIST_DEFAULT_FIELDS)} FROM tb_user
+            WHERE id IN ({', '.join(['%s'] * len(hits))})
+        """, [doc_id for doc_id, _ in hits])
+        by_id = {r['id']: r for r in cursor.fetchall()}
+    # 按相似度顺序返回，跳过刚被其他 worker 删除的记录
+    return [dict(by_id[doc_id], similarity=score) for doc_id, score in hits if doc_id in by_id]
+
+def _search_from_index(keyword, fields, limit, after=0):
+    """内存索引可用时直接返回结果页，否则返回 None 由调用方回退到数据库"""
+    if search_index is None:
+        return None
+    try:
+        return search_index.search(keyword, fields, limit=limit, after=after)
+    except IndexUnavailable:
+        search_index.note_fallback()
+        return None
+
+def _want_expand():
+    return request.args.get('expand') in ('1', 'true')
+
+def _want_plan():
+    """?debug=1 返回筛选查询的执行计划，仅调试模式或管理员可用"""
+    if request.args.get('debug') not in ('1', 'true'):
+        return False
+    return app.debug or (session.get('user') or {}).get('role') == 'admin'
+
 @app.route('/api/users', methods=['GET'])
 def get_users():
-    """获取校友列表（支持搜索）"""
+    """
+    获取校友列表：
+    - 无 keyword：按 id 游标分页（after/limit）
+    - 有 keyword：全文检索，按相关度排序，offset/limit 分页；
+      SEARCH_MODE=memory 时由进程内索引直接返回，按 id 游标分页
+    - 带筛选参数（degree/major/city/country/gender/grad_year[_from|_to]/sort）：
+      无 keyword 时按 (排序列, id) 游标分页，after 为上一页返回的 next_cursor；
+      有 keyword 时筛选条件与关键词按 AND 组合，仍按相关度排序
+    均支持字段投影 fields、总数 with_total；expand=1 时先用大模型扩展关键词，再与原词合并为一次查询。
+    传 ids=3,1,2 时按 id 批量获取（一次 IN 查询），按传入顺序返回，不存在的 id 列在 missing 中
+    带 If-None-Match / If-Modified-Since 且数据未变时直接返回 304
+    """
+    if request.args.get('ids') is not None:
+        return _check_list_not_modified() or _get_users_by_ids()
     keyword = request.args.get('keyword', '').strip()
-
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            if keyword:
-                sql = """
-                SELECT id, name, gender, age, phone, email, grad_year, degree, major, city, country, bio
+        criteria = filters.parse_filters(request.args, keyword)
+        if criteria is None:
+            after, limit = parse_page_args(request.args)
+        else:
+            # 筛选列表的 after 是不透明游标，不按整数 id 解析
+            after = request.args.get('after') or None
+            filters.decode_cursor(after, criteria.sort_col)
+            _, limit = parse_page_args({'limit': request.args.get('limit')})
+        offset = parse_offset(request.args)
+        fields = parse_fields(request.args.get('fields'), USER_FIELDS, USER_LIST_DEFAULT_FIELDS)
+    except (PageArgsError, filters.FilterError) as e:
+        return error_response(str(e), 400)
+    mode = request.args.get('mode') or None
+    if mode and mode not in search.SEARCH_MODES:
+        return error_response(f"不支持的搜索模式: {mode}", 400)
+    extra_terms = query_expander.expand(keyword) if keyword and _want_expand() else []
+
+    if (keyword and criteria is None and not extra_terms and (mode or search.default_mode()) == 'memory'
+            and not _want_total()):
+        page = _search_from_index(keyword, fields, limit, after)
+        if page is not None:
+            # 内存索引按轮询追平数据库，可能略晚于表的校验值，不带 ETag
+            return success_response(page, "获取列表成功")
+
+    with_total = _want_total()
+    filter_key = repr(criteria.cache_key()) if criteria is not None else None
+    want_plan = criteria is not None and not keyword and _want_plan()
+    not_modified = _check_list_not_modified(enabled=not want_plan)
+    if not_modified:
+        return not_modified
+
+    def load_search():
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            page = search.search_users(cursor, keyword, fields, limit=limit, offset=offset, mode=mode,
+                                       extra_terms=extra_terms, filters=criteria)
+            if extra_terms:
+                page['expanded_terms'] = extra_terms
+            if with_total:
+                page['total'] = count_cache.get_or_compute(
+                    ('tb_user', keyword, page['mode'], tuple(extra_terms), filter_key),
+                    lambda: search.count_matches(cursor, keyword, mode=page['mode'], extra_terms=extra_terms,
+                                                 filters=criteria))
+        return page
+
+    def load_filtered():
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            page = filters.filter_users(cursor, criteria, fields, limit, after=after, explain=want_plan)
+            if with_total:
+                page['total'] = count_cache.get_or_compute(
+                    ('tb_user', 'filters', filter_key), lambda: filters.count_users(cursor, criteria))
+        return page
+
+    def load_list():
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            # 按主键游标翻页，多取一条判断是否还有下一页
+            cursor.execute(f"""
+                SELECT {', '.join(fields)}
                 FROM tb_user
-                WHERE name    LIKE CONCAT('%%', %s, '%%')
-                   OR phone   LIKE CONCAT('%%', %s, '%%')
-                   OR email   LIKE CONCAT('%%', %s, '%%')
-                   OR major   LIKE CONCAT('%%', %s, '%%')
-                   OR city    LIKE CONCAT('%%', %s, '%%')
-                   OR country LIKE CONCAT('%%', %s, '%%')
-                   OR bio     LIKE CONCAT('%%', %s, '%%')
+                WHERE id > %s
                 ORDER BY id
-                """
-                params = (keyword,) * 7
-                cursor.execute(sql, params)
-            else:
-                sql = """
-                SELECT id, name, gender, age, phone, email, grad_year, degree, major, city, country, bio
+                LIMIT %s
+            """, (after, limit + 1))
+            page = build_page(cursor.fetchall(), limit)
+            if with_total:
+                def _count():
+                    cursor.execute("SELECT COUNT(*) AS cnt FROM tb_user")
+                    return cursor.fetchone()['cnt']
+                page['total'] = count_cache.get_or_compute(('tb_user',), _count)
+        return page
+
+    try:
+        if not keyword and criteria is None and JSON_STREAM_MIN_LIMIT and limit >= JSON_STREAM_MIN_LIMIT:
+            # 大页直接从服务端游标流式输出，不进读缓存（整页放进缓存也占内存）
+            extra = {}
+            if with_total:
+                def _count():
+                    with get_db_connection() as conn, conn.cursor() as cursor:
+                        cursor.execute("SELECT COUNT(*) AS cnt FROM tb_user")
+                        return cursor.fetchone()['cnt']
+                extra['total'] = count_cache.get_or_compute(('tb_user',), _count)
+            resp = _stream_page(f"""
+                SELECT {', '.join(fields)}
                 FROM tb_user
+                WHERE id > %s
                 ORDER BY id
-                """
-                cursor.execute(sql)
-
-            users = cursor.fetchall()
-        conn.close()
-        return success_response(users, "获取列表成功")
+                LIMIT %s
+            """, (after, limit + 1), limit, "获取列表成功", extra)
+            etag, last_modified = g.get('list_validators', (None, None))
+            return http_cache.set_validators(resp, etag, last_modified) if etag else resp
+        if keyword:
+            page = read_cache.get_list(
+                [keyword, mode, extra_terms, filter_key, fields, offset, limit, with_total], load_search, kind='query')
+        elif want_plan:
+            # 执行计划反映当前的索引与统计，不走缓存
+            page = load_filtered()
+        elif criteria is not None:
+            page = read_cache.get_list(['filters', filter_key, after, limit, fields, with_total], load_filtered)
+        else:
+            page = read_cache.get_list([after, limit, fields, with_total], load_list)
+        return _list_response(page)
     except Exception as e:
         print("Get users error:", e)
         return error_response(f"获取列表失败: {str(e)}", 500)
 
+def _users_table_meta():
+    """tb_user 的 max(updated_at) 与行数，作为列表的校验值（按列表版本号缓存）"""
+    def load():
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT UNIX_TIMESTAMP(MAX(updated_at)) AS max_updated, COUNT(*) AS cnt FROM tb_user")
+            row = cursor.fetchone()
+        return {'max_updated': int(row['max_updated'] or 0), 'count': row['cnt']}
+    return read_cache.get_list(['__meta__'], load)
+
+def _list_validators():
+    """
+    列表接口的 (ETag, Last-Modified)：通过接口的每次写入都会使列表版本号 +1（同一秒内改了非最新的行也能区分），
+    max(updated_at) 与行数兜底直接改库的情况。
+    expand=1 的结果还取决于查询扩展，不做条件请求，返回 (None, None)。
+    """
+    if _want_expand():
+        return None, None
+    version = read_cache.list_version()
+    meta = _users_table_meta()
+    etag = http_cache.make_etag('users', version, meta['max_updated'], meta['count'],
+                                sorted(request.args.items(multi=True)))
+    return etag, http_cache.to_utc(meta['max_updated']) if meta['max_updated'] else None
+
+def _check_list_not_modified(enabled=True):
+    """
+    只在请求带条件头、或读缓存开启（max(updated_at) / 行数按列表版本号缓存，几乎没有额外开销）时计算校验值，
+    关闭读缓存时普通请求不为校验值多做一次 COUNT(*)。未变化时返回 304 响应，否则把校验值记在 g 上、返回 None。
+    enabled=False（如调试请求）时不做条件请求。
+    """
+    conditional = 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers
+    if not enabled or not (conditional or read_cache.enabled):
+        return None
+    try:
+        etag, last_modified = _list_validators()
+    except Exception as e:
+        print("List validators error:", e)
+        return None
+    if not etag:
+        return None
+    if http_cache.is_not_modified(request, etag, last_modified):
+        return http_cache.not_modified(etag, last_modified)
+    g.list_validators = (etag, last_modified)
+    return None
+
+def _list_response(page):
+    resp = success_response(page, "获取列表成功")
+    etag, last_modified = g.get('list_validators', (None, None))
+    return http_cache.set_validators(resp, etag, last_modified) if etag else resp
+
+def _get_users_by_ids():
+    try:
+        ids = parse_ids(request.args.get('ids'), USER_BATCH_MAX)
+        fields = parse_fields(request.args.get('fields'), USER_FIELDS, USER_LIST_DEFAULT_FIELDS)
+    except PageArgsError as e:
+        return error_response(str(e), 400)
+    try:
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT {', '.join(fields)} FROM tb_user
+                WHERE id IN ({', '.join(['%s'] * len(ids))})
+            """, ids)
+            by_id = {r['id']: r for r in cursor.fetchall()}
+        return _list_response({
+            'items': [by_id[i] for i in ids if i in by_id],
+            'missing': [i for i in ids if i not in by_id],
+        })
+    except Exception as e:
+        print("Get users by ids error:", e)
+        return error_response(f"获取列表失败: {str(e)}", 500)
+
+# 变更订阅：删除记录保留天数、只返回多少秒之前的变更（等待并发事务提交）
+CHANGES_RETENTION_DAYS = int(os.getenv('CHANGES_RETENTION_DAYS', 30))
+CHANGES_SETTLE_SECONDS = int(os.getenv('CHANGES_SETTLE_SECONDS', changes.DEFAULT_SETTLE_SECONDS))
+_tombstone_purge = {'last': 0.0}
+
+@app.route('/api/users/changes', methods=['GET'])
+def get_user_changes():
+    """
+    增量同步：?since=<上次返回的 next_cursor>（首次不传，从头返回全部校友），?limit=500，?fields=...
+    返回游标之后新增 / 修改的校友 items 与被删除的校友 id 列表 deleted；
+    has_more 为 true 时立即用 next_cursor 继续拉取，否则稍后再用 next_cursor 轮询。
+    游标早于删除记录保留期限时返回 410，客户端应清空本地数据后重新全量同步。
+    """
+    try:
+        _, limit = parse_page_args(request.args, default_limit=500, max_limit=1000)
+        fields = parse_fields(request.args.get('fields'), USER_FIELDS, USER_FIELDS)
+        since = request.args.get('since')
+        state = changes.decode_cursor(since, CHANGES_RETENTION_DAYS) if since else None
+    except changes.CursorExpired as e:
+        return error_response(str(e), 410)
+    except (PageArgsError, changes.CursorError) as e:
+        return error_response(str(e), 400)
+
+    try:
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            if state is None:
+                state = changes.initial_state(cursor)
+            page = changes.fetch_changes(cursor, fields, state, limit=limit, settle=CHANGES_SETTLE_SECONDS)
+            # 每个 worker 每小时顺带清理一次过期的删除记录
+            if time.monotonic() - _tombstone_purge['last'] > 3600:
+                _tombstone_purge['last'] = time.monotonic()
+                changes.purge_tombstones(cursor, CHANGES_RETENTION_DAYS)
+                conn.commit()
+        return success_response(page, "获取变更成功")
+    except Exception as e:
+        print("Get user changes error:", e)
+        return error_response(f"获取变更失败: {str(e)}", 500)
+
+# =========================
+# 校友统计（仪表盘）
+# =========================
+# 计数由写入校友的事务增量维护；每隔 STATS_REBUILD_INTERVAL 秒由任一 worker 全量重算纠偏（0 关闭）
+STATS_REBUILD_INTERVAL = float(os.getenv('STATS_REBUILD_INTERVAL', 3600))
+
+def _stats_rebuild_loop():
+    while True:
+        time.sleep(min(STATS_REBUILD_INTERVAL, 300))
+        try:
+            with get_db_connection() as conn:
+                report = alumni_stats.maybe_rebuild(conn, STATS_REBUILD_INTERVAL)
+            if report and report['corrected']:
+                print(f"Alumni stats rebuilt: corrected {report['corrected']} buckets in {report['elapsed_ms']}ms")
+        except Exception as e:
+            print("Alumni stats rebuild error:", e)
+
+if STATS_REBUILD_INTERVAL > 0:
+    threading.Thread(target=_stats_rebuild_loop, name='alumni-stats-rebuild', daemon=True).start()
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """
+    校友统计：?dims=grad_year,city,city:grad_year（默认全部单维度与交叉维度），?top=20 每个维度只返回人数最多的前 N 个。
+    直接读取汇总表，代价与桶数成正比，不扫描校友表
+    """
+    try:
+        dims = alumni_stats.parse_dims(request.args.get('dims'))
+    except alumni_stats.StatsArgsError as e:
+        return error_response(str(e), 400)
+    top = request.args.get('top', type=int)
+    if top is not None and not 1 <= top <= 1000:
+        return error_response("top 必须在 1~1000 之间", 400)
+
+    def load():
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            return alumni_stats.read(cursor, dims, top)
+
+    try:
+        return success_response(read_cache.get_list({'stats': dims, 'top': top}, load), "获取统计成功")
+    except Exception as e:
+        print("Get stats error:", e)
+        return error_response(f"获取统计失败: {str(e)}", 500)
+
+@app.route('/api/admin/stats/rebuild', methods=['POST'])
+@require_admin
+def rebuild_stats():
+    """立即按校友表全量重算统计（仅管理员）；不锁统计表，重算期间校友写入照常进行"""
+    try:
+        with get_db_connection() as conn:
+            report = alumni_stats.rebuild(conn)
+        read_cache.invalidate()
+        return success_response(report, "重算完成")
+    except Exception as e:
+        print("Rebuild stats error:", e)
+        return error_response(f"重算失败: {str(e)}", 500)
+
 @app.route('/api/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     """获取单个校友详情"""
-    try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+    def load():
+        with get_db_connection() as conn, conn.cursor() as cursor:
             cursor.execute("SELECT * FROM tb_user WHERE id=%s", (user_id,))
-            user = cursor.fetchone()
-        conn.close()
+            return cursor.fetchone()
+
+    try:
+        # 版本号在加载之前读取：加载期间发生写入时 ETag 带旧版本号，下次请求不会误判为未变化
+        version = read_cache.user_version(user_id)
+        user = read_cache.get_user(user_id, load)
 
         if not user:
             return error_response("校友不存在", 404)
-        return success_response(user)
+        last_modified = http_cache.to_utc(user.get('updated_at'))
+        etag = http_cache.make_etag('user', user_id, version,
+                                    last_modified.timestamp() if last_modified else None)
+        if http_cache.is_not_modified(request, etag, last_modified):
+            return http_cache.not_modified(etag, last_modified)
+        return http_cache.set_validators(success_response(user), etag, last_modified)
     except Exception as e:
         print("Get user error:", e)
         return error_response(f"获取详情失败: {str(e)}", 500)
@@ -376,35 +1123,25 @@ def get_user(user_id):
 @app.route('/api/users', methods=['POST'])
 def create_user():
     """新增校友"""
-    data = request.get_json()
-
-    name = data.get('name', '').strip()
-    gender = data.get('gender', '').strip()
-    age = data.get('age')
-    phone = data.get('phone', '').strip()
-    email = data.get('email', '').strip()
-    grad_year = data.get('grad_year')
-    degree = data.get('degree', '').strip()
-    major = data.get('major', '').strip()
-    city = data.get('city', '').strip()
-    country = data.get('country', '').strip()
-    bio = data.get('bio', '').strip()
-
-    if not name:
-        return error_response("姓名不能为空", 400)
+    try:
+        values = validate_user(request.get_json(silent=True))
+    except RowError as e:
+        return error_response(str(e), 400)
 
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             sql = """
             INSERT INTO tb_user
             (name, gender, age, phone, email, grad_year, degree, major, city, country, bio)
             VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
             """
-            cursor.execute(sql, (name, gender, age, phone, email, grad_year, degree, major, city, country, bio))
-            conn.commit()
+            cursor.execute(sql, values)
             new_id = cursor.lastrowid
-        conn.close()
+            alumni_stats.record(cursor, after=[dict(zip(USER_COLUMNS, values))])
+            conn.commit()
+            _sync_search_index(cursor, new_id)
+        count_cache.clear()
+        read_cache.invalidate(new_id)
         return success_response({'id': new_id}, "新增成功")
     except Exception as e:
         print("Create user error:", e)
@@ -413,26 +1150,13 @@ def create_user():
 @app.route('/api/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
     """更新校友信息"""
-    data = request.get_json()
-
-    name = data.get('name', '').strip()
-    gender = data.get('gender', '').strip()
-    age = data.get('age')
-    phone = data.get('phone', '').strip()
-    email = data.get('email', '').strip()
-    grad_year = data.get('grad_year')
-    degree = data.get('degree', '').strip()
-    major = data.get('major', '').strip()
-    city = data.get('city', '').strip()
-    country = data.get('country', '').strip()
-    bio = data.get('bio', '').strip()
-
-    if not name:
-        return error_response("姓名不能为空", 400)
+    try:
+        values = validate_user(request.get_json(silent=True))
+    except RowError as e:
+        return error_response(str(e), 400)
 
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             sql = """
             UPDATE tb_user SET
                 name=%s, gender=%s, age=%s, phone=%s,
@@ -440,9 +1164,15 @@ def update_user(user_id):
                 city=%s, country=%s, bio=%s
             WHERE id=%s
             """
-            cursor.execute(sql, (name, gender, age, phone, email, grad_year, degree, major, city, country, bio, user_id))
+            before = alumni_stats.lock_rows(cursor, [user_id])
+            cursor.execute(sql, values + (user_id,))
+            if user_id in before:
+                alumni_stats.record(cursor, before=before.values(),
+                                    after=[dict(zip(USER_COLUMNS, values))])
             conn.commit()
-        conn.close()
+            _sync_search_index(cursor, user_id)
+        read_cache.invalidate(user_id)
+        llm.invalidate(f"user:{user_id}")
         return success_response(None, "更新成功")
     except Exception as e:
         print("Update user error:", e)
@@ -452,106 +1182,645 @@ def update_user(user_id):
 def delete_user(user_id):
     """删除校友"""
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            before = alumni_stats.lock_rows(cursor, [user_id])
             cursor.execute("DELETE FROM tb_user WHERE id=%s", (user_id,))
+            if cursor.rowcount:
+                changes.record_deletions(cursor, [user_id])
+                alumni_stats.record(cursor, before=before.values())
             conn.commit()
-        conn.close()
+        count_cache.clear()
+        read_cache.invalidate(user_id)
+        for index in (search_index, vector_index):
+            if index is not None:
+                index.remove(user_id)
+        llm.invalidate(f"user:{user_id}")
         return success_response(None, "删除成功")
     except Exception as e:
         print("Delete user error:", e)
         return error_response(f"删除失败: {str(e)}", 500)
 
+@app.route('/api/users', methods=['PATCH'])
+def patch_users():
+    """
+    批量部分更新：{"items": [{"id": 1, "city": "上海"}, {"id": 2, "major": "..."}]}，
+    每项只更新传入的字段。所有更新在一个事务中完成，返回每项的结果（updated / not_found / invalid）。
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return error_response("items 必须是非空数组", 400)
+    if len(items) > USER_BATCH_MAX:
+        return error_response(f"一次最多更新 {USER_BATCH_MAX} 位校友", 400)
+
+    results, patches = [], {}
+    for item in items:
+        user_id = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(user_id, int) or isinstance(user_id, bool) or user_id <= 0:
+            results.append({'id': user_id, 'status': 'invalid', 'error': "id 必须是正整数"})
+            continue
+        if user_id in patches:
+            results.append({'id': user_id, 'status': 'invalid', 'error': "重复的 id"})
+            continue
+        try:
+            patches[user_id] = validate_user_patch(item)
+            results.append({'id': user_id, 'status': None})
+        except RowError as e:
+            results.append({'id': user_id, 'status': 'invalid', 'error': str(e)})
+
+    updated = []
+    try:
+        if patches:
+            with get_db_connection() as conn, conn.cursor() as cursor:
+                ids = list(patches)
+                existing = alumni_stats.lock_rows(cursor, ids)
+                # 更新同一组字段的合并为一次 executemany
+                groups = {}
+                for user_id in ids:
+                    if user_id in existing:
+                        cols = tuple(patches[user_id])
+                        groups.setdefault(cols, []).append(tuple(patches[user_id].values()) + (user_id,))
+                        updated.append(user_id)
+                for cols, params in groups.items():
+                    cursor.executemany(
+                        f"UPDATE tb_user SET {', '.join(f'{c}=%s' for c in cols)} WHERE id=%s", params)
+                alumni_stats.record(cursor, before=[existing[i] for i in updated],
+                                    after=[dict(existing[i], **patches[i]) for i in updated])
+                conn.commit()
+                _sync_search_index(cursor, *updated)
+    except Exception as e:
+        print("Patch users error:", e)
+        return error_response(f"批量更新失败: {str(e)}", 500)
+
+    if updated:
+        read_cache.invalidate(*updated)
+    for user_id in updated:
+        llm.invalidate(f"user:{user_id}")
+    done = set(updated)
+    for r in results:
+        if r['status'] is None:
+            r['status'] = 'updated' if r['id'] in done else 'not_found'
+    return success_response({'updated': len(updated), 'results': results}, "批量更新完成")
+
+@app.route('/api/users', methods=['DELETE'])
+def delete_users():
+    """批量删除：?ids=1,2,3 或 JSON {"ids": [...]}，在一个事务中删除，返回每项的结果（deleted / not_found）"""
+    data = request.get_json(silent=True) or {}
+    try:
+        ids = parse_ids(request.args.get('ids') or data.get('ids'), USER_BATCH_MAX)
+    except PageArgsError as e:
+        return error_response(str(e), 400)
+    try:
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(ids))
+            before = alumni_stats.lock_rows(cursor, ids)
+            existing = set(before)
+            if existing:
+                cursor.execute(f"DELETE FROM tb_user WHERE id IN ({placeholders})", ids)
+                changes.record_deletions(cursor, sorted(existing))
+                alumni_stats.record(cursor, before=before.values())
+            conn.commit()
+    except Exception as e:
+        print("Delete users error:", e)
+        return error_response(f"批量删除失败: {str(e)}", 500)
+
+    count_cache.clear()
+    if existing:
+        read_cache.invalidate(*existing)
+    for user_id in existing:
+        for index in (search_index, vector_index):
+            if index is not None:
+                index.remove(user_id)
+        llm.invalidate(f"user:{user_id}")
+    return success_response({
+        'deleted': len(existing),
+        'results': [{'id': i, 'status': 'deleted' if i in existing else 'not_found'} for i in ids],
+    }, "批量删除完成")
+
 # =========================
 # AI 功能 API
 # =========================
-@app.route('/api/ai/summary', methods=['POST'])
-def ai_summary():
-    """生成校友摘要"""
-    if not llm:
-        return error_response("LLM 未配置", 500)
+def _llm_refresh():
+    """请求头 Cache-Control: no-cache 或 ?nocache=1 时跳过 LLM 缓存，强制重新生成"""
+    return ('no-cache' in request.headers.get('Cache-Control', '').lower()
+            or request.args.get('nocache') in ('1', 'true'))
 
-    data = request.get_json() or {}
-    prompt = f"""为以下校友生成一段简短"名片摘要"，50~120字，客观、可读性强：
+# =========================
+# SSE 流式输出
+# =========================
+def _wants_stream():
+    """?stream=1 或 Accept: text/event-stream 时以 SSE 流式返回"""
+    return (request.args.get('stream') in ('1', 'true')
+            or 'text/event-stream' in request.headers.get('Accept', ''))
+
+def _sse_event(data, event=None):
+    text = json.dumps(data, ensure_ascii=False)
+    return (f"event: {event}\n" if event else "") + f"data: {text}\n\n"
+
+def _sse_response(pieces, result_key):
+    """
+    把 LLM 输出的生成器包装成 text/event-stream：
+    先立即发送一条注释让响应头尽快到达浏览器，随后每段输出一个 {"delta": ...} 事件，
+    结束时发送 event: done（带完整文本），出错时发送 event: error。
+    浏览器断开时 WSGI 服务器会关闭本生成器，finally 中关闭上游请求，模型随之停止生成。
+    """
+    def generate():
+        parts = []
+        try:
+            yield ": connected\n\n"
+            for piece in pieces:
+                parts.append(piece)
+                yield _sse_event({'delta': piece})
+            yield _sse_event({result_key: "".join(parts)}, event='done')
+        except Exception as e:
+            print("AI stream error:", e)
+            yield _sse_event({'message': f"生成失败: {str(e)}"}, event='error')
+        finally:
+            pieces.close()
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',   # 关闭 Nginx 缓冲，逐段下发
+    })
+
+# =========================
+# AI 任务：提示词构造与执行（同步接口和异步任务共用）
+# =========================
+def _summary_prompt(data):
+    return f"""为以下校友生成一段简短"名片摘要"，50~120字，客观、可读性强：
                 姓名：{data.get('name','')}
                 专业：{data.get('major','')}
                 工作/公司：{data.get('work','')}
                 简介/说明：{data.get('bio','')}
                 输出不要多余引言，直接给摘要文本。"""
+
+def _summary_tags(data):
+    # 传了校友 id 时按 user:<id> 打标签，资料更新 / 删除后自动失效
+    return [f"user:{data['id']}"] if data.get('id') else []
+
+def _draft_email_prompt(data):
+    topic = data.get("topic", "校友活动通知")
+    audience = data.get("audience", "本校校友")
+    style = data.get("style", "正式友好")
+    points = "; ".join(data.get("points", []))
+    return f"""请写一封面向{audience}的邮件草稿，主题为"{topic}"，风格：{style}。
+                    要点：{points}
+                    要求：包含邮件主题建议、称呼、正文（简洁、有行动号召）、落款。"""
+
+def _ai_search_candidates(q, extra_terms=()):
+    # 优先按语义相似度取候选（扩展词一并参与编码），向量索引不可用时走关键词检索
+    rows = _vector_candidates(" ".join([q] + list(extra_terms)), 20)
+    if rows is None:
+        page = None if extra_terms else _search_from_index(q, USER_LIST_DEFAULT_FIELDS, 20)
+        if page is None:
+            with get_db_connection() as conn, conn.cursor() as cursor:
+                # 候选集走全文索引，按相关度取前 20 条；扩展词与原词合并为一次查询
+                page = search.search_users(cursor, q, USER_LIST_DEFAULT_FIELDS, limit=20, extra_terms=extra_terms)
+        rows = page['items']
+    for r in rows:
+        r.pop('_score', None)
+    return rows
+
+def _public_candidates(rows):
+    """返回给前端的候选：简介只保留前 120 字的 snippet"""
+    for r in rows:
+        r['snippet'] = (r.pop('bio', None) or '')[:120]
+    return rows
+
+def _ai_search_rank(q, rows, refresh=False):
+    """
+    大模型重排：提示词只含与相关度有关的字段（不发送手机号、邮箱），在 token 预算内自适应截断简介。
+    返回 (模型输出, 提示词统计)。
+    """
+    system, prompt, info = prompt_builder.build_rank_prompt(
+        q, rows, budget=int(os.getenv('AI_SEARCH_PROMPT_BUDGET', 1000)))
+    start = time.monotonic()
+    # 候选集内容已在 prompt 中，数据变化后缓存键自然不同
+    ranked = llm.ask(prompt, system=system, refresh=refresh)
+    info['llm_ms'] = round((time.monotonic() - start) * 1000, 1)
+    prompt_builder.stats.record(info, info['llm_ms'])
+    return ranked, info
+
+def _run_ai_summary(params):
+    text = llm.ask(_summary_prompt(params), tags=_summary_tags(params), refresh=params.get('refresh', False))
+    return {'summary': text}
+
+def _run_ai_draft_email(params):
+    return {'draft': llm.ask(_draft_email_prompt(params), refresh=params.get('refresh', False))}
+
+def _want_rerank():
+    """?rerank=0 时跳过大模型重排，直接按检索得分返回候选；默认值由 AI_SEARCH_RERANK 决定"""
+    return request.args.get('rerank', os.getenv('AI_SEARCH_RERANK', '1')) not in ('0', 'false')
+
+def _run_ai_search(params):
+    q = (params.get('q') or '').strip()
+    if not q:
+        return {'ranked': None, 'candidates': []}
+    extra_terms = query_expander.expand(q) if params.get('expand') else []
+    rows = _ai_search_candidates(q, extra_terms)
+    ranked, info = None, None
+    if params.get('rerank', True):
+        ranked, info = _ai_search_rank(q, rows, refresh=params.get('refresh', False))
+    return {'ranked': ranked, 'candidates': _public_candidates(rows), 'expanded_terms': extra_terms,
+            'prompt_stats': info}
+
+# =========================
+# AI 异步任务引擎
+# =========================
+from services.jobs import JobEngine, QueueFull, UnknownJobKind, FINISHED
+
+job_engine = JobEngine(
+    db_pool,
+    max_workers=int(os.getenv('AI_JOB_WORKERS', 4)),
+    max_queue=int(os.getenv('AI_JOB_MAX_QUEUE', 100)),
+    heartbeat_interval=int(os.getenv('AI_JOB_HEARTBEAT_INTERVAL', 30)),
+)
+job_engine.register('summary', _run_ai_summary)
+job_engine.register('draft_email', _run_ai_draft_email)
+job_engine.register('search', _run_ai_search)
+
+# 批量预生成摘要：直接使用底层客户端（打包提示词不值得进 LLM 缓存）；
+# 各分包通过 job_engine.map 并发，与其他 AI 任务共用 AI_JOB_WORKERS 个名额
+from services.summaries import SummaryPipeline, get_summary
+
+summary_pipeline = SummaryPipeline(
+    db_pool, llm.client,
+    pack_size=int(os.getenv('SUMMARY_PACK_SIZE', 8)),
+    max_workers=int(os.getenv('SUMMARY_WORKERS', 4)),
+)
+job_engine.register('summary_batch', lambda p: summary_pipeline.run(
+    force=bool(p.get('force')), limit=p.get('limit'), map_fn=job_engine.map))
+
+job_engine.register('expand_warm', lambda p: query_expander.warm(
+    queries=p.get('queries'), k=p.get('k') or 100, refresh=bool(p.get('refresh'))))
+
+# 只有管理员可以提交的任务类型
+ADMIN_JOB_KINDS = ('summary_batch', 'expand_warm')
+
+def _warm_expansions_from_file(path):
+    """启动时为常见查询预生成扩展（每行一个查询），已缓存的跳过"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+        print("Query expansion warm-up:", query_expander.warm(queries=queries))
+    except Exception as e:
+        print("Query expansion warm-up error:", e)
+
+if os.getenv('SEARCH_EXPAND_WARM_FILE'):
+    threading.Thread(target=_warm_expansions_from_file, args=(os.getenv('SEARCH_EXPAND_WARM_FILE'),),
+                     name='expand-warm', daemon=True).start()
+
+try:
+    job_engine.expire_stale(int(os.getenv('AI_JOB_STALE_SECONDS', 600)))
+except Exception as e:
+    print(f"警告: 清理过期 AI 任务失败 - {e}")
+
+def _wants_async():
+    """?async=1 时不在请求线程里等待模型，直接返回任务 id"""
+    return request.args.get('async') in ('1', 'true')
+
+def _submit_ai_job(kind, params):
+    try:
+        job_id = job_engine.submit(kind, params, owner_id=session['user']['id'])
+    except QueueFull as e:
+        return error_response(str(e), 503)
+    except UnknownJobKind:
+        return error_response(f"不支持的任务类型: {kind}", 400)
+    except Exception as e:
+        print("Submit AI job error:", e)
+        return error_response(f"提交任务失败: {str(e)}", 500)
+    resp = success_response({
+        'job_id': job_id,
+        'status': 'queued',
+        'poll_url': f"/api/ai/jobs/{job_id}",
+        'stream_url': f"/api/ai/jobs/{job_id}/stream",
+    }, "任务已提交")
+    resp.status_code = 202
+    return resp
+
+def _load_own_job(job_id):
+    """读取任务，只有提交者本人或管理员可以查看；返回 (job, 错误响应)"""
+    job = job_engine.get(job_id)
+    user = session['user']
+    if not job or (job['owner_id'] != user['id'] and user.get('role') != 'admin'):
+        return None, error_response("任务不存在", 404)
+    return job, None
+
+# =========================
+# AI 功能 API
+# =========================
+@app.route('/api/ai/summary', methods=['POST'])
+def ai_summary():
+    """生成校友摘要（?stream=1 以 SSE 流式返回，?async=1 提交为异步任务）"""
+    if not llm:
+        return error_response("LLM 未配置", 500)
+
+    data = request.get_json() or {}
+    if _wants_async():
+        return _submit_ai_job('summary', dict(data, refresh=_llm_refresh()))
+    if _wants_stream():
+        return _sse_response(llm.ask_stream(_summary_prompt(data), tags=_summary_tags(data),
+                                            refresh=_llm_refresh()), 'summary')
     try:
-        text = llm.ask(prompt)
-        return success_response({'summary': text})
+        return success_response(_run_ai_summary(dict(data, refresh=_llm_refresh())))
     except Exception as e:
         print("AI summary error:", e)
         return error_response(f"生成失败: {str(e)}", 500)
 
 @app.route('/api/ai/draft_email', methods=['POST'])
 def ai_draft_email():
-    """生成邮件草稿"""
+    """生成邮件草稿（?stream=1 以 SSE 流式返回，?async=1 提交为异步任务）"""
     if not llm:
         return error_response("LLM 未配置", 500)
 
     data = request.get_json() or {}
-    topic = data.get("topic", "校友活动通知")
-    audience = data.get("audience", "本校校友")
-    style = data.get("style", "正式友好")
-    points = "; ".join(data.get("points", []))
-    prompt = f"""请写一封面向{audience}的邮件草稿，主题为"{topic}"，风格：{style}。
-                    要点：{points}
-                    要求：包含邮件主题建议、称呼、正文（简洁、有行动号召）、落款。"""
+    if _wants_async():
+        return _submit_ai_job('draft_email', dict(data, refresh=_llm_refresh()))
+    if _wants_stream():
+        return _sse_response(llm.ask_stream(_draft_email_prompt(data), refresh=_llm_refresh()), 'draft')
     try:
-        text = llm.ask(prompt)
-        return success_response({'draft': text})
+        return success_response(_run_ai_draft_email(dict(data, refresh=_llm_refresh())))
     except Exception as e:
         print("AI draft email error:", e)
         return error_response(f"生成失败: {str(e)}", 500)
 
 @app.route('/api/ai/search', methods=['GET'])
 def ai_search():
-    """AI 智能搜索"""
+    """AI 智能搜索（?async=1 提交为异步任务，?rerank=0 跳过大模型重排）"""
     if not llm:
         return error_response("LLM 未配置", 500)
 
     q = (request.args.get("q") or "").strip()
     if not q:
         return success_response([])
+    if _wants_async():
+        return _submit_ai_job('search', {'q': q, 'expand': _want_expand(), 'rerank': _want_rerank(),
+                                         'refresh': _llm_refresh()})
 
+    start = time.monotonic()
+    extra_terms = query_expander.expand(q) if _want_expand() else []
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            like = f"%{q}%"
-            cursor.execute("""
-                SELECT id, name, gender, age, phone, email, grad_year, degree, major, city, country,
-                       LEFT(COALESCE(bio,''), 120) AS snippet
-                FROM tb_user
-                WHERE name LIKE %s OR phone LIKE %s OR email LIKE %s
-                   OR major LIKE %s OR city LIKE %s OR country LIKE %s OR bio LIKE %s
-                LIMIT 20
-            """, (like, like, like, like, like, like, like))
-            rows = cursor.fetchall()
-        conn.close()
+        rows = _ai_search_candidates(q, extra_terms)
     except Exception as e:
         return error_response(f"DB 查询失败: {str(e)}", 500)
+    retrieval_ms = round((time.monotonic() - start) * 1000, 1)
+    if not _want_rerank():
+        resp = success_response({'ranked': None, 'candidates': _public_candidates(rows), 'expanded_terms': extra_terms})
+        resp.headers['Server-Timing'] = f"retrieval;dur={retrieval_ms}"
+        return resp
 
-    items_text = "\n".join([
-        f"- id={r['id']}, 姓名={r['name']}, 性别={r.get('gender')}, 年龄={r.get('age')}, 电话={r.get('phone')}, "
-        f"邮箱={r.get('email')}, 专业={r.get('major')}, 城市={r.get('city')}, 国家={r.get('country')}, 摘要={r.get('snippet')}"
-        for r in rows
-    ]) or "（无）"
-
-    prompt = f"""用户搜索：{q}
-    以下是候选（最多20条）：
-{items_text}
-
-    请挑选最相关的前 5 名，并按相关度排序输出，每条给出一句话理由（简短）。
-    输出 JSON 数组，字段：id, reason。不要多余文本。"""
     try:
-        ranked_json = llm.ask(prompt)
-        return success_response({'ranked': ranked_json, 'candidates': rows})
+        ranked_json, info = _ai_search_rank(q, rows, refresh=_llm_refresh())
+        info['retrieval_ms'] = retrieval_ms
+        info['total_ms'] = round((time.monotonic() - start) * 1000, 1)
+        resp = success_response({'ranked': ranked_json, 'candidates': _public_candidates(rows),
+                                 'expanded_terms': extra_terms, 'prompt_stats': info})
+        # 浏览器开发者工具可直接展示各阶段耗时
+        resp.headers['Server-Timing'] = (f"retrieval;dur={retrieval_ms}, llm;dur={info['llm_ms']}, "
+                                         f"total;dur={info['total_ms']}")
+        return resp
     except Exception as e:
         print("AI search error:", e)
         return error_response(f"搜索失败: {str(e)}", 500)
 
+@app.route('/api/ai/jobs', methods=['POST'])
+def create_ai_job():
+    """提交 AI 异步任务：{"kind": "summary|draft_email|search", "params": {...}}"""
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind', '')
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return error_response("params 必须是对象", 400)
+    if kind in ADMIN_JOB_KINDS and session['user'].get('role') != 'admin':
+        return error_response("需要管理员权限", 403)
+    return _submit_ai_job(kind, dict(params, refresh=_llm_refresh()))
+
+@app.route('/api/ai/jobs/<job_id>', methods=['GET'])
+def get_ai_job(job_id):
+    """查询 AI 任务状态与结果"""
+    try:
+        job, err = _load_own_job(job_id)
+    except Exception as e:
+        print("Get AI job error:", e)
+        return error_response(f"查询任务失败: {str(e)}", 500)
+    if err:
+        return err
+    return success_response(job)
+
+@app.route('/api/ai/jobs/<job_id>/stream', methods=['GET'])
+def stream_ai_job(job_id):
+    """以 SSE 推送任务状态变化，完成后发送 event: done（带结果）并结束"""
+    try:
+        job, err = _load_own_job(job_id)
+    except Exception as e:
+        print("Get AI job error:", e)
+        return error_response(f"查询任务失败: {str(e)}", 500)
+    if err:
+        return err
+
+    interval = float(os.getenv('AI_JOB_STREAM_INTERVAL', 0.5))
+    timeout = float(os.getenv('AI_JOB_STREAM_TIMEOUT', 120))
+
+    def generate():
+        current = job
+        last_status = None
+        deadline = time.monotonic() + timeout
+        while True:
+            if current['status'] != last_status:
+                last_status = current['status']
+                if last_status in FINISHED:
+                    yield _sse_event(current, event='done')
+                    return
+                yield _sse_event({'status': last_status}, event='status')
+            if time.monotonic() > deadline:
+                yield _sse_event({'message': "等待超时，请改用轮询"}, event='error')
+                return
+            time.sleep(interval)
+            current = job_engine.get(job_id)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.route('/api/users/<int:user_id>/summary', methods=['GET'])
+def get_user_summary(user_id):
+    """读取预生成的校友摘要（按主键一次查询，不调用大模型）"""
+    try:
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            row = get_summary(cursor, user_id)
+    except Exception as e:
+        return error_response(f"查询失败: {str(e)}", 500)
+    if not row:
+        return error_response("用户不存在", 404)
+    return success_response(row)
+
+@app.route('/api/admin/ai/summaries/rebuild', methods=['POST'])
+@require_admin
+def rebuild_summaries():
+    """提交批量摘要任务：默认只生成缺失或资料已变化的摘要，{"force": true} 全部重新生成"""
+    data = request.get_json(silent=True) or {}
+    limit = data.get('limit')
+    if limit is not None and (not isinstance(limit, int) or limit <= 0):
+        return error_response("limit 必须是正整数", 400)
+    return _submit_ai_job('summary_batch', {'force': bool(data.get('force')), 'limit': limit})
+
+@app.route('/api/admin/ai/summaries/stats', methods=['GET'])
+@require_admin
+def get_summary_stats():
+    """摘要覆盖情况（仅管理员）"""
+    try:
+        return success_response(summary_pipeline.coverage(), "获取摘要统计成功")
+    except Exception as e:
+        print("Get summary stats error:", e)
+        return error_response(f"获取摘要统计失败: {str(e)}", 500)
+
+@app.route('/api/admin/search/expansions', methods=['GET'])
+@require_admin
+def get_expansion_stats():
+    """查询扩展缓存统计与本 worker 最常见的查询（仅管理员）"""
+    k = request.args.get('k', type=int) or 20
+    data = query_expander.stats()
+    data['top_queries'] = query_expander.top_queries(min(k, 500))
+    return success_response(data, "获取查询扩展统计成功")
+
+@app.route('/api/admin/search/expansions/warm', methods=['POST'])
+@require_admin
+def warm_expansions():
+    """预生成查询扩展：{"queries": [...]} 指定查询，或 {"k": 100} 取本 worker 最常见的前 k 个"""
+    data = request.get_json(silent=True) or {}
+    queries = data.get('queries')
+    if queries is not None and (not isinstance(queries, list) or not all(isinstance(q, str) for q in queries)):
+        return error_response("queries 必须是字符串数组", 400)
+    k = data.get('k', 100)
+    if not isinstance(k, int) or k <= 0:
+        return error_response("k 必须是正整数", 400)
+    return _submit_ai_job('expand_warm', {'queries': queries, 'k': k, 'refresh': bool(data.get('refresh'))})
+
+@app.route('/api/admin/ai/jobs/stats', methods=['GET'])
+@require_admin
+def get_ai_job_stats():
+    """AI 任务队列统计：本 worker 的排队 / 执行数、等待与执行耗时，以及全局排队情况（仅管理员）"""
+    try:
+        return success_response(job_engine.stats(), "获取任务统计成功")
+    except Exception as e:
+        print("Get AI job stats error:", e)
+        return error_response(f"获取任务统计失败: {str(e)}", 500)
+
+# =========================
+# 批量导入（仅管理员）
+# =========================
+@app.route('/api/admin/users/import', methods=['POST'])
+@require_admin
+def import_users():
+    """
+    批量导入校友：请求体为 CSV（首行表头）或 JSON Lines，边读边按批写入，不把整个文件读进内存。
+    ?format=csv|jsonl（默认按 Content-Type 判断）、?mode=upsert|skip|insert、?batch_size=1000；
+    请求头 Content-Encoding: gzip 时先解压。?stream=1 时以 SSE 推送每批的进度。
+    """
+    fmt = request.args.get('format') or detect_format(content_type=request.content_type)
+    mode = request.args.get('mode', 'upsert')
+    batch_size = request.args.get('batch_size', type=int) or int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+    if fmt not in FORMATS:
+        return error_response(f"不支持的格式: {fmt}", 400)
+    if mode not in IMPORT_MODES:
+        return error_response(f"不支持的导入模式: {mode}", 400)
+    if not 1 <= batch_size <= 10000:
+        return error_response("batch_size 必须在 1~10000 之间", 400)
+
+    stream = request.stream
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        import gzip
+        stream = gzip.GzipFile(fileobj=stream)
+
+    def on_updated(ids):
+        # 资料被覆盖的校友，其读缓存与 AI 摘要等缓存随之失效；搜索索引按 updated_at 轮询追平
+        read_cache.invalidate(*ids)
+        for user_id in ids:
+            llm.invalidate(f"user:{user_id}")
+
+    importer = BulkImporter(db_pool, batch_size=batch_size, mode=mode, on_updated=on_updated)
+    rows = iter_rows(stream, fmt)
+
+    if _wants_stream():
+        def generate():
+            try:
+                yield ": connected\n\n"
+                for result in importer.iter_run(rows):
+                    yield _sse_event({k: v for k, v in result.items() if k != 'errors'}, event='progress')
+                count_cache.clear()
+                read_cache.invalidate()
+                yield _sse_event(importer.result, event='done')
+            except Exception as e:
+                print("Import users error:", e)
+                yield _sse_event({'message': f"导入失败: {str(e)}"}, event='error')
+
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        })
+
+    try:
+        result = importer.run(rows)
+        count_cache.clear()
+        read_cache.invalidate()
+        return success_response(result, "导入完成")
+    except Exception as e:
+        print("Import users error:", e)
+        return error_response(f"导入失败: {str(e)}", 500)
+
+@app.route('/api/admin/users/export', methods=['GET'])
+@require_admin
+def export_users():
+    """
+    导出校友：?format=csv|jsonl，支持与列表接口相同的 keyword / mode / expand / fields 参数（默认导出全部字段），
+    ?gzip=1 时边导出边压缩。用服务端游标按主键顺序流式读取，内存占用与表大小无关。
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt == 'ndjson':
+        fmt = 'jsonl'
+    if fmt not in export.EXPORT_FORMATS:
+        return error_response(f"不支持的格式: {fmt}", 400)
+    keyword = request.args.get('keyword', '').strip()
+    try:
+        fields = parse_fields(request.args.get('fields'), USER_FIELDS, USER_FIELDS)
+    except PageArgsError as e:
+        return error_response(str(e), 400)
+    mode = request.args.get('mode') or None
+    if mode and mode not in search.SEARCH_MODES:
+        return error_response(f"不支持的搜索模式: {mode}", 400)
+    gzip = request.args.get('gzip') in ('1', 'true')
+    extra_terms = query_expander.expand(keyword) if keyword and _want_expand() else []
+
+    start = time.monotonic()
+
+    def on_done(rows, bytes_out):
+        print(f"Exported {rows} users ({bytes_out} bytes) in {time.monotonic() - start:.1f}s")
+
+    body = export.stream_users(db_pool, fields, fmt, keyword=keyword, mode=mode, extra_terms=extra_terms,
+                               gzip=gzip, on_done=on_done)
+    try:
+        # 先执行查询、取到表头，出错时还能返回正常的错误响应
+        first = next(body)
+    except Exception as e:
+        body.close()
+        print("Export users error:", e)
+        return error_response(f"导出失败: {str(e)}", 500)
+
+    filename = f"alumni-{time.strftime('%Y%m%d-%H%M%S')}.{'csv' if fmt == 'csv' else 'jsonl'}"
+    if gzip:
+        filename += '.gz'
+    resp = Response(itertools.chain([first], body),
+                    mimetype='application/gzip' if gzip else export.CONTENT_TYPES[fmt],
+                    headers={
+                        'Content-Disposition': f'attachment; filename="{filename}"',
+                        'Cache-Control': 'no-store',
+                        'X-Accel-Buffering': 'no',
+                    })
+    # 客户端中途断开时 WSGI 服务器只关闭 chain，不会关闭 body，连接要靠这里归还
+    resp.call_on_close(body.close)
+    return resp
+
 # =========================
 # 错误处理
 # =========================
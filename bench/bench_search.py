@@ -0,0 +1,134 @@
+# bench/bench_search.py
+# 搜索基准：对比 LIKE 全表扫描、ngram 全文索引与进程内倒排索引在不同数据量下的延迟
+#
+# 用法（在项目根目录，需要本地 MySQL 8 / 5.7.6+，会使用独立的 BENCH_DB_NAME 库，不影响业务库）：
+#     python -m bench.bench_search --scales 10000,100000,1000000 --repeat 20 --out bench_search.json
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import pymysql
+import pymysql.cursors
+from dotenv import load_dotenv
+
+from bench import synthetic
+from services import migrations, search
+from services.search_index import InvertedIndex, IndexUnavailable
+
+load_dotenv()
+
+QUERIES = ["张", "王伟", "计算机", "北京", "分布式存储", "算法工程师", "Lucy", "machine learning",
+           "1380000", "user12@example", "不存在的关键词"]
+
+
+def connect(db_name):
+    conn = pymysql.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', 3306)),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        charset='utf8mb4',
+        cursorclass=pymysql.cursors.DictCursor,
+    )
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db_name} DEFAULT CHARACTER SET utf8mb4")
+        cursor.execute(f"USE {db_name}")
+    return conn
+
+
+def ensure_rows(conn, rows):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) AS cnt FROM tb_user")
+        if cursor.fetchone()['cnt'] == rows:
+            return
+    print(f"seeding {rows} rows ...")
+    synthetic.seed(conn, rows)
+    with conn.cursor() as cursor:
+        cursor.execute("ANALYZE TABLE tb_user")
+        cursor.fetchall()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def run_scale(conn, rows, repeat, limit):
+    ensure_rows(conn, rows)
+    fields = ['id', 'name', 'major', 'city', 'country']
+    result = {'rows': rows, 'modes': {}}
+
+    index = InvertedIndex(['id', 'name', 'gender', 'age', 'phone', 'email', 'grad_year', 'degree',
+                           'major', 'city', 'country', 'bio'], max_docs=rows + 1, max_bytes=1 << 40)
+    index.build(conn)
+    result['memory_index'] = index.stats()
+
+    def run_query(cursor, q, mode):
+        if mode != 'memory':
+            return search.search_users(cursor, q, fields, limit=limit, mode=mode)
+        try:
+            return index.search(q, fields, limit=limit)
+        except IndexUnavailable:
+            return {'items': [], 'mode': 'memory-unavailable'}
+
+    for mode in search.SEARCH_MODES:
+        per_query = {}
+        all_ms = []
+        for q in QUERIES:
+            timings = []
+            hits = 0
+            for _ in range(repeat):
+                with conn.cursor() as cursor:
+                    start = time.perf_counter()
+                    page = run_query(cursor, q, mode)
+                    timings.append((time.perf_counter() - start) * 1000)
+                hits = len(page['items'])
+            per_query[q] = {
+                'p50_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'hits': hits,
+                'effective_mode': page['mode'],
+            }
+            all_ms.extend(timings)
+        result['modes'][mode] = {
+            'p50_ms': round(statistics.median(all_ms), 3),
+            'p95_ms': round(percentile(all_ms, 95), 3),
+            'p99_ms': round(percentile(all_ms, 99), 3),
+            'queries': per_query,
+        }
+        print(f"rows={rows:>8} mode={mode:<8} p50={result['modes'][mode]['p50_ms']}ms "
+              f"p95={result['modes'][mode]['p95_ms']}ms")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LIKE / FULLTEXT / 内存索引 搜索基准")
+    parser.add_argument("--scales", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--db", default=os.getenv('BENCH_DB_NAME', 'alumni_bench'))
+    parser.add_argument("--out", default=None, help="结果 JSON 输出文件，默认打印到标准输出")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    try:
+        migrations.migrate(conn)
+        results = [run_scale(conn, int(n), args.repeat, args.limit) for n in args.scales.split(",")]
+    finally:
+        conn.close()
+
+    report = {'benchmark': 'search', 'queries': QUERIES, 'repeat': args.repeat, 'results': results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
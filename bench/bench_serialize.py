@@ -0,0 +1,117 @@
+# bench/bench_serialize.py
+# JSON 编码基准：每 1 万行校友记录（含 datetime 字段）编码为 {code, message, data} 响应的耗时、body 大小与内存峰值
+# 对比原来 jsonify 的编码方式（标准库，ensure_ascii + sort_keys）、services/serializer.py 的各编码器，
+# 以及 iter_envelope 流式编码。不需要数据库。
+#
+# 用法（在项目根目录）：
+#     python -m bench.bench_serialize --rows 10000,100000 --repeat 20 --out bench_serialize.json
+import argparse
+import datetime
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from bench import synthetic
+from services import serializer
+
+COLUMNS = ('name', 'gender', 'age', 'phone', 'email', 'grad_year', 'degree', 'major', 'city', 'country', 'bio')
+
+
+def make_rows(n, seed_value=42):
+    """与 SELECT * FROM tb_user 的 DictCursor 结果相同形状的行"""
+    rng = random.Random(seed_value)
+    base = datetime.datetime(2024, 1, 1)
+    rows = []
+    for i in range(1, n + 1):
+        row = {'id': i, **dict(zip(COLUMNS, synthetic.make_row(i, rng)))}
+        row['created_at'] = base + datetime.timedelta(seconds=i)
+        row['updated_at'] = base + datetime.timedelta(seconds=i * 7)
+        rows.append(row)
+    return rows
+
+
+def _jsonify_like(data):
+    # Flask 默认 JSON provider 的编码参数（非调试模式）
+    return json.dumps({"code": 200, "message": "获取列表成功", "data": data}, default=serializer._default,
+                      ensure_ascii=True, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _stream(rows, limit):
+    # 与 WSGI 服务器一样逐块消费，不拼成完整 body
+    page = serializer.PageStream(iter(rows), limit)
+    return sum(len(chunk) for chunk in serializer.iter_envelope(page, "获取列表成功", tail=page.tail))
+
+
+def candidates():
+    """(名称, 编码器, 编码函数)，编码函数返回 body 字节数；未安装 orjson 时跳过 orjson"""
+    backends = [serializer.JsonSerializer()]
+    if serializer.orjson is not None:
+        backends.append(serializer.OrjsonSerializer())
+    out = [('jsonify', None,
+            lambda rows: len(_jsonify_like({'items': rows, 'next_cursor': None, 'limit': len(rows)})))]
+    for backend in backends:
+        out.append((backend.name, backend,
+                    lambda rows: len(serializer.envelope({'items': rows, 'next_cursor': None, 'limit': len(rows)},
+                                                         "获取列表成功"))))
+        out.append((f"{backend.name}_stream", backend, lambda rows: _stream(rows, len(rows))))
+    return out
+
+
+def run_one(encode, rows, repeat):
+    encode(rows)    # 预热
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = encode(rows)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    encode(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_10k = 10000 / len(rows)
+    return {
+        'ms_per_10k_rows': round(statistics.median(timings) * 1000 * per_10k, 2),
+        'p95_ms': round(sorted(timings)[max(0, int(len(timings) * 0.95) - 1)] * 1000, 2),
+        'bytes': size,
+        'mb_per_s': round(size / statistics.median(timings) / 1e6, 1),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="响应 JSON 编码基准")
+    parser.add_argument("--rows", default="10000,100000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--out", default=None, help="结果 JSON 输出文件，默认打印到标准输出")
+    args = parser.parse_args(argv)
+
+    previous = serializer.get_serializer()
+    results = []
+    try:
+        for n in (int(x) for x in args.rows.split(",")):
+            rows = make_rows(n)
+            for name, backend, encode in candidates():
+                if backend is not None:
+                    serializer.set_serializer(backend)
+                result = {'rows': n, 'encoder': name, **run_one(encode, rows, args.repeat)}
+                print(f"{n:>8} rows  {name:<14} {result['ms_per_10k_rows']:>8} ms/10k  "
+                      f"{result['mb_per_s']:>7} MB/s  peak {result['peak_kb']} KB", file=sys.stderr)
+                results.append(result)
+    finally:
+        serializer.set_serializer(previous)
+
+    report = {'benchmark': 'serialize', 'orjson': serializer.orjson is not None,
+              'repeat': args.repeat, 'results': results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
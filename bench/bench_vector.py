@@ -0,0 +1,90 @@
+# bench/bench_vector.py
+# 向量索引基准：不需要数据库，用仿真数据测量编码、查询（单条 / 批量）与磁盘加载耗时
+#
+# 用法（在项目根目录，需要 numpy）：
+#     python -m bench.bench_vector --scales 10000,100000 --dim 256 --out bench_vector.json
+import argparse
+import json
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from bench import synthetic
+from services.vector_index import VectorIndex
+
+COLUMNS = ('name', 'gender', 'age', 'phone', 'email', 'grad_year', 'degree', 'major', 'city', 'country', 'bio')
+QUERIES = ["分布式存储", "人工智能 深圳", "做芯片设计的校友", "北京 医生", "machine learning",
+           "Data Scientist Seattle", "金融 量化交易", "在上海做产品经理"]
+
+
+def run_scale(rows, dim, repeat, k):
+    rng = random.Random(rows)
+    index = VectorIndex(dim=dim)
+    start = time.perf_counter()
+    for i in range(1, rows + 1):
+        row = dict(zip(COLUMNS, synthetic.make_row(i, rng)))
+        row['id'] = i
+        index.upsert(row)
+    encode_s = time.perf_counter() - start
+    index.ready = True
+
+    single = []
+    for _ in range(repeat):
+        for q in QUERIES:
+            t = time.perf_counter()
+            index.search(q, k=k)
+            single.append((time.perf_counter() - t) * 1000)
+    t = time.perf_counter()
+    for _ in range(repeat):
+        index.search_many(QUERIES, k=k)
+    batch_ms = (time.perf_counter() - t) * 1000 / (repeat * len(QUERIES))
+
+    path = tempfile.mkdtemp(prefix='vector_bench_')
+    try:
+        index.path = path
+        t = time.perf_counter()
+        index.save()
+        save_ms = (time.perf_counter() - t) * 1000
+        t = time.perf_counter()
+        VectorIndex(dim=dim, path=path).load()
+        load_ms = (time.perf_counter() - t) * 1000
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    single.sort()
+    return {
+        'rows': rows,
+        'dim': dim,
+        'memory_mb': index.stats()['memory_mb'],
+        'encode_s': round(encode_s, 2),
+        'search_p50_ms': round(statistics.median(single), 2),
+        'search_p95_ms': round(single[int(0.95 * (len(single) - 1))], 2),
+        'batched_per_query_ms': round(batch_ms, 2),
+        'save_ms': round(save_ms, 1),
+        'mmap_load_ms': round(load_ms, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="向量索引基准")
+    parser.add_argument("--scales", default="10000,100000")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args(argv)
+
+    results = []
+    for rows in (int(x) for x in args.scales.split(",")):
+        result = run_scale(rows, args.dim, args.repeat, args.k)
+        print(json.dumps(result, ensure_ascii=False))
+        results.append(result)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# bench/fake_llm_server.py
+# 本地模拟的 OpenAI 兼容大模型服务，用于测试 LLMClient 与压测 AI 接口（不消耗真实额度）
+#
+# 用法：
+#     python -m bench.fake_llm_server --port 9100 --latency 0.8 --fail-rate 0.1
+# 然后设置：
+#     LLM_BASE_URL=http://127.0.0.1:9100/v1  LLM_API_KEY=fake  LLM_MODEL=fake-model
+#
+# 在代码中启动（测试用）：
+#     server, base_url = start_in_thread(latency=0.05, first_failures=2)
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMConfig:
+    def __init__(self, latency=0.5, jitter=0.0, token_delay=0.02, fail_rate=0.0, fail_status=503,
+                 first_failures=0, retry_after=None):
+        self.latency = latency              # 首 token 前的固定延迟（秒）
+        self.jitter = jitter                # 延迟随机抖动（秒）
+        self.token_delay = token_delay      # 流式输出时每个分片之间的间隔（秒）
+        self.fail_rate = fail_rate          # 随机失败的概率
+        self.fail_status = fail_status      # 失败时返回的状态码（429 / 5xx）
+        self.first_failures = first_failures  # 前 N 个请求固定失败，便于测试重试
+        self.retry_after = retry_after      # 失败响应中携带的 Retry-After 秒数
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "failures": 0, "streams": 0, "prompt_chars": 0}
+
+
+def fake_answer(prompt):
+    """根据提示词生成一个确定性的回答，尽量满足调用方期望的格式"""
+    if "JSON 数组" in prompt and "id" in prompt and "reason" in prompt:
+        ids = re.findall(r"id=(\d+)", prompt)[:5]
+        return json.dumps([{"id": int(i), "reason": "模拟相关"} for i in ids], ensure_ascii=False)
+    if "JSON 对象" in prompt and "摘要" in prompt:
+        ids = re.findall(r"\[id=(\d+)\]", prompt)
+        return json.dumps({i: f"（模拟摘要）校友 {i}" for i in ids}, ensure_ascii=False)
+    if "JSON" in prompt and "关键词" in prompt:
+        q = prompt.rsplit("查询：", 1)[-1].strip() or "校友"
+        return json.dumps([q, q + "方向", q + "相关"], ensure_ascii=False)
+    if "JSON" in prompt:
+        return "[]"
+    head = re.sub(r"\s+", " ", prompt)[:60]
+    return f"（模拟回复）{head}"
+
+
+def _chunks(text, size=4):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def make_handler(cfg):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # 支持 keep-alive，便于验证连接复用
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                with cfg.lock:
+                    return self._send_json(200, dict(cfg.counters))
+            self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send_json(404, {"error": {"message": "not found"}})
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            messages = payload.get("messages") or []
+            prompt = "\n".join(m.get("content", "") for m in messages if m.get("role") == "user")
+
+            with cfg.lock:
+                cfg.counters["requests"] += 1
+                cfg.counters["prompt_chars"] += len(prompt)
+                n = cfg.counters["requests"]
+                fail = n <= cfg.first_failures or random.random() < cfg.fail_rate
+                if fail:
+                    cfg.counters["failures"] += 1
+
+            if fail:
+                headers = {"Retry-After": str(cfg.retry_after)} if cfg.retry_after is not None else None
+                return self._send_json(cfg.fail_status, {"error": {"message": "simulated failure"}}, headers)
+
+            time.sleep(max(0.0, cfg.latency + random.uniform(-cfg.jitter, cfg.jitter)))
+            answer = fake_answer(prompt)
+            model = payload.get("model", "fake-model")
+
+            if payload.get("stream"):
+                with cfg.lock:
+                    cfg.counters["streams"] += 1
+                return self._stream(model, answer)
+
+            self._send_json(200, {
+                "id": f"chatcmpl-fake-{n}",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": answer}}],
+                "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(answer),
+                          "total_tokens": len(prompt) + len(answer)},
+            })
+
+        def _stream(self, model, answer):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for piece in _chunks(answer):
+                    chunk = {"object": "chat.completion.chunk", "model": model,
+                             "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(cfg.token_delay)
+                done = {"object": "chat.completion.chunk", "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端中途断开（取消上游请求）
+                pass
+
+    return Handler
+
+
+def start_in_thread(host="127.0.0.1", port=0, **options):
+    """在后台线程启动服务，返回 (server, base_url)；用完调用 server.shutdown()"""
+    cfg = FakeLLMConfig(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(cfg))
+    server.daemon_threads = True
+    server.config = cfg
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地模拟 OpenAI 兼容大模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--first-failures", type=int, default=0)
+    parser.add_argument("--retry-after", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    cfg = FakeLLMConfig(latency=args.latency, jitter=args.jitter, token_delay=args.token_delay,
+                        fail_rate=args.fail_rate, fail_status=args.fail_status,
+                        first_failures=args.first_failures, retry_after=args.retry_after)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(cfg))
+    server.daemon_threads = True
+    print(f"Fake LLM server on http://{args.host}:{args.port}/v1 (latency={args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
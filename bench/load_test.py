@@ -0,0 +1,678 @@
+# bench/load_test.py
+# 接口压测：在独立的 BENCH_DB_NAME 库中灌入仿真校友数据，启动本地模拟大模型服务与应用，
+# 以固定并发逐个驱动 app_api.py 中的全部路由，输出每个场景的 p50 / p95 / p99 与吞吐（JSON），
+# 便于在不同提交之间对比性能回退或提升。
+#
+# 用法（在项目根目录，需要本地 MySQL / MariaDB）：
+#     python -m bench.load_test --scales 1000,100000 --concurrency 8 --requests 200 --out load.json
+#     python -m bench.load_test --only users_,ai_summary --llm-latency 0.8
+#     python -m bench.load_test --compare load_old.json load.json
+# 应用默认以 gunicorn gthread（--workers / --threads）启动，未安装 gunicorn 时用 Flask 内置服务器（threaded）；
+# 也可以用 --base-url 指向已启动的服务（此时不灌库、不启动模拟大模型，由该服务自己的环境变量决定）。
+#
+# - 写操作场景按顺序编排：先新增、再修改、最后删除本轮新增的校友 / 注册的账户，跑完后数据量不变
+# - 批量导入用与灌库相同的行（按 email 覆盖已有校友），不增加行数
+# - 标记为 heavy 的场景（重建索引、导出全表、批量摘要等）只跑少量请求、并发为 1
+# - AI 场景默认带 Cache-Control: no-cache，测的是真实调用大模型的路径；--llm-cache 时允许命中缓存
+# - 带 check 的场景还校验响应内容（排序、筛选条件、按 id 取回的记录等），内容不对记为 invalid 错误
+import argparse
+import csv
+import importlib.util
+import io
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from dotenv import load_dotenv
+
+from bench import synthetic
+from bench.bench_search import QUERIES, connect, ensure_rows, percentile
+from bench.fake_llm_server import start_in_thread
+from services import migrations
+from services.bulk_import import USER_COLUMNS
+
+load_dotenv()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# =========================
+# 场景
+# =========================
+class Scenario:
+    """
+    一个被压测的请求。path / params / body / data 可以是固定值，也可以是 f(ctx, i, rng) 按请求生成；
+    count 可以是 f(ctx)，按前面场景的结果决定本场景的请求数（例如删除数取决于新增了多少）。
+    """
+    def __init__(self, name, method, path, params=None, body=None, data=None, headers=None,
+                 count=None, concurrency=None, heavy=False, accept=(), prepare=None, after=None,
+                 route=None, llm=False, check=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.params = params
+        self.body = body
+        self.data = data
+        self.headers = headers or {}
+        self.count = count
+        self.concurrency = concurrency
+        self.heavy = heavy
+        self.accept = accept            # 视为正常的非 2xx/3xx 状态码（例如功能未启用时的 400）
+        self.prepare = prepare          # f(session, ctx)：每个请求前执行，不计时
+        self.after = after              # f(ctx, response)：记录本次请求产生的 id 等
+        self.route = route or (path if isinstance(path, str) else None)
+        self.llm = llm
+        self.check = check              # f(ctx, req, response)：响应内容不对时返回问题描述，否则返回 None
+
+    def build(self, ctx, i, rng):
+        def resolve(v):
+            return v(ctx, i, rng) if callable(v) else v
+        headers = dict(self.headers)
+        if self.llm and not ctx['llm_cache']:
+            headers['Cache-Control'] = 'no-cache'
+        return {
+            'method': self.method,
+            'url': ctx['base_url'] + resolve(self.path),
+            'params': resolve(self.params),
+            'json': resolve(self.body),
+            'data': resolve(self.data),
+            'headers': headers,
+        }
+
+    def total(self, ctx, default):
+        n = self.count(ctx) if callable(self.count) else self.count
+        if n is None:
+            n = 3 if self.heavy else default
+        return max(0, n)
+
+
+def _rand_id(ctx, i, rng):
+    return rng.randint(1, ctx['rows'])
+
+
+def _rand_query(ctx, i, rng):
+    return rng.choice(QUERIES)
+
+
+def _profile(ctx, i, rng):
+    user_id = _rand_id(ctx, i, rng)
+    row = synthetic.make_row(user_id, rng)
+    return {'id': user_id, 'name': row[0], 'major': row[7], 'work': row[10].split("，")[0], 'bio': row[10]}
+
+
+def _new_alumnus(ctx, i, rng):
+    row = synthetic.make_row(i, rng)
+    data = dict(zip(USER_COLUMNS, row))
+    # 与灌库数据的 email / phone 不冲突
+    data['email'] = f"load-{ctx['tag']}-{i}@example.com"
+    data['phone'] = f"199{i:08d}"[:11]
+    return data
+
+
+def _take(ctx, key):
+    with ctx['lock']:
+        return ctx[key].pop() if ctx[key] else None
+
+
+def _record(key, field='id'):
+    def after(ctx, resp):
+        if resp is not None and resp.status_code < 300:
+            value = resp.json().get('data', {}).get(field)
+            if value is not None:
+                with ctx['lock']:
+                    ctx[key].append(value)
+    return after
+
+
+def _import_csv(ctx, i, rng):
+    """按 email 覆盖前 N 条灌库数据（与 synthetic.seed 同一随机种子生成），行数不变"""
+    with ctx['lock']:
+        if 'import_body' not in ctx:
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(USER_COLUMNS)
+            seed_rng = random.Random(42)
+            for n in range(1, min(ctx['rows'], ctx['import_rows']) + 1):
+                writer.writerow(synthetic.make_row(n, seed_rng))
+            ctx['import_body'] = buf.getvalue().encode('utf-8')
+        return ctx['import_body']
+
+
+def _login_throwaway(session, ctx):
+    session.cookies.clear()
+    session.post(ctx['base_url'] + '/api/auth/login', json=ctx['credentials'], timeout=ctx['timeout'])
+
+
+def _created(ctx, i, rng):
+    with ctx['lock']:
+        return rng.choice(ctx['created']) if ctx['created'] else 0
+
+
+# =========================
+# 响应校验
+# =========================
+SEARCH_FIELDS = ('name', 'phone', 'email', 'major', 'city', 'country', 'bio')
+
+
+def _data(resp):
+    return resp.json().get('data') or {}
+
+
+def check_page(ctx, req, resp):
+    """按 id 游标分页：id 严格递增且都大于 after，条数不超过 limit，next_cursor 为最后一条的 id"""
+    data = _data(resp)
+    params = req.get('params') or {}
+    limit = int(params.get('limit') or 50)
+    ids = [item['id'] for item in data.get('items', [])]
+    after = int(params.get('after') or 0)
+    if len(ids) > limit:
+        return f"返回 {len(ids)} 条，超过 limit={limit}"
+    if any(b <= a for a, b in zip([after] + ids, ids)):
+        return f"id 不是大于 after={after} 的递增序列: {ids[:10]}"
+    if data.get('next_cursor') is not None and (not ids or data['next_cursor'] != ids[-1]):
+        return f"next_cursor={data['next_cursor']} 与最后一条 id 不一致"
+    return None
+
+
+def check_page_total(ctx, req, resp):
+    total = _data(resp).get('total')
+    if not isinstance(total, int) or total < len(_data(resp).get('items', [])):
+        return f"total 无效: {total!r}"
+    return check_page(ctx, req, resp)
+
+
+def check_like_search(ctx, req, resp):
+    """LIKE 模式：每条结果都有检索字段包含关键词（不区分大小写）"""
+    keyword = req['params']['keyword'].casefold()
+    for item in _data(resp).get('items', []):
+        if not any(keyword in str(item.get(f) or '').casefold() for f in SEARCH_FIELDS):
+            return f"id={item.get('id')} 不包含关键词 {req['params']['keyword']!r}"
+    return None
+
+
+def check_filter(ctx, req, resp):
+    """每条结果满足等值与年份范围条件；指定 sort 时按 (排序列, id) 有序"""
+    params = req['params']
+    items = _data(resp).get('items', [])
+    for item in items:
+        for col in ('city', 'degree', 'major', 'country', 'gender'):
+            if col in params and item.get(col) not in str(params[col]).split(','):
+                return f"id={item.get('id')} 的 {col}={item.get(col)!r} 不满足筛选 {params[col]!r}"
+        year = item.get('grad_year')
+        lo, hi = params.get('grad_year_from'), params.get('grad_year_to')
+        if (lo is not None or hi is not None) and (year is None or (lo is not None and year < int(lo))
+                                                   or (hi is not None and year > int(hi))):
+            return f"id={item.get('id')} 的 grad_year={year!r} 不在 {lo}~{hi} 之间"
+    sort = params.get('sort')
+    if sort:
+        col, desc = sort.lstrip('-'), sort.startswith('-')
+        # MySQL 中 NULL 升序排在最前、降序排在最后
+        keys = [(item.get(col) is not None, item.get(col), item['id']) for item in items]
+        if keys != sorted(keys, reverse=desc):
+            return f"结果没有按 {sort} 排序"
+    return None
+
+
+def check_by_ids(ctx, req, resp):
+    """按传入顺序返回（去重），items 与 missing 合起来正好是请求的 id"""
+    wanted = list(dict.fromkeys(int(x) for x in req['params']['ids'].split(',')))
+    data = _data(resp)
+    got = [item['id'] for item in data.get('items', [])]
+    if got != [i for i in wanted if i in set(got)]:
+        return "items 没有按传入顺序返回"
+    if sorted(got + data.get('missing', [])) != sorted(wanted):
+        return "items 与 missing 合起来不等于请求的 id"
+    return None
+
+
+def check_user(ctx, req, resp):
+    wanted = int(req['url'].rstrip('/').rsplit('/', 1)[-1])
+    got = _data(resp).get('id')
+    return None if got == wanted else f"请求 id={wanted}，返回 id={got}"
+
+
+def check_login(ctx, req, resp):
+    got = _data(resp).get('username')
+    return None if got == ctx['credentials']['username'] else f"登录返回的用户名为 {got!r}"
+
+
+def check_stats(ctx, req, resp):
+    data = _data(resp)
+    dims = (req.get('params') or {}).get('dims')
+    expected = dims.split(',') if dims else ['grad_year', 'city']
+    if not isinstance(data.get('total'), int) or data['total'] < 0:
+        return f"total 无效: {data.get('total')!r}"
+    missing = [d for d in expected if d not in data.get('dims', {})]
+    return f"缺少统计维度: {missing}" if missing else None
+
+
+def scenarios():
+    """按执行顺序排列；写操作场景依赖前面场景记录的 id"""
+    batch_delete_size = 20
+    return [
+        # 基础与认证
+        Scenario('root', 'GET', '/'),
+        Scenario('health', 'GET', '/api/health'),
+        Scenario('auth_current', 'GET', '/api/auth/current'),
+        Scenario('auth_login', 'POST', '/api/auth/login', body=lambda ctx, i, rng: ctx['credentials'],
+                 prepare=lambda s, ctx: s.cookies.clear(), check=check_login),
+        Scenario('auth_register', 'POST', '/api/auth/register',
+                 body=lambda ctx, i, rng: {'username': f"load_{ctx['tag']}_{i}", 'password': 'load123456'},
+                 prepare=lambda s, ctx: s.cookies.clear(), after=_record('registered')),
+        Scenario('auth_logout', 'POST', '/api/auth/logout', prepare=_login_throwaway),
+
+        # 校友读取
+        Scenario('users_list', 'GET', '/api/users', route='/api/users?after',
+                 params=lambda ctx, i, rng: {'limit': 50, 'after': rng.randint(0, ctx['rows'])}, check=check_page),
+        Scenario('users_list_total', 'GET', '/api/users', route='/api/users?with_total',
+                 params={'limit': 50, 'with_total': 1}, check=check_page_total),
+        Scenario('users_search', 'GET', '/api/users', route='/api/users?keyword',
+                 params=lambda ctx, i, rng: {'keyword': _rand_query(ctx, i, rng), 'limit': 20}),
+        Scenario('users_search_like', 'GET', '/api/users', route='/api/users?keyword&mode=like',
+                 params=lambda ctx, i, rng: {'keyword': _rand_query(ctx, i, rng), 'limit': 20, 'mode': 'like'},
+                 check=check_like_search),
+        Scenario('users_search_expand', 'GET', '/api/users', route='/api/users?keyword&expand=1', llm=True,
+                 params=lambda ctx, i, rng: {'keyword': _rand_query(ctx, i, rng), 'limit': 20, 'expand': 1}),
+        Scenario('users_filter', 'GET', '/api/users', route='/api/users?filters',
+                 params=lambda ctx, i, rng: {'city': rng.choice(synthetic.CITIES_CN),
+                                             'degree': rng.choice(synthetic.DEGREES),
+                                             'grad_year_from': 2012, 'grad_year_to': 2020, 'limit': 50},
+                 check=check_filter),
+        Scenario('users_filter_sorted', 'GET', '/api/users', route='/api/users?filters&sort',
+                 params=lambda ctx, i, rng: {'major': rng.choice(synthetic.MAJORS), 'sort': '-grad_year',
+                                             'limit': 50},
+                 check=check_filter),
+        Scenario('users_by_ids', 'GET', '/api/users', route='/api/users?ids',
+                 params=lambda ctx, i, rng: {'ids': ','.join(str(_rand_id(ctx, i, rng)) for _ in range(50))},
+                 check=check_by_ids),
+        Scenario('users_get', 'GET', lambda ctx, i, rng: f"/api/users/{_rand_id(ctx, i, rng)}",
+                 route='/api/users/<id>', check=check_user),
+        Scenario('users_changes', 'GET', '/api/users/changes', params={'limit': 500}),
+        Scenario('stats', 'GET', '/api/stats', route='/api/stats?dims', check=check_stats),
+        Scenario('stats_top', 'GET', '/api/stats', route='/api/stats?dims&top',
+                 params={'dims': 'city,grad_year,city:grad_year', 'top': 20}, check=check_stats),
+        Scenario('user_summary_stored', 'GET', lambda ctx, i, rng: f"/api/users/{_rand_id(ctx, i, rng)}/summary",
+                 route='/api/users/<id>/summary', accept=(404,)),
+
+        # 校友写入：新增 → 修改 → 批量修改 → 删除（本轮新增的校友）
+        Scenario('users_create', 'POST', '/api/users', body=_new_alumnus, after=_record('created')),
+        Scenario('users_update', 'PUT', lambda ctx, i, rng: f"/api/users/{_created(ctx, i, rng)}",
+                 route='/api/users/<id>', body=lambda ctx, i, rng: {'city': rng.choice(synthetic.CITIES_CN)},
+                 count=lambda ctx: len(ctx['created']) and ctx['default_requests']),
+        Scenario('users_patch', 'PATCH', '/api/users',
+                 body=lambda ctx, i, rng: {'items': [{'id': _created(ctx, i, rng), 'age': rng.randint(22, 60)}
+                                                     for _ in range(10)]},
+                 count=lambda ctx: len(ctx['created']) and ctx['default_requests']),
+        Scenario('users_delete', 'DELETE', lambda ctx, i, rng: f"/api/users/{_take(ctx, 'created')}",
+                 route='/api/users/<id>', count=lambda ctx: len(ctx['created']) // 2),
+        Scenario('users_batch_delete', 'DELETE', '/api/users', route='/api/users?ids',
+                 params=lambda ctx, i, rng: {'ids': ','.join(
+                     str(x) for x in filter(None, (_take(ctx, 'created') for _ in range(batch_delete_size))))},
+                 count=lambda ctx: -(-len(ctx['created']) // batch_delete_size)),
+
+        # 大模型接口（经由本地模拟服务）
+        Scenario('ai_summary', 'POST', '/api/ai/summary', body=_profile, llm=True),
+        Scenario('ai_summary_stream', 'POST', '/api/ai/summary', route='/api/ai/summary?stream=1',
+                 params={'stream': 1}, body=_profile, llm=True),
+        Scenario('ai_draft_email', 'POST', '/api/ai/draft_email', llm=True,
+                 body={'topic': "返校日活动", 'points': ["时间地点", "报名方式"]}),
+        Scenario('ai_draft_email_stream', 'POST', '/api/ai/draft_email', route='/api/ai/draft_email?stream=1',
+                 params={'stream': 1}, llm=True, body={'topic': "校友会年会", 'points': ["议程"]}),
+        Scenario('ai_search', 'GET', '/api/ai/search', llm=True,
+                 params=lambda ctx, i, rng: {'q': _rand_query(ctx, i, rng)}),
+        Scenario('ai_search_norerank', 'GET', '/api/ai/search', route='/api/ai/search?rerank=0', llm=True,
+                 params=lambda ctx, i, rng: {'q': _rand_query(ctx, i, rng), 'rerank': 0}),
+        Scenario('ai_jobs_submit', 'POST', '/api/ai/jobs', llm=True, after=_record('jobs', 'job_id'),
+                 body=lambda ctx, i, rng: {'kind': 'summary', 'params': _profile(ctx, i, rng)}),
+        Scenario('ai_job_get', 'GET', lambda ctx, i, rng: f"/api/ai/jobs/{rng.choice(ctx['jobs'])}",
+                 route='/api/ai/jobs/<id>', count=lambda ctx: len(ctx['jobs']) and ctx['default_requests']),
+        Scenario('ai_job_stream', 'GET', lambda ctx, i, rng: f"/api/ai/jobs/{_take(ctx, 'jobs')}/stream",
+                 route='/api/ai/jobs/<id>/stream', count=lambda ctx: len(ctx['jobs'])),
+
+        # 管理接口
+        Scenario('admin_users', 'GET', '/api/admin/users', check=check_page),
+        Scenario('admin_user_toggle', 'POST', lambda ctx, i, rng: f"/api/admin/users/{ctx['registered'][i]}/toggle",
+                 route='/api/admin/users/<id>/toggle', count=lambda ctx: len(ctx['registered'])),
+        Scenario('admin_user_delete', 'DELETE', lambda ctx, i, rng: f"/api/admin/users/{_take(ctx, 'registered')}",
+                 route='/api/admin/users/<id>', count=lambda ctx: len(ctx['registered'])),
+        Scenario('admin_db_pool', 'GET', '/api/admin/db/pool'),
+        Scenario('metrics', 'GET', '/api/metrics'),
+        Scenario('admin_metrics_slow', 'GET', '/api/admin/metrics/slow'),
+        Scenario('admin_sessions_stats', 'GET', '/api/admin/sessions/stats'),
+        Scenario('admin_read_cache', 'GET', '/api/admin/read_cache'),
+        Scenario('admin_read_cache_invalidate', 'POST', '/api/admin/read_cache/invalidate', body={}, heavy=True),
+        Scenario('admin_llm_stats', 'GET', '/api/admin/llm/stats'),
+        Scenario('admin_llm_cache_invalidate', 'POST', '/api/admin/llm/cache/invalidate',
+                 body=lambda ctx, i, rng: {'tag': f"user:{_rand_id(ctx, i, rng)}"}),
+        Scenario('admin_search_index', 'GET', '/api/admin/search_index', accept=(400,)),
+        Scenario('admin_vector_index', 'GET', '/api/admin/vector_index', accept=(400,)),
+        Scenario('admin_summaries_stats', 'GET', '/api/admin/ai/summaries/stats'),
+        Scenario('admin_expansions', 'GET', '/api/admin/search/expansions'),
+        Scenario('admin_expansions_warm', 'POST', '/api/admin/search/expansions/warm', heavy=True, llm=True,
+                 body={'queries': QUERIES[:5]}),
+        Scenario('admin_summaries_rebuild', 'POST', '/api/admin/ai/summaries/rebuild', heavy=True, llm=True,
+                 body={'limit': 20}),
+        Scenario('admin_ai_jobs_stats', 'GET', '/api/admin/ai/jobs/stats'),
+        Scenario('admin_search_index_check', 'POST', '/api/admin/search_index/check', heavy=True, accept=(400,)),
+        Scenario('admin_search_index_rebuild', 'POST', '/api/admin/search_index/rebuild', heavy=True,
+                 accept=(400,)),
+        Scenario('admin_vector_index_rebuild', 'POST', '/api/admin/vector_index/rebuild', heavy=True,
+                 accept=(400,)),
+        Scenario('admin_stats_rebuild', 'POST', '/api/admin/stats/rebuild', heavy=True),
+        Scenario('admin_import', 'POST', '/api/admin/users/import', heavy=True,
+                 params={'format': 'csv', 'mode': 'upsert'}, headers={'Content-Type': 'text/csv'},
+                 data=_import_csv),
+        Scenario('admin_export', 'GET', '/api/admin/users/export', heavy=True, params={'format': 'csv'}),
+    ]
+
+
+# =========================
+# 执行
+# =========================
+def run_scenario(ctx, sc, cookies, concurrency, default_requests, duration=None):
+    """固定并发：concurrency 个线程共同完成 n 个请求（或在 duration 秒内尽量多地发请求）"""
+    n = sc.total(ctx, default_requests)
+    if n == 0:
+        return None
+    concurrency = 1 if sc.heavy else min(sc.concurrency or concurrency, n)
+    counter = itertools.count()
+    # 请求数由前面场景决定的（删除本轮新增的校友等）不按时长跑
+    timed = duration and not sc.heavy and sc.count is None
+    deadline = time.monotonic() + duration if timed else None
+    latencies, statuses, failures = [], {}, []
+    lock = threading.Lock()
+
+    def worker(k):
+        rng = random.Random(f"{sc.name}:{k}")
+        session = requests.Session()
+        session.cookies.update(cookies)
+        while True:
+            i = next(counter)
+            if (deadline is None and i >= n) or (deadline is not None and time.monotonic() > deadline):
+                return
+            if sc.prepare:
+                sc.prepare(session, ctx)
+            req = sc.build(ctx, i, rng)
+            start = time.perf_counter()
+            resp = None
+            try:
+                resp = session.request(timeout=ctx['timeout'], **req)
+                _ = resp.content            # 流式响应计到读完全部正文
+                status = resp.status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            ok = isinstance(status, int) and (status < 400 or status in sc.accept)
+            problem = None
+            if ok and sc.check and status < 300:
+                try:
+                    problem = sc.check(ctx, req, resp)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    problem = f"响应格式不对: {type(e).__name__}: {e}"
+                if problem:
+                    ok, status = False, 'invalid'
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if not ok and len(failures) < 5:
+                    failures.append({'status': status,
+                                     'body': problem or (resp.text[:200] if resp is not None else '')})
+            if sc.after and ok:
+                sc.after(ctx, resp)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(k,), daemon=True) for k in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    ms = [v * 1000 for v in latencies]
+    errors = sum(c for s, c in statuses.items()
+                 if not (s.isdigit() and (int(s) < 400 or int(s) in sc.accept)))
+    return {
+        'method': sc.method,
+        'route': sc.route,
+        'requests': len(ms),
+        'concurrency': concurrency,
+        'errors': errors,
+        'status': statuses,
+        'throughput_rps': round(len(ms) / wall, 2) if wall else None,
+        'mean_ms': round(sum(ms) / len(ms), 3),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'max_ms': round(max(ms), 3),
+        'failures': failures,
+    }
+
+
+def _selected(name, only, exclude):
+    if only and not any(name.startswith(p) for p in only):
+        return False
+    return not any(name.startswith(p) for p in exclude)
+
+
+def run_all(ctx, args):
+    login = requests.post(ctx['base_url'] + '/api/auth/login', json=ctx['credentials'], timeout=ctx['timeout'])
+    if login.status_code != 200:
+        raise SystemExit(f"管理员登录失败: {login.status_code} {login.text[:200]}")
+    cookies = login.cookies
+
+    only = [p for p in (args.only or '').split(',') if p]
+    exclude = [p for p in (args.exclude or '').split(',') if p]
+    results = {}
+    for sc in scenarios():
+        if not _selected(sc.name, only, exclude) or (sc.heavy and args.skip_heavy):
+            continue
+        result = run_scenario(ctx, sc, cookies, args.concurrency, args.requests, args.duration)
+        if result is None:
+            continue
+        results[sc.name] = result
+        print(f"  {sc.name:<30} n={result['requests']:<5} c={result['concurrency']:<3} "
+              f"p50={result['p50_ms']:>9}ms p95={result['p95_ms']:>9}ms p99={result['p99_ms']:>9}ms "
+              f"rps={result['throughput_rps']:<8} errors={result['errors']}")
+    return results
+
+
+# =========================
+# 环境：数据库、模拟大模型、应用进程
+# =========================
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_app(args, llm_base_url, metrics_dir):
+    port = _free_port()
+    env = dict(os.environ,
+               DB_NAME=args.db,
+               LLM_BASE_URL=llm_base_url,
+               LLM_API_KEY='fake',
+               LLM_MODEL='fake-model',
+               METRICS_DIR=metrics_dir,
+               PYTHONUNBUFFERED='1')
+    server = args.server
+    if server == 'auto':
+        server = 'gunicorn' if importlib.util.find_spec('gunicorn') else 'flask'
+    if server == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '-k', 'gthread',
+               '--threads', str(args.threads), '-b', f"127.0.0.1:{port}", '--timeout', '300', 'app_api:app']
+    else:
+        cmd = [sys.executable, '-c',
+               f"from app_api import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    log = open(os.path.join(metrics_dir, 'server.log'), 'w', encoding='utf-8')
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"应用启动失败，日志见 {log.name}")
+        try:
+            if requests.get(base_url + '/api/health', timeout=2).status_code == 200:
+                return proc, base_url, server
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise SystemExit(f"应用在 {args.startup_timeout}s 内未就绪，日志见 {log.name}")
+
+
+def stop_app(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scale(args, rows):
+    ctx = {
+        'rows': rows,
+        'tag': f"{int(time.time())}{random.randint(100, 999)}",
+        'credentials': {'username': args.username, 'password': args.password},
+        'llm_cache': args.llm_cache,
+        'timeout': args.timeout,
+        'default_requests': args.requests,
+        'import_rows': args.import_rows,
+        'lock': threading.Lock(),
+        'created': [], 'registered': [], 'jobs': [],
+    }
+    result = {'rows': rows}
+    if args.base_url:
+        ctx['base_url'] = args.base_url.rstrip('/')
+        result['scenarios'] = run_all(ctx, args)
+        return result
+
+    conn = connect(args.db)
+    try:
+        migrations.migrate(conn)
+        ensure_rows(conn, rows)
+    finally:
+        conn.close()
+
+    llm_server, llm_base_url = start_in_thread(latency=args.llm_latency, jitter=args.llm_jitter,
+                                               token_delay=args.llm_token_delay)
+    metrics_dir = tempfile.mkdtemp(prefix='ams_load_')
+    proc, ctx['base_url'], result['server'] = start_app(args, llm_base_url, metrics_dir)
+    try:
+        result['scenarios'] = run_all(ctx, args)
+    finally:
+        stop_app(proc)
+        llm_server.shutdown()
+    result['server_log'] = os.path.join(metrics_dir, 'server.log')
+    return result
+
+
+# =========================
+# 对比两次结果
+# =========================
+def compare(old_path, new_path, threshold):
+    """逐场景对比 p50 / p95 / p99 与吞吐，变慢超过 threshold（比例）的场景标为 REGRESSION"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    old_by_rows = {r['rows']: r['scenarios'] for r in old['results']}
+    regressions = 0
+    print(f"{old_path} ({old.get('commit')}) -> {new_path} ({new.get('commit')})")
+    for r in new['results']:
+        before = old_by_rows.get(r['rows'])
+        if before is None:
+            continue
+        print(f"rows={r['rows']}")
+        for name, cur in r['scenarios'].items():
+            prev = before.get(name)
+            if prev is None:
+                continue
+            deltas = {k: (cur[k] - prev[k]) / prev[k] if prev[k] else 0.0 for k in ('p50_ms', 'p95_ms', 'p99_ms')}
+            worse = deltas['p95_ms'] > threshold
+            regressions += worse
+            print(f"  {name:<30} " + " ".join(f"{k[:3]} {prev[k]:>9}->{cur[k]:<9}({deltas[k]:+.0%})" for k in deltas)
+                  + f" rps {prev['throughput_rps']}->{cur['throughput_rps']}" + ("  REGRESSION" if worse else ""))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="全部接口的固定并发压测")
+    parser.add_argument("--scales", default="1000,100000", help="校友行数，逗号分隔（1000~1000000）")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求数（heavy 场景固定为 3）")
+    parser.add_argument("--duration", type=float, default=None, help="每个场景持续的秒数，设置后忽略 --requests")
+    parser.add_argument("--only", default=None, help="只跑名称以这些前缀开头的场景，逗号分隔")
+    parser.add_argument("--exclude", default=None, help="跳过名称以这些前缀开头的场景，逗号分隔")
+    parser.add_argument("--skip-heavy", action="store_true", help="跳过重建索引、导出全表等 heavy 场景")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--db", default=os.getenv('BENCH_DB_NAME', 'alumni_bench'))
+    parser.add_argument("--base-url", default=None, help="压测已启动的服务，不灌库、不启动应用")
+    parser.add_argument("--username", default='admin')
+    parser.add_argument("--password", default='admin123')
+    parser.add_argument("--server", choices=('auto', 'gunicorn', 'flask'), default='auto')
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--startup-timeout", type=float, default=120, help="等待应用就绪（含建索引）的秒数")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="模拟大模型首 token 前的延迟（秒）")
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--llm-token-delay", type=float, default=0.01)
+    parser.add_argument("--llm-cache", action="store_true", help="AI 场景允许命中 LLM 缓存")
+    parser.add_argument("--import-rows", type=int, default=5000, help="批量导入场景每次上传的行数")
+    parser.add_argument("--out", default=None, help="结果 JSON 输出文件，默认打印到标准输出")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="对比两次压测结果")
+    parser.add_argument("--threshold", type=float, default=0.2, help="--compare 时 p95 变慢多少算回退")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    results = []
+    for n in args.scales.split(","):
+        rows = int(n)
+        print(f"rows={rows}")
+        results.append(run_scale(args, rows))
+
+    report = {
+        'benchmark': 'load',
+        'commit': _git_commit(),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'config': {
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'duration': args.duration,
+            'server': args.server,
+            'workers': args.workers,
+            'threads': args.threads,
+            'llm_latency': args.llm_latency,
+            'llm_token_delay': args.llm_token_delay,
+            'llm_cache': args.llm_cache,
+            'base_url': args.base_url,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# bench/synthetic.py
+# 生成仿真校友数据（中英文混合），供基准测试和压测灌库使用
+import random
+
+from services import alumni_stats, migrations
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+GIVEN = "伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英华飞玉萍红娥玲芬鹏辉斌宇浩凯健俊帆帅旭宁龙林欣晨瑶琳雪婷倩颖思睿博文昊然子涵梓轩一诺浩宇"
+EN_FIRST = ["Lucy", "James", "Emma", "Oliver", "Mia", "Noah", "Ava", "Liam", "Sophia", "Ethan",
+            "Chloe", "Lucas", "Grace", "Henry", "Ella", "Jack", "Amelia", "Leo", "Ruby", "Kevin"]
+EN_LAST = ["Smith", "Johnson", "Brown", "Taylor", "Wilson", "Lee", "Chen", "Wang", "Zhang", "Liu"]
+
+MAJORS = ["计算机科学", "软件工程", "人工智能", "通信工程", "电子信息工程", "自动化", "数学与应用数学",
+          "统计学", "金融学", "会计学", "工商管理", "市场营销", "国际贸易", "法学", "汉语言文学",
+          "英语", "新闻学", "机械工程", "土木工程", "建筑学", "临床医学", "生物科学", "化学", "物理学",
+          "Computer Science", "Data Science", "Economics", "Mechanical Engineering"]
+DEGREES = ["本科", "本科", "本科", "硕士", "硕士", "博士", "专科"]
+CITIES_CN = ["北京", "上海", "深圳", "广州", "杭州", "成都", "南京", "武汉", "西安", "苏州", "天津",
+             "重庆", "长沙", "郑州", "青岛", "厦门", "合肥", "济南", "大连", "宁波"]
+CITIES_ABROAD = [("New York", "USA"), ("San Francisco", "USA"), ("Seattle", "USA"), ("London", "UK"),
+                 ("Singapore", "Singapore"), ("Tokyo", "Japan"), ("Sydney", "Australia"),
+                 ("Toronto", "Canada"), ("Berlin", "Germany"), ("Hong Kong", "中国")]
+ROLES = ["后端工程师", "前端工程师", "算法工程师", "数据分析师", "产品经理", "项目经理", "架构师",
+         "研究员", "大学教师", "咨询顾问", "投资经理", "律师", "医生", "创业者", "运营总监",
+         "Software Engineer", "Data Scientist", "Product Manager"]
+TOPICS = ["分布式存储", "云计算", "推荐系统", "NLP/LLM", "计算机视觉", "5G 网络优化", "芯片设计",
+          "量化交易", "风险控制", "供应链管理", "跨境电商", "新能源汽车", "智能制造", "生物医药",
+          "React/Flask", "Kubernetes", "数据库内核", "搜索引擎", "在线教育", "游戏开发",
+          "machine learning", "distributed systems", "fintech"]
+COMPANIES = ["腾讯", "阿里巴巴", "字节跳动", "华为", "百度", "美团", "京东", "小米", "网易", "招商银行",
+             "中国移动", "国家电网", "Google", "Microsoft", "Amazon", "Apple"]
+
+
+def make_row(i, rng=random):
+    """生成第 i 条校友记录，字段与 tb_user 插入列一致"""
+    if rng.random() < 0.12:
+        name = f"{rng.choice(EN_FIRST)} {rng.choice(EN_LAST)}"
+    else:
+        name = rng.choice(SURNAMES) + "".join(rng.choice(GIVEN) for _ in range(rng.choice((1, 2))))
+    if rng.random() < 0.15:
+        city, country = rng.choice(CITIES_ABROAD)
+    else:
+        city, country = rng.choice(CITIES_CN), "中国"
+    grad_year = rng.randint(1985, 2024)
+    age = max(20, 2026 - grad_year + 22 + rng.randint(-2, 3))
+    bio = "，".join([
+        f"{rng.choice(COMPANIES)}{rng.choice(ROLES)}",
+        f"专注{rng.choice(TOPICS)}与{rng.choice(TOPICS)}",
+        f"{rng.randint(1, 25)}年行业经验",
+    ])
+    return (
+        name,
+        rng.choice(("男", "女")),
+        age,
+        f"1{rng.choice('3578')}{i:09d}"[:11],
+        f"user{i}@example.com",
+        grad_year,
+        rng.choice(DEGREES),
+        rng.choice(MAJORS),
+        city,
+        country,
+        bio,
+    )
+
+
+INSERT_SQL = """
+INSERT INTO tb_user (name, gender, age, phone, email, grad_year, degree, major, city, country, bio)
+VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+"""
+
+
+def seed(conn, rows, batch_size=5000, truncate=True, seed_value=42, progress=True):
+    """向当前库的 tb_user 灌入 rows 条仿真数据（可复现：固定随机种子）"""
+    rng = random.Random(seed_value)
+    with conn.cursor() as cursor:
+        if truncate:
+            # alumni_summary（迁移 6）有外键引用 tb_user，TRUNCATE 前需关闭外键检查；依附于校友的表一并清空
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for table in ('alumni_summary', 'tb_user_tombstone', 'tb_user'):
+                if migrations.table_exists(cursor, table):
+                    cursor.execute(f"TRUNCATE TABLE {table}")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        batch = []
+        for i in range(1, rows + 1):
+            batch.append(make_row(i, rng))
+            if len(batch) >= batch_size:
+                cursor.executemany(INSERT_SQL, batch)
+                conn.commit()
+                batch.clear()
+                if progress:
+                    print(f"  seeded {i}/{rows}", end="\r", flush=True)
+        if batch:
+            cursor.executemany(INSERT_SQL, batch)
+            conn.commit()
+    if progress:
+        print(f"  seeded {rows}/{rows}")
+    # 灌库绕过了增量维护，重算校友统计（迁移 9 之后）
+    with conn.cursor() as cursor:
+        has_stats = migrations.table_exists(cursor, 'tb_user_stats')
+    if has_stats:
+        alumni_stats.rebuild(conn)
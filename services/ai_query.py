@@ -1,6 +1,13 @@
 # services/ai_query.py
+# 查询扩展：让大模型把用户查询扩写为若干相关关键词，供搜索时与原词一起做一次"或"匹配
+# - 结果按规范化后的查询缓存（TTL + LRU，或 Redis 多 worker 共享），只有冷查询才多一次大模型往返
+# - 记录本进程的查询频次，可为最常见的 K 个查询预先生成扩展
+# - 所有调用共用一个 LLMClient（进程级连接池），不再每次新建
 import json
-from .llm_client import LLMClient   # ← 这里改成 .llm_client
+import threading
+
+from .kv_store import MemoryStore, hit_ratio
+from .llm_client import LLMClient
 
 _PROMPT = """把下面的中文查询扩写为若干相关关键词，输出 JSON 数组，例如：
 ["分布式存储","对象存储","一致性","副本","CAP"]
@@ -8,20 +15,145 @@ _PROMPT = """把下面的中文查询扩写为若干相关关键词，输出 JSO
 查询：{q}
 """
 
-def ai_expand_query(q: str):
-    client = LLMClient()
+# 大模型调用失败时也缓存一小段时间，避免故障期间每个请求都去重试
+FAILURE_TTL = 60
+
+
+def normalize_query(q):
+    """去掉首尾空白、合并连续空白、英文转小写"""
+    return " ".join((q or "").split()).lower()
+
+
+def parse_keywords(text, max_terms=8):
+    """从模型输出中取出 JSON 数组，去重并过滤过短 / 过长的词；格式不对时返回 None"""
+    left, right = (text or "").find("["), (text or "").rfind("]")
+    if left == -1 or right == -1 or left >= right:
+        return None
     try:
-        text = client.ask(_PROMPT.format(q=q))
-        left, right = text.find("["), text.rfind("]")
-        if left != -1 and right != -1 and left < right:
-            arr = json.loads(text[left:right+1])
-            seen, out = set(), []
-            for w in arr:
-                w = (w or "").strip()
-                if 1 < len(w) <= 12 and w not in seen:
-                    seen.add(w); out.append(w)
-            return out[:8]
-    except Exception:
-        pass
+        arr = json.loads(text[left:right + 1])
+    except ValueError:
+        return None
+    seen, out = set(), []
+    for w in arr:
+        w = (w if isinstance(w, str) else "").strip()
+        if 1 < len(w) <= 12 and w not in seen:
+            seen.add(w); out.append(w)
+    return out[:max_terms]
+
+
+class QueryExpander:
+    def __init__(self, client, store, ttl=7 * 86400, max_terms=8, track_queries=5000):
+        self.client = client
+        self.store = store
+        self.ttl = ttl
+        self.max_terms = max_terms
+        self.track_queries = track_queries
+        self._lock = threading.Lock()
+        self._freq = {}         # 规范化查询 -> 本进程内的出现次数
+        self._stats = {'hits': 0, 'misses': 0, 'failures': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _track(self, norm):
+        with self._lock:
+            self._freq[norm] = self._freq.get(norm, 0) + 1
+            if len(self._freq) > self.track_queries:
+                # 超出上限时丢掉出现次数较少的一半
+                keep = sorted(self._freq.items(), key=lambda kv: kv[1], reverse=True)[:self.track_queries // 2]
+                self._freq = dict(keep)
+
+    @staticmethod
+    def _key(norm):
+        return f"expand:{norm}"
+
+    def _generate(self, norm):
+        try:
+            terms = parse_keywords(self.client.ask(_PROMPT.format(q=norm)), self.max_terms)
+        except Exception as e:
+            print("Query expansion error:", e)
+            terms = None
+        if terms is None:
+            self._count('failures')
+            self.store.set(self._key(norm), [], ttl=FAILURE_TTL)
+            return []
+        self.store.set(self._key(norm), terms, ttl=self.ttl)
+        return terms
+
+    def expand(self, q, refresh=False):
+        """返回扩展关键词列表（不含原查询本身）；失败时返回空列表，调用方按原查询搜索即可"""
+        norm = normalize_query(q)
+        if not norm:
+            return []
+        self._track(norm)
+        if not refresh:
+            cached = self.store.get(self._key(norm))
+            if cached is not None:
+                self._count('hits')
+                return [t for t in cached if t != norm]
+        self._count('misses')
+        return [t for t in self._generate(norm) if t != norm]
+
+    def top_queries(self, k=20):
+        with self._lock:
+            items = sorted(self._freq.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [{'query': q, 'count': c} for q, c in items]
+
+    def warm(self, queries=None, k=100, refresh=False):
+        """
+        预先生成扩展：queries 为空时取本进程最常见的前 k 个查询。
+        已缓存的查询跳过（refresh=True 时重新生成）。
+        """
+        if not queries:
+            queries = [item['query'] for item in self.top_queries(k)]
+        result = {'total': 0, 'cached': 0, 'generated': 0, 'failed': 0}
+        for q in queries:
+            norm = normalize_query(q)
+            if not norm:
+                continue
+            result['total'] += 1
+            if not refresh and self.store.get(self._key(norm)) is not None:
+                result['cached'] += 1
+                continue
+            if self._generate(norm):
+                result['generated'] += 1
+            else:
+                result['failed'] += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['tracked_queries'] = len(self._freq)
+        data['hit_ratio'] = hit_ratio(data)
+        data['store'] = self.store.stats()
+        return data
+
+
+_default_expander = None
+_default_lock = threading.Lock()
+
+
+def get_default_expander():
+    """进程内共享的默认扩展器（进程内 LRU 缓存）"""
+    global _default_expander
+    if _default_expander is None:
+        with _default_lock:
+            if _default_expander is None:
+                _default_expander = QueryExpander(LLMClient(), MemoryStore(max_entries=5000))
+    return _default_expander
+
+
+def set_default_expander(expander):
+    global _default_expander
+    _default_expander = expander
+
+
+def ai_expand_query(q: str):
+    """兼容旧接口：返回 [原查询, 扩展词...]"""
     q = (q or "").strip()
-    return [q] if q else []
+    if not q:
+        return []
+    terms = get_default_expander().expand(q)
+    return [q] + [t for t in terms if t != q][:7]
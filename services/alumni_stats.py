@@ -0,0 +1,249 @@
+# services/alumni_stats.py
+# 校友统计（仪表盘）：
+# - tb_user_stats（迁移 9）按 (维度, 取值) 保存人数：单维度 grad_year / degree / major / city / country / gender，
+#   交叉维度（如 city:grad_year）以及总人数；读取代价与桶数成正比，不扫描 tb_user
+# - 新增 / 修改 / 删除校友时，在同一事务中按变更前后的取值对相应的桶 ±1（cnt = cnt + n，不先加锁读取）
+# - 每个桶拆成 SHARDS 个分片行（迁移 15），每个写事务随机选一个分片：总人数等热点桶不再让所有写事务排队，
+#   读取时按桶求和；同一事务内按主键顺序写入，写事务之间不会因加锁顺序不同而死锁
+# - rebuild 用 GROUP BY 全量重算纠偏，不锁统计表：在同一个一致性快照中读 tb_user 与各桶当前的合计，
+#   两者之差就是漂移量，再以增量方式补到分片 0 上，与并发写入的增量可交换，重算期间校友写入不等待
+# - 取值按二进制比较（k1 / k2 为 utf8mb4_bin），'Beijing' 与 'beijing' 是两个桶，NULL 与空串同为"未填写"
+import random
+import time
+from collections import Counter
+
+DIMENSIONS = ('grad_year', 'degree', 'major', 'city', 'country', 'gender')
+CROSSTABS = (('city', 'grad_year'), ('major', 'grad_year'), ('degree', 'grad_year'), ('country', 'city'))
+INT_DIMENSIONS = ('grad_year',)
+# 以 _ 开头的维度不对外返回
+TOTAL = '_total'
+REBUILT_AT = '_rebuilt_at'
+LOCK_NAME = 'alumni_stats_rebuild'
+SHARDS = 16
+
+
+def crosstab_name(cols):
+    return ':'.join(cols)
+
+
+AVAILABLE = DIMENSIONS + tuple(crosstab_name(c) for c in CROSSTABS)
+
+
+class StatsArgsError(ValueError):
+    pass
+
+
+def _key(value):
+    return '' if value is None else str(value)
+
+
+def buckets(row):
+    """一位校友（含 DIMENSIONS 各列的 dict）所在的全部计数桶 (维度, k1, k2)"""
+    keys = [(TOTAL, '', '')]
+    keys += [(d, _key(row.get(d)), '') for d in DIMENSIONS]
+    keys += [(crosstab_name((a, b)), _key(row.get(a)), _key(row.get(b))) for a, b in CROSSTABS]
+    return keys
+
+
+def deltas(before=(), after=()):
+    """before / after 为变更前后的校友行，返回 {桶: 增减}；前后相同的桶相互抵消"""
+    counter = Counter()
+    for row in before:
+        for key in buckets(row):
+            counter[key] -= 1
+    for row in after:
+        for key in buckets(row):
+            counter[key] += 1
+    return {k: v for k, v in counter.items() if v}
+
+
+# =========================
+# 增量更新（在写校友的事务中调用）
+# =========================
+def lock_rows(cursor, user_ids):
+    """变更前读取并锁定这些校友的统计列，返回 {id: 行}；不存在的 id 不在结果中"""
+    if not user_ids:
+        return {}
+    cursor.execute(f"""
+        SELECT id, {', '.join(DIMENSIONS)} FROM tb_user
+        WHERE id IN ({', '.join(['%s'] * len(user_ids))}) FOR UPDATE
+    """, list(user_ids))
+    return {r['id']: r for r in cursor.fetchall()}
+
+
+def apply(cursor, delta, shard=None):
+    """把 delta 加到一个分片上（默认随机）；分片行的 cnt 可以为负，按桶求和才是人数"""
+    if not delta:
+        return
+    shard = random.randrange(SHARDS) if shard is None else shard
+    cursor.executemany("""
+        INSERT INTO tb_user_stats (dim, k1, k2, shard, cnt) VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt)
+    """, [key + (shard, n) for key, n in sorted(delta.items())])
+
+
+def record(cursor, before=(), after=()):
+    """按变更前后的校友行更新计数"""
+    apply(cursor, deltas(before, after))
+
+
+# =========================
+# 全量重算
+# =========================
+def _group_sql(cols):
+    # 与增量更新一致地按二进制取值分组；整数列也转成字符串
+    exprs = [f"CAST({c} AS CHAR CHARACTER SET utf8mb4) COLLATE utf8mb4_bin" for c in cols]
+    aliases = ', '.join(f"{e} AS k{i + 1}" for i, e in enumerate(exprs))
+    return f"SELECT {aliases}, COUNT(*) AS cnt FROM tb_user GROUP BY {', '.join(exprs)}"
+
+
+def recount(cursor):
+    """
+    按 tb_user 重算全部计数，只对有差异的桶补上差值，返回 {'buckets', 'total', 'corrected', 'elapsed_ms'}。
+    统计表与 tb_user 须在同一个快照中读取：调用方负责开启一致性快照事务与提交，并发写入时应通过 rebuild 调用。
+    """
+    start = time.monotonic()
+    cursor.execute("SELECT dim, k1, k2, CAST(SUM(cnt) AS SIGNED) AS cnt FROM tb_user_stats GROUP BY dim, k1, k2")
+    current = {(r['dim'], r['k1'], r['k2']): r['cnt'] for r in cursor.fetchall()}
+
+    fresh = Counter()
+    cursor.execute("SELECT COUNT(*) AS cnt FROM tb_user")
+    fresh[(TOTAL, '', '')] = cursor.fetchone()['cnt']
+    for dim in DIMENSIONS:
+        cursor.execute(_group_sql((dim,)))
+        for r in cursor.fetchall():
+            fresh[(dim, _key(r['k1']), '')] += r['cnt']
+    for cols in CROSSTABS:
+        cursor.execute(_group_sql(cols))
+        for r in cursor.fetchall():
+            fresh[(crosstab_name(cols), _key(r['k1']), _key(r['k2']))] += r['cnt']
+
+    # 快照之后提交的写事务已把自己的增量加在统计表上，这里只补快照内的漂移：加法可交换，不需要挡住写入
+    keys = set(fresh) | {k for k in current if not k[0].startswith('_')}
+    drift = {k: fresh[k] - current.get(k, 0) for k in keys}
+    drift = {k: n for k, n in drift.items() if n}
+    if drift:
+        cursor.executemany("""
+            INSERT INTO tb_user_stats (dim, k1, k2, cnt) VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt)
+        """, [k + (n,) for k, n in sorted(drift.items())])
+    cursor.execute("""
+        INSERT INTO tb_user_stats (dim, k1, k2, cnt) VALUES (%s, '', '', UNIX_TIMESTAMP())
+        ON DUPLICATE KEY UPDATE cnt = VALUES(cnt)
+    """, (REBUILT_AT,))
+    # 首次重算时 current 为空，全部桶都算作新写入而不是纠正
+    corrected = sum(1 for k in drift if k in current)
+    return {
+        'buckets': len(fresh),
+        'total': fresh[(TOTAL, '', '')],
+        'corrected': corrected,
+        'elapsed_ms': round((time.monotonic() - start) * 1000, 1),
+    }
+
+
+def purge_empty(conn):
+    """删除 cnt 为 0 的分片行（重算纠偏或增减抵消后留下的），返回删除行数；只锁这些行"""
+    conn.commit()
+    with conn.cursor() as cursor:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+        try:
+            cursor.execute("SELECT dim, k1, k2, shard FROM tb_user_stats WHERE cnt = 0")
+            rows = [(r['dim'], r['k1'], r['k2'], r['shard']) for r in cursor.fetchall()]
+            if rows:
+                # 加锁时再确认一次：期间可能有写事务加过该分片
+                cursor.executemany(
+                    "DELETE FROM tb_user_stats WHERE dim=%s AND k1=%s AND k2=%s AND shard=%s AND cnt = 0", rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(rows)
+
+
+def rebuild(conn):
+    """在一致性快照事务中重算并提交，再清理空的分片行；不阻塞校友写入"""
+    conn.commit()
+    with conn.cursor() as cursor:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        try:
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+            report = recount(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    report['purged'] = purge_empty(conn)
+    return report
+
+
+def maybe_rebuild(conn, interval):
+    """
+    多个 worker 共用：用 MySQL 命名锁保证同一时间只有一个在重算，
+    距上次重算（任一 worker）不足 interval 秒时跳过。返回重算结果，跳过时返回 None。
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT GET_LOCK(%s, 0) AS ok", (LOCK_NAME,))
+        if not cursor.fetchone()['ok']:
+            return None
+        try:
+            cursor.execute("SELECT UNIX_TIMESTAMP() - cnt AS age FROM tb_user_stats WHERE dim=%s", (REBUILT_AT,))
+            row = cursor.fetchone()
+            if row and row['age'] < interval:
+                conn.commit()
+                return None
+            return rebuild(conn)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchall()
+
+
+# =========================
+# 读取
+# =========================
+def parse_dims(raw):
+    """?dims=city,grad_year,city:grad_year；不传时返回全部单维度与交叉维度"""
+    if not raw:
+        return list(AVAILABLE)
+    dims = [d.strip() for d in raw.split(',') if d.strip()]
+    unknown = [d for d in dims if d not in AVAILABLE]
+    if unknown:
+        raise StatsArgsError(f"不支持的统计维度: {', '.join(unknown)}（可选: {', '.join(AVAILABLE)}）")
+    return list(dict.fromkeys(dims))
+
+
+def _value(col, key):
+    if key == '':
+        return None
+    return int(key) if col in INT_DIMENSIONS else key
+
+
+def read(cursor, dims, top=None):
+    """
+    返回 {'total', 'rebuilt_at', 'dims': {维度: {'items': [{列: 取值, ..., 'count': 人数}], 'other_count'}}}，
+    items 按人数降序；top 限制每个维度返回的桶数，其余桶的人数合计为 other_count
+    """
+    names = [TOTAL, REBUILT_AT] + list(dims)
+    cursor.execute(f"""
+        SELECT dim, k1, k2, CAST(SUM(cnt) AS SIGNED) AS cnt FROM tb_user_stats
+        WHERE dim IN ({', '.join(['%s'] * len(names))})
+        GROUP BY dim, k1, k2 HAVING cnt > 0
+    """, names)
+    data = {'total': 0, 'rebuilt_at': None, 'dims': {d: [] for d in dims}}
+    for r in cursor.fetchall():
+        if r['dim'] == TOTAL:
+            data['total'] = r['cnt']
+            continue
+        if r['dim'] == REBUILT_AT:
+            data['rebuilt_at'] = r['cnt']
+            continue
+        cols = r['dim'].split(':')
+        item = {cols[0]: _value(cols[0], r['k1'])}
+        if len(cols) > 1:
+            item[cols[1]] = _value(cols[1], r['k2'])
+        item['count'] = r['cnt']
+        data['dims'][r['dim']].append(item)
+    for dim, items in data['dims'].items():
+        items.sort(key=lambda it: (-it['count'], [str(v) for v in it.values()]))
+        cut = top or len(items)
+        data['dims'][dim] = {'items': items[:cut], 'other_count': sum(it['count'] for it in items[cut:])}
+    return data
@@ -0,0 +1,330 @@
+# services/bulk_import.py
+# 校友批量导入：流式读取 CSV / JSON Lines，逐行校验（与 create_user 相同的规则），
+# 按批次用多行 executemany 写入，每批一个事务。
+# - 按 email（其次 phone）匹配已有校友：upsert 更新 / skip 跳过 / insert 总是新增
+# - 批次写入失败时回滚并逐行重试，定位出错的行；每行的错误带行号返回（最多保留 max_errors 条）
+# - 任何时候只在内存中保留一个批次，内存占用与文件大小无关
+# - 校友统计（services/alumni_stats.py）在同一事务中按批增量更新
+#
+# 命令行：
+#     python -m services.bulk_import alumni.csv
+#     python -m services.bulk_import alumni.jsonl.gz --batch-size 2000 --mode skip
+import csv
+import io
+import json
+import time
+
+from . import alumni_stats
+
+USER_COLUMNS = ('name', 'gender', 'age', 'phone', 'email', 'grad_year', 'degree', 'major', 'city', 'country', 'bio')
+INT_COLUMNS = ('age', 'grad_year')
+
+# 教务处导出的表格常用中文表头
+HEADER_ALIASES = {
+    '姓名': 'name', '性别': 'gender', '年龄': 'age', '电话': 'phone', '手机': 'phone', '手机号': 'phone',
+    '邮箱': 'email', '电子邮箱': 'email', '毕业年份': 'grad_year', '学历': 'degree', '学位': 'degree',
+    '专业': 'major', '城市': 'city', '国家': 'country', '简介': 'bio', '个人简介': 'bio',
+}
+
+IMPORT_MODES = ('upsert', 'skip', 'insert')
+FORMATS = ('csv', 'jsonl')
+
+INSERT_SQL = f"""
+    INSERT INTO tb_user ({', '.join(USER_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(USER_COLUMNS))})
+"""
+UPDATE_SQL = f"""
+    UPDATE tb_user SET {', '.join(f'{c}=%s' for c in USER_COLUMNS)} WHERE id=%s
+"""
+
+
+class RowError(ValueError):
+    """单行数据校验失败"""
+
+
+def _int(col, v):
+    # JSON 里的 30.0、表格导出的 "30.0" 都按整数接受；带小数部分的拒绝
+    text = str(v).strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        f = float(text)
+    except ValueError:
+        f = None
+    if f is None or not f.is_integer():
+        raise RowError(f"{col} 必须是整数")
+    return int(f)
+
+
+def _clean(col, v):
+    if col in INT_COLUMNS:
+        if v is None or (isinstance(v, str) and not v.strip()):
+            return None
+        return _int(col, v)
+    return "" if v is None else str(v).strip()
+
+
+def validate_user(data):
+    """
+    校验并规范化一条校友数据，返回按 USER_COLUMNS 排列的元组（create_user / update_user 共用）。
+    文本字段去掉首尾空白，姓名必填；年龄、毕业年份为空时存 NULL，否则必须是整数（30.0 这样的整数值也接受）。
+    """
+    if not isinstance(data, dict):
+        raise RowError("数据必须是对象")
+    values = tuple(_clean(col, data.get(col)) for col in USER_COLUMNS)
+    if not values[0]:
+        raise RowError("姓名不能为空")
+    return values
+
+
+def validate_user_patch(data):
+    """
+    部分更新：只校验并返回传入的字段 {列名: 值}，规则与 validate_user 相同（传了 name 时不能为空）。
+    其他键（如 id）忽略；一个可更新字段都没有时报错。
+    """
+    if not isinstance(data, dict):
+        raise RowError("数据必须是对象")
+    values = {col: _clean(col, data[col]) for col in USER_COLUMNS if col in data}
+    if not values:
+        raise RowError("没有要更新的字段")
+    if 'name' in values and not values['name']:
+        raise RowError("姓名不能为空")
+    return values
+
+
+# =========================
+# 读取
+# =========================
+def iter_csv(stream):
+    """stream 为二进制流；返回 (行号, dict) 迭代器，行号从 2 开始（第 1 行是表头）"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    try:
+        header = next(reader)
+    except StopIteration:
+        return
+    header = [HEADER_ALIASES.get(h.strip(), h.strip().lower()) for h in header]
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        yield reader.line_num, dict(zip(header, row))
+
+
+def iter_jsonl(stream):
+    """stream 为二进制流，每行一个 JSON 对象；解析失败的行以 RowError 形式交给调用方记录"""
+    for line_no, raw in enumerate(stream, 1):
+        raw = raw.decode('utf-8-sig', errors='replace').strip()
+        if not raw:
+            continue
+        try:
+            yield line_no, json.loads(raw)
+        except ValueError as e:
+            yield line_no, RowError(f"JSON 解析失败: {e}")
+
+
+def iter_rows(stream, fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的格式: {fmt}")
+    return iter_csv(stream) if fmt == 'csv' else iter_jsonl(stream)
+
+
+# =========================
+# 写入
+# =========================
+class BulkImporter:
+    def __init__(self, db_pool, batch_size=1000, mode='upsert', max_errors=1000,
+                 progress=None, on_updated=None):
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"不支持的导入模式: {mode}")
+        self.db_pool = db_pool
+        self.batch_size = max(1, batch_size)
+        self.mode = mode
+        self.max_errors = max_errors
+        self.progress = progress            # progress(result)：每批提交后调用
+        self.on_updated = on_updated        # on_updated(ids)：每批提交后调用，参数为被更新的已有校友 id
+        self.result = {'rows': 0, 'inserted': 0, 'updated': 0, 'skipped': 0, 'failed': 0,
+                       'batches': 0, 'errors': [], 'elapsed_s': 0.0}
+
+    def _error(self, line, message):
+        self.result['failed'] += 1
+        if len(self.result['errors']) < self.max_errors:
+            self.result['errors'].append({'line': line, 'error': message})
+
+    # -------------------------
+    # 匹配已有校友
+    # -------------------------
+    @staticmethod
+    def _match_existing(cursor, batch):
+        """一次查询找出本批 email / phone 对应的已有 id（走 idx_email / idx_phone）"""
+        emails = sorted({v[4] for _, v in batch if v[4]})
+        phones = sorted({v[3] for _, v in batch if v[3]})
+        by_email, by_phone = {}, {}
+        if not emails and not phones:
+            return by_email, by_phone
+        conds, params = [], []
+        if emails:
+            conds.append(f"email IN ({', '.join(['%s'] * len(emails))})")
+            params += emails
+        if phones:
+            conds.append(f"phone IN ({', '.join(['%s'] * len(phones))})")
+            params += phones
+        cursor.execute(f"SELECT id, email, phone FROM tb_user WHERE {' OR '.join(conds)} ORDER BY id", params)
+        for r in cursor.fetchall():
+            # 重复数据时取 id 最小的一条
+            if r['email']:
+                by_email.setdefault(r['email'], r['id'])
+            if r['phone']:
+                by_phone.setdefault(r['phone'], r['id'])
+        return by_email, by_phone
+
+    def _plan(self, cursor, batch):
+        """把一批行分成 (新增, 更新, 跳过数)；同一批内 email / phone 重复的以最后一行为准"""
+        if self.mode == 'insert':
+            return batch, [], 0
+        by_email, by_phone = self._match_existing(cursor, batch)
+        inserts, updates, skipped = {}, {}, 0
+        for line, values in batch:
+            email, phone = values[4], values[3]
+            existing = (email and by_email.get(email)) or (phone and by_phone.get(phone))
+            if existing:
+                if self.mode == 'skip':
+                    skipped += 1
+                else:
+                    if existing in updates:
+                        skipped += 1    # 同一位校友在本批中出现多次，以最后一行为准
+                    updates[existing] = (line, values)
+                continue
+            key = ('email', email) if email else ('phone', phone) if phone else ('line', line)
+            if key in inserts:
+                skipped += 1        # 被同一批中后面的行覆盖
+            inserts[key] = (line, values)
+        return list(inserts.values()), [(i, lv) for i, lv in updates.items()], skipped
+
+    def _write(self, cursor, inserts, updates):
+        before = alumni_stats.lock_rows(cursor, [i for i, _ in updates])
+        if inserts:
+            # PyMySQL 会把 INSERT 的 executemany 改写为多行 INSERT（超过 max_allowed_packet 时自动拆分）
+            cursor.executemany(INSERT_SQL, [v for _, v in inserts])
+        if updates:
+            cursor.executemany(UPDATE_SQL, [v + (i,) for i, (_, v) in updates])
+        # 整批的统计增减合并后一次写入
+        alumni_stats.record(
+            cursor,
+            before=[before[i] for i, _ in updates if i in before],
+            after=[dict(zip(USER_COLUMNS, v)) for _, v in inserts]
+                  + [dict(zip(USER_COLUMNS, v)) for i, (_, v) in updates if i in before],
+        )
+        return len(inserts)
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        with self.db_pool.connection() as conn, conn.cursor() as cursor:
+            try:
+                inserts, updates, skipped = self._plan(cursor, batch)
+                inserted = self._write(cursor, inserts, updates)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Bulk import batch failed, retrying row by row: {e}")
+                inserted, updates, skipped = self._flush_rows(conn, cursor, batch)
+        self.result['batches'] += 1
+        self.result['inserted'] += inserted
+        self.result['updated'] += len(updates)
+        self.result['skipped'] += skipped
+        if self.on_updated and updates:
+            self.on_updated([i for i, _ in updates])
+        if self.progress:
+            self.progress(self.result)
+
+    def _flush_rows(self, conn, cursor, batch):
+        """逐行写入，每行单独提交，记录失败行的数据库错误"""
+        inserted, updates, skipped = 0, [], 0
+        for line, values in batch:
+            try:
+                ins, upd, sk = self._plan(cursor, [(line, values)])
+                inserted += self._write(cursor, ins, upd)
+                updates += upd
+                skipped += sk
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                self._error(line, f"写入失败: {e}")
+        return inserted, updates, skipped
+
+    # -------------------------
+    # 入口
+    # -------------------------
+    def iter_run(self, rows):
+        """与 run 相同，但每提交一批就产出一次当前的结果统计（用于流式推送进度）"""
+        start = time.monotonic()
+        batch = []
+        for line, data in rows:
+            self.result['rows'] += 1
+            try:
+                if isinstance(data, RowError):
+                    raise data
+                batch.append((line, validate_user(data)))
+            except RowError as e:
+                self._error(line, str(e))
+                continue
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+                self.result['elapsed_s'] = round(time.monotonic() - start, 2)
+                yield self.result
+        self._flush(batch)
+        self.result['elapsed_s'] = round(time.monotonic() - start, 2)
+        yield self.result
+
+    def run(self, rows):
+        """rows 为 (行号, dict 或 RowError) 迭代器，返回结果统计"""
+        for _ in self.iter_run(rows):
+            pass
+        return self.result
+
+
+def detect_format(filename='', content_type=''):
+    name, content_type = (filename or '').lower(), (content_type or '').lower()
+    if name.endswith(('.jsonl', '.ndjson', '.jsonl.gz', '.ndjson.gz')) or 'ndjson' in content_type \
+            or 'jsonl' in content_type or 'json-seq' in content_type:
+        return 'jsonl'
+    return 'csv'
+
+
+def main(argv=None):
+    import argparse
+    import gzip
+    from dotenv import load_dotenv
+    from .db_pool import create_pool_from_env
+
+    parser = argparse.ArgumentParser(description="批量导入校友（CSV / JSON Lines，支持 .gz）")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="默认按扩展名判断")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--mode", choices=IMPORT_MODES, default='upsert')
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    fmt = args.format or detect_format(args.file)
+    opener = gzip.open if args.file.endswith('.gz') else open
+
+    def progress(result):
+        print(f"\r已处理 {result['rows']} 行：新增 {result['inserted']}，更新 {result['updated']}，"
+              f"跳过 {result['skipped']}，失败 {result['failed']}", end='', flush=True)
+
+    pool = create_pool_from_env()
+    try:
+        with opener(args.file, 'rb') as f:
+            result = BulkImporter(pool, batch_size=args.batch_size, mode=args.mode,
+                                  progress=progress).run(iter_rows(f, fmt))
+        print()
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    finally:
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
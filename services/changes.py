@@ -0,0 +1,107 @@
+# services/changes.py
+# 校友变更订阅：客户端保存上次返回的游标，之后只拉取这之后新增 / 修改的校友和删除记录，
+# 代价与变更数成正比，而不是整表。
+# - 新增 / 修改：按 (updated_at, id) 键集分页，走 idx_updated_at (updated_at, id)（迁移 4）
+# - 删除：delete_user 等在同一事务中写入 tb_user_tombstone（迁移 7），按自增 seq 分页
+# - 事务提交有先后：updated_at / seq 较小的行可能晚于较大的行提交，所以只返回 SETTLE 秒之前的变更，
+#   避免游标越过尚未提交的行而永久漏掉它
+# - 删除记录保留 retention_days 天；游标比这更早时返回 CursorExpired，客户端需要重新全量同步
+import base64
+import json
+import time
+
+DEFAULT_SETTLE_SECONDS = 2
+
+
+class CursorError(ValueError):
+    """游标格式不正确"""
+
+
+class CursorExpired(CursorError):
+    """游标早于删除记录的保留期限"""
+
+
+def encode_cursor(state):
+    raw = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, retention_days=None):
+    """返回 {'ts': 秒级时间戳, 'id': 校友 id, 'seq': 删除记录 seq, 't': 签发时间}"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        state = json.loads(raw)
+        state = {k: int(state[k]) for k in ('ts', 'id', 'seq', 't')}
+    except (ValueError, TypeError, KeyError):
+        raise CursorError("游标无效")
+    if retention_days and time.time() - state['t'] > retention_days * 86400:
+        raise CursorExpired("游标已过期，请重新全量同步")
+    return state
+
+
+def record_deletions(cursor, user_ids):
+    """在删除校友的同一事务中调用"""
+    if user_ids:
+        cursor.executemany("INSERT INTO tb_user_tombstone (user_id) VALUES (%s)", [(i,) for i in user_ids])
+
+
+def initial_state(cursor):
+    """首次同步：从头返回全部校友；此前的删除记录与客户端无关，从当前最大 seq 开始"""
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) AS seq FROM tb_user_tombstone")
+    return {'ts': 0, 'id': 0, 'seq': cursor.fetchone()['seq']}
+
+
+def fetch_changes(cursor, fields, state, limit=500, settle=DEFAULT_SETTLE_SECONDS):
+    """
+    返回 {items, deleted, next_cursor, has_more}：
+    items 为游标之后新增 / 修改的校友（按 updated_at, id 升序），deleted 为之后被删除的校友 id。
+    has_more 为 True 时应立即用 next_cursor 继续拉取；否则隔一段时间再用 next_cursor 轮询。
+    """
+    fields = list(fields)
+    for required in ('id', 'updated_at'):
+        if required not in fields:
+            fields.append(required)
+    columns = ', '.join(fields)
+    cursor.execute(f"""
+        SELECT {columns}, UNIX_TIMESTAMP(updated_at) AS _ts
+        FROM tb_user
+        WHERE (updated_at > FROM_UNIXTIME(%s) OR (updated_at = FROM_UNIXTIME(%s) AND id > %s))
+          AND updated_at < NOW() - INTERVAL %s SECOND
+        ORDER BY updated_at, id
+        LIMIT %s
+    """, (state['ts'], state['ts'], state['id'], settle, limit + 1))
+    rows = cursor.fetchall()
+    more_rows = len(rows) > limit
+    rows = rows[:limit]
+
+    cursor.execute("""
+        SELECT seq, user_id FROM tb_user_tombstone
+        WHERE seq > %s AND deleted_at < NOW(3) - INTERVAL %s SECOND
+        ORDER BY seq
+        LIMIT %s
+    """, (state['seq'], settle, limit + 1))
+    tombstones = cursor.fetchall()
+    more_deleted = len(tombstones) > limit
+    tombstones = tombstones[:limit]
+
+    next_state = dict(state)
+    if rows:
+        next_state['ts'], next_state['id'] = int(rows[-1]['_ts']), rows[-1]['id']
+    if tombstones:
+        next_state['seq'] = tombstones[-1]['seq']
+    next_state['t'] = int(time.time())
+    for r in rows:
+        r.pop('_ts')
+    return {
+        'items': rows,
+        'deleted': [t['user_id'] for t in tombstones],
+        'next_cursor': encode_cursor(next_state),
+        'has_more': more_rows or more_deleted,
+    }
+
+
+def purge_tombstones(cursor, retention_days):
+    """清理超过保留期限的删除记录，返回删除的条数"""
+    cursor.execute("DELETE FROM tb_user_tombstone WHERE deleted_at < NOW(3) - INTERVAL %s DAY LIMIT 10000",
+                   (retention_days,))
+    return cursor.rowcount
@@ -0,0 +1,259 @@
+# services/db_pool.py
+# MySQL 连接池：每个 worker 进程一份，复用 PyMySQL 连接，避免每个请求都重新握手
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import pymysql
+import pymysql.cursors
+
+from .metrics import registry as metrics
+
+
+class _TimedCursorMixin:
+    """execute / fetch 计时，计入请求指标（services/metrics.py）"""
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            metrics.observe_phase('db_execute', time.perf_counter() - start)
+
+    def executemany(self, query, args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, args)
+        finally:
+            metrics.observe_phase('db_execute', time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            metrics.observe_phase('db_fetch', time.perf_counter() - start)
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(size)
+        finally:
+            metrics.observe_phase('db_fetch', time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            metrics.observe_phase('db_fetch', time.perf_counter() - start)
+
+
+class TimedDictCursor(_TimedCursorMixin, pymysql.cursors.DictCursor):
+    pass
+
+
+class TimedSSCursor(_TimedCursorMixin, pymysql.cursors.SSCursor):
+    """服务端游标（流式读取），fetch 的耗时才是真正读取结果的时间"""
+
+
+class TimedSSDictCursor(_TimedCursorMixin, pymysql.cursors.SSDictCursor):
+    """服务端游标，行为 dict"""
+
+
+class PoolTimeout(RuntimeError):
+    """等待空闲连接超时"""
+
+
+class _PooledConn:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """
+    简单的线程安全连接池：
+    - size：常驻连接数上限（空闲时保留的连接数）
+    - max_overflow：高峰期允许临时多开的连接数，归还时直接关闭
+    - recycle：连接存活超过该秒数后在取出时重建，避开 MySQL wait_timeout
+    - ping_interval：连接空闲超过该秒数后，取出前先 ping 一次做健康检查
+    - timeout：连接全部借出时，等待归还的最长秒数
+    """
+    def __init__(self, size=5, max_overflow=5, recycle=1800, ping_interval=30,
+                 timeout=10, **connect_kwargs):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = []          # 空闲连接（栈，后进先出，让热连接优先被复用）
+        self._in_use = 0
+        self._stats = {
+            "created": 0,
+            "recycled": 0,
+            "ping_failed": 0,
+            "discarded": 0,
+            "checkouts": 0,
+            "wait_timeouts": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def _check_pid(self):
+        # gunicorn fork 之后子进程不能沿用父进程的 socket
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def _count(self, name):
+        # 建连 / 健康检查在锁外进行，计数仍要在锁内累加，gthread 多线程下才不会丢
+        with self._cond:
+            self._stats[name] += 1
+
+    def _connect(self):
+        conn = pymysql.connect(**self.connect_kwargs)
+        self._count("created")
+        return _PooledConn(conn)
+
+    @staticmethod
+    def _close_quietly(pc):
+        try:
+            pc.conn.close()
+        except Exception:
+            pass
+
+    # -------------------------
+    # 借出 / 归还
+    # -------------------------
+    def acquire(self):
+        start = time.monotonic()
+        with self._cond:
+            self._check_pid()
+            while True:
+                if self._idle:
+                    pc = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.size + self.max_overflow:
+                    self._in_use += 1
+                    pc = None
+                    break
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats["wait_timeouts"] += 1
+                    raise PoolTimeout(f"等待数据库连接超时（{self.timeout}s）")
+                self._cond.wait(remaining)
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds"] += time.monotonic() - start
+        metrics.observe_phase('db_wait', time.monotonic() - start)
+
+        # 建连 / 健康检查放在锁外，避免阻塞其他线程
+        try:
+            pc = self._checkout_health(pc)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return pc
+
+    def _checkout_health(self, pc):
+        if pc is None:
+            return self._connect()
+
+        now = time.monotonic()
+        if self.recycle and now - pc.created_at > self.recycle:
+            self._close_quietly(pc)
+            self._count("recycled")
+            return self._connect()
+
+        if self.ping_interval is not None and now - pc.last_used > self.ping_interval:
+            try:
+                pc.conn.ping(reconnect=False)
+            except Exception:
+                self._close_quietly(pc)
+                self._count("ping_failed")
+                return self._connect()
+        return pc
+
+    def release(self, pc, discard=False):
+        if not discard:
+            try:
+                # 归还前回滚未提交的事务，防止脏状态泄漏给下一个请求
+                pc.conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or len(self._idle) >= self.size or pc.conn.open is False:
+                self._stats["discarded"] += 1
+                self._close_quietly(pc)
+            else:
+                pc.last_used = time.monotonic()
+                self._idle.append(pc)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """借出一个连接，with 块结束（包括异常和提前 return）时保证归还"""
+        pc = self.acquire()
+        discard = False
+        try:
+            yield pc.conn
+        except pymysql.err.OperationalError:
+            # 连接级错误（断线等），不再放回池中
+            discard = True
+            raise
+        finally:
+            self.release(pc, discard=discard)
+
+    # -------------------------
+    # 统计与关闭
+    # -------------------------
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data.update({
+                "pid": self._pid,
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+            })
+        data["wait_seconds"] = round(data["wait_seconds"], 4)
+        return data
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for pc in idle:
+            self._close_quietly(pc)
+
+
+def create_pool_from_env():
+    """按环境变量创建连接池（与原 get_db_connection 使用同一组 DB_* 配置）"""
+    return ConnectionPool(
+        size=int(os.getenv("DB_POOL_SIZE", 5)),
+        max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", 5)),
+        recycle=int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        ping_interval=int(os.getenv("DB_POOL_PING_INTERVAL", 30)),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        db=os.getenv("DB_NAME", "alumni_mgmt"),
+        charset="utf8mb4",
+        cursorclass=TimedDictCursor,
+    )
@@ -0,0 +1,156 @@
+# services/export.py
+# 校友导出：用服务端游标（SSCursor）按主键顺序逐批读取，边读边编码为 CSV / NDJSON 输出
+# - 不调用 fetchall，内存占用只与一个批次和一个输出块有关，与表大小无关
+# - 可选边输出边 gzip 压缩
+# - 客户端中途断开时直接丢弃连接，不把剩余结果读完
+#
+# 导出的 CSV 带 UTF-8 BOM（Excel 可直接打开），表头为字段名，可用 services/bulk_import.py 原样导回。
+import csv
+import datetime
+import io
+import json
+import zlib
+
+import pymysql
+
+from . import search
+from .db_pool import TimedSSCursor
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+FETCH_SIZE = 1000           # 每次从服务端游标取的行数
+CHUNK_BYTES = 64 * 1024     # 攒够这么多字节再输出一块，减少小块写 socket 的开销
+# 慢客户端读得慢时，MySQL 在 net_write_timeout 内写不出结果会断开连接，导出期间适当放宽
+NET_WRITE_TIMEOUT = 600
+
+
+def _json_default(v):
+    if isinstance(v, (datetime.datetime, datetime.date)):
+        return v.isoformat(sep=' ') if isinstance(v, datetime.datetime) else v.isoformat()
+    return str(v)
+
+
+def _cell(v):
+    if v is None:
+        return ''
+    if isinstance(v, datetime.datetime):
+        return v.isoformat(sep=' ')
+    return v
+
+
+def build_query(fields, keyword='', mode=None, extra_terms=()):
+    """返回 (SQL, 参数, 实际模式)；无 keyword 时 mode 为 None"""
+    columns = ', '.join(fields)
+    if not keyword:
+        return f"SELECT {columns} FROM tb_user ORDER BY id", (), None
+    where, params, mode = search.filter_where(keyword, mode, extra_terms)
+    return f"SELECT {columns} FROM tb_user WHERE {where} ORDER BY id", params, mode
+
+
+class _Encoder:
+    """把行编码为文本块，按 CHUNK_BYTES 攒批；gzip=True 时输出 gzip 字节流"""
+    def __init__(self, fmt, fields, gzip=False):
+        self.fmt = fmt
+        self.fields = fields
+        self._buf = io.StringIO()
+        self._writer = csv.writer(self._buf, lineterminator='\r\n') if fmt == 'csv' else None
+        self._zip = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None    # wbits=31：gzip 格式
+        self.rows = 0
+        self.bytes_out = 0
+
+    def _emit(self, data):
+        if self._zip is not None:
+            data = self._zip.compress(data)
+        self.bytes_out += len(data)
+        return data
+
+    def header(self):
+        if self.fmt == 'csv':
+            self._buf.write('\ufeff')
+            self._writer.writerow(self.fields)
+
+    def add(self, row):
+        """row 为按 fields 排列的元组；缓冲区满时返回一块字节，否则返回 None"""
+        self.rows += 1
+        if self.fmt == 'csv':
+            self._writer.writerow([_cell(v) for v in row])
+        else:
+            self._buf.write(json.dumps(dict(zip(self.fields, row)), ensure_ascii=False, default=_json_default))
+            self._buf.write('\n')
+        if self._buf.tell() >= CHUNK_BYTES:
+            return self.flush()
+        return None
+
+    def flush(self):
+        data = self._buf.getvalue().encode('utf-8')
+        self._buf.seek(0)
+        self._buf.truncate()
+        return self._emit(data) if data else b''
+
+    def finish(self):
+        data = self.flush()
+        if self._zip is not None:
+            tail = self._zip.flush()
+            self.bytes_out += len(tail)
+            data += tail
+        return data
+
+
+def _execute(cursor, fields, keyword, mode, extra_terms):
+    sql, params, used = build_query(fields, keyword, mode, extra_terms)
+    try:
+        cursor.execute(sql, params)
+    except pymysql.err.MySQLError as e:
+        # 1191：FULLTEXT 索引不存在，回退到 LIKE 扫描
+        if used != 'fulltext' or not (e.args and e.args[0] == 1191):
+            raise
+        print("Fulltext export unavailable, falling back to LIKE:", e)
+        sql, params, used = build_query(fields, keyword, 'like', extra_terms)
+        cursor.execute(sql, params)
+
+
+def stream_users(db_pool, fields, fmt='csv', keyword='', mode=None, extra_terms=(), gzip=False, on_done=None):
+    """
+    生成导出内容（bytes 块）的生成器，第一块为表头（可能为空）。连接在第一次迭代时才从池中借出，
+    生成器结束、出错或被关闭（客户端断开）时归还；未读完就结束的连接直接丢弃。
+    on_done(rows, bytes_out) 在完整导出后调用。
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的格式: {fmt}")
+    fields = list(fields)
+    encoder = _Encoder(fmt, fields, gzip=gzip)
+    pc = db_pool.acquire()
+    complete = False
+    try:
+        conn = pc.conn
+        cursor = conn.cursor(TimedSSCursor)
+        cursor.execute("SET SESSION net_write_timeout = %s", (NET_WRITE_TIMEOUT,))
+        _execute(cursor, fields, keyword, mode, extra_terms)
+        encoder.header()
+        # 查询已开始返回结果：先输出表头，调用方可据此在发送响应头之前发现查询错误
+        yield encoder.flush()
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                chunk = encoder.add(row)
+                if chunk:
+                    yield chunk
+        complete = True
+        cursor.close()
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION net_write_timeout = DEFAULT")
+        cursor.close()
+        tail = encoder.finish()
+        if tail:
+            yield tail
+        if on_done:
+            on_done(encoder.rows, encoder.bytes_out)
+    finally:
+        # 没读完的服务端游标会占住连接，关闭它要先读完剩余结果，这里直接丢弃连接
+        db_pool.release(pc, discard=not complete)
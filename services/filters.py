@@ -0,0 +1,455 @@
+# services/filters.py
+# 校友结构化筛选：毕业年份（等值 / 范围）、学历、专业、城市、国家、性别按 AND 组合，可排序，键集分页
+# - parse_filters：校验参数——取值个数、年份范围、排序列，以及与 keyword 的组合
+# - plan：选出预期使用的索引。候选为能用上等值条件在前、范围条件在后的最长前缀的索引，以及排序列的索引；
+#   剩余的索引顺序正好是 (排序列, id) 时直接按索引顺序分页，不需要 filesort。
+#   按校友统计汇总表（迁移 9）中各取值的人数估算要读取的行数，取最少者；SQL 中用 FORCE INDEX 固定
+# - explain：调试模式下对实际执行的 SQL 做 EXPLAIN，报告优化器选用的索引、扫描行数、是否 filesort
+# 复合索引（迁移 10）按常见查询组合设计：城市 + 学历 + 年份范围、专业 + 年份范围、学历 + 年份范围、国家 + 城市；
+# 只有性别等选择性很低的条件时按排序列的索引顺序扫描，凑满一页即停止。
+#
+# 命令行（对 QUERY_MIX 中的组合逐个 EXPLAIN，核对索引选择）：
+#     python -m services.filters
+import base64
+import json
+import time
+
+import pymysql
+
+from . import alumni_stats
+
+# 等值筛选，逗号分隔可多选（IN）
+EQ_FIELDS = ('degree', 'major', 'city', 'country', 'gender')
+# grad_year=2017 或 grad_year=2017,2018 为等值；grad_year_from / grad_year_to 为范围（含两端）
+RANGE_FIELD = 'grad_year'
+FILTER_ARGS = EQ_FIELDS + (RANGE_FIELD, 'grad_year_from', 'grad_year_to', 'sort')
+MAX_VALUES = 20
+
+# 排序列；前缀 - 为降序，id 始终作为第二排序列保证翻页稳定
+SORT_COLUMNS = ('id', 'grad_year', 'name', 'updated_at')
+
+# 可用的索引与列；InnoDB 二级索引隐含以主键 id 结尾
+INDEXES = {
+    'idx_city_degree_grad': ('city', 'degree', 'grad_year'),
+    'idx_major_grad': ('major', 'grad_year'),
+    'idx_degree_grad': ('degree', 'grad_year'),
+    'idx_country_city': ('country', 'city'),
+    'idx_grad_year': ('grad_year',),
+    'idx_name': ('name',),
+    'idx_updated_at': ('updated_at',),
+    'PRIMARY': (),
+}
+# 没有可用的筛选列时，按排序列的索引顺序扫描
+SORT_INDEXES = {'id': 'PRIMARY', 'grad_year': 'idx_grad_year', 'name': 'idx_name', 'updated_at': 'idx_updated_at'}
+
+# 设计索引时参考的查询组合（命令行 EXPLAIN 核对用）
+QUERY_MIX = [
+    {'degree': '硕士', 'grad_year_from': '2017', 'grad_year_to': '2019', 'city': '深圳'},
+    {'city': '北京', 'sort': '-grad_year'},
+    {'city': '上海', 'degree': '本科', 'grad_year': '2020'},
+    {'major': '计算机科学', 'grad_year_from': '2015'},
+    {'major': '计算机科学,软件工程', 'sort': 'grad_year'},
+    {'degree': '博士', 'sort': '-grad_year'},
+    {'country': 'USA'},
+    {'country': 'USA', 'city': 'Seattle'},
+    {'grad_year_from': '2010', 'grad_year_to': '2012'},
+    {'gender': '女', 'sort': 'name'},
+    {'sort': '-updated_at'},
+]
+
+
+class FilterError(ValueError):
+    """筛选参数不合法"""
+
+
+class Filters:
+    def __init__(self, conds, sort_col='id', desc=False):
+        self.conds = conds          # 列 -> ('in', [取值...]) 或 ('range', 下限, 上限)，下限 / 上限可以为 None
+        self.sort_col = sort_col
+        self.desc = desc
+
+    def __repr__(self):
+        return f"Filters({self.conds!r}, sort={'-' if self.desc else ''}{self.sort_col})"
+
+    def kind(self, col):
+        """'eq'（单个取值）、'in'（多个取值）、'range' 或 None"""
+        cond = self.conds.get(col)
+        if cond is None:
+            return None
+        if cond[0] == 'in':
+            return 'eq' if len(cond[1]) == 1 else 'in'
+        return 'range'
+
+    def where(self):
+        """返回 (条件 SQL, 参数)，没有条件时为 ('1=1', ())"""
+        parts, params = [], []
+        for col, cond in self.conds.items():
+            if cond[0] == 'in':
+                if len(cond[1]) == 1:
+                    parts.append(f"{col} = %s")
+                else:
+                    parts.append(f"{col} IN ({', '.join(['%s'] * len(cond[1]))})")
+                params += cond[1]
+            else:
+                _, lo, hi = cond
+                if lo is not None and hi is not None:
+                    parts.append(f"{col} BETWEEN %s AND %s")
+                    params += [lo, hi]
+                elif lo is not None:
+                    parts.append(f"{col} >= %s")
+                    params.append(lo)
+                else:
+                    parts.append(f"{col} <= %s")
+                    params.append(hi)
+        return (' AND '.join(parts) or '1=1'), tuple(params)
+
+    def cache_key(self):
+        return [sorted((c, list(v)) for c, v in self.conds.items()), self.sort_col, self.desc]
+
+
+# =========================
+# 参数解析与校验
+# =========================
+def _split(raw):
+    return list(dict.fromkeys(v.strip() for v in raw.split(',') if v.strip()))
+
+
+def _year(name, raw):
+    try:
+        year = int(raw)
+    except (TypeError, ValueError):
+        raise FilterError(f"{name} 必须是整数")
+    if not 1900 <= year <= 2100:
+        raise FilterError(f"{name} 必须在 1900~2100 之间")
+    return year
+
+
+def parse_filters(args, keyword=''):
+    """从 request.args 读取筛选与排序参数；一个都没有时返回 None（走原来的列表 / 搜索逻辑）"""
+    if not any((args.get(a) or '').strip() for a in FILTER_ARGS):
+        return None
+    conds = {}
+    for col in EQ_FIELDS:
+        values = _split(args.get(col) or '')
+        if not values:
+            continue
+        if len(values) > MAX_VALUES:
+            raise FilterError(f"{col} 最多 {MAX_VALUES} 个取值")
+        conds[col] = ('in', values)
+
+    years = _split(args.get(RANGE_FIELD) or '')
+    lo_raw, hi_raw = (args.get('grad_year_from') or '').strip(), (args.get('grad_year_to') or '').strip()
+    if years and (lo_raw or hi_raw):
+        raise FilterError("grad_year 不能与 grad_year_from / grad_year_to 同时使用")
+    if years:
+        if len(years) > MAX_VALUES:
+            raise FilterError(f"grad_year 最多 {MAX_VALUES} 个取值")
+        conds[RANGE_FIELD] = ('in', [_year('grad_year', y) for y in years])
+    elif lo_raw or hi_raw:
+        lo = _year('grad_year_from', lo_raw) if lo_raw else None
+        hi = _year('grad_year_to', hi_raw) if hi_raw else None
+        if lo is not None and hi is not None and lo > hi:
+            raise FilterError("grad_year_from 不能大于 grad_year_to")
+        conds[RANGE_FIELD] = ('range', lo, hi)
+
+    sort = (args.get('sort') or '').strip()
+    if sort and keyword:
+        raise FilterError("关键词搜索按相关度排序，不能同时指定 sort")
+    desc = sort.startswith('-')
+    sort_col = sort.lstrip('-') or 'id'
+    if sort_col not in SORT_COLUMNS:
+        raise FilterError(f"不支持的排序: {sort}（可选: {', '.join(SORT_COLUMNS)}，前缀 - 为降序）")
+    return Filters(conds, sort_col, desc)
+
+
+# =========================
+# 查询计划
+# =========================
+# 没有筛选条件能用上索引时，按排序列的索引顺序扫描、边扫边过滤，凑满一页即停止；
+# 用得上索引但顺序不对时，要读出全部命中行再 filesort，按读取行数的 1.2 倍估算
+FILESORT_FACTOR = 1.2
+ESTIMATES_TTL = 300
+_estimates = {'at': 0.0, 'data': None}
+
+
+def _score(filters, cols):
+    """返回 (可用列数, 是否按索引顺序即满足排序)"""
+    used, eq_prefix = 0, 0
+    for col in cols:
+        kind = filters.kind(col)
+        if kind is None:
+            break
+        used += 1
+        if kind != 'eq':
+            break
+        eq_prefix += 1
+    # 去掉等值列之后剩下的索引顺序（末尾隐含 id）必须正好是 (排序列, id)
+    rest = list(cols[eq_prefix:]) + ['id']
+    if filters.sort_col == 'id':
+        ordered = rest == ['id']
+    else:
+        ordered = rest == [filters.sort_col, 'id']
+    return used, ordered
+
+
+def load_estimates(cursor):
+    """
+    各筛选列每个取值的人数（读校友统计汇总表 tb_user_stats，迁移 9），供 plan 估算选择性；
+    进程内缓存 ESTIMATES_TTL 秒，汇总表不存在时返回 None（plan 退回按规则选择）
+    """
+    now = time.monotonic()
+    if _estimates['data'] is not None and now - _estimates['at'] < ESTIMATES_TTL:
+        return _estimates['data']
+    try:
+        stats = alumni_stats.read(cursor, EQ_FIELDS + (RANGE_FIELD,))
+    except pymysql.err.MySQLError as e:
+        # 1146: Table doesn't exist
+        if not (e.args and e.args[0] == 1146):
+            raise
+        return None
+    data = {'total': stats['total']}
+    for col, dim in stats['dims'].items():
+        data[col] = {item[col]: item['count'] for item in dim['items']}
+    _estimates.update(at=now, data=data)
+    return data
+
+
+def _selectivity(filters, col, estimates):
+    total = estimates['total'] or 1
+    counts = estimates.get(col) or {}
+    cond = filters.conds[col]
+    if cond[0] == 'in':
+        n = sum(counts.get(v, 0) for v in cond[1])
+    else:
+        _, lo, hi = cond
+        n = sum(c for v, c in counts.items()
+                if v is not None and (lo is None or v >= lo) and (hi is None or v <= hi))
+    return max(n, 1) / total
+
+
+def _cost(filters, used_cols, ordered, limit, estimates):
+    """预计要读取的索引行数（命中数按各列相互独立估算）"""
+    total = estimates['total'] or 1
+    sel_used, sel_all = 1.0, 1.0
+    for col in filters.conds:
+        sel = _selectivity(filters, col, estimates)
+        sel_all *= sel
+        if col in used_cols:
+            sel_used *= sel
+    matched = total * sel_used
+    if ordered:
+        # 每读 sel_used / sel_all 条索引行才有一条通过其余条件
+        return min(matched, (limit + 1) * sel_used / sel_all)
+    return matched * FILESORT_FACTOR
+
+
+def plan(filters, limit=50, estimates=None):
+    """
+    选出预期使用的索引，返回 {'index', 'used_columns', 'ordered', 'estimated_rows'}。
+    有 estimates（load_estimates 的结果）时选预计读取行数最少的；否则按规则：
+    可用列最多者优先，其次是能按索引顺序分页的，再次是列少的（更小的索引）。
+    排序列的索引（按 id 排序时为主键）总是候选：条件选择性很低时，顺序扫描凑满一页比读出全部命中行更快。
+    """
+    best = None
+    for name, cols in INDEXES.items():
+        used, ordered = _score(filters, cols)
+        if used == 0 and name != SORT_INDEXES[filters.sort_col]:
+            continue
+        used_cols = cols[:used]
+        rule_key = (used, ordered, -len(cols))
+        if estimates:
+            cost = _cost(filters, used_cols, ordered, limit, estimates)
+            key = (-cost,) + rule_key
+        else:
+            cost, key = None, rule_key
+        if best is None or key > best[0]:
+            best = (key, name, used_cols, ordered, cost)
+    _, name, used_cols, ordered, cost = best
+    return {
+        'index': name,
+        'used_columns': list(used_cols),
+        'ordered': ordered,
+        'estimated_rows': round(cost) if cost is not None else None,
+    }
+
+
+# =========================
+# 游标
+# =========================
+def encode_cursor(value, row_id):
+    raw = json.dumps([value, row_id], separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, sort_col):
+    """返回 (排序列取值, id)；按 id 排序时也接受普通整数"""
+    if not token:
+        return None
+    if sort_col == 'id' and token.isdigit():
+        return int(token), int(token)
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return value, int(row_id)
+    except (ValueError, TypeError):
+        raise FilterError("after 游标无效")
+
+
+def _keyset(filters, cursor):
+    """(排序列, id) 之后的行；MySQL 中 NULL 升序排在最前、降序排在最后"""
+    if cursor is None:
+        return '', ()
+    value, row_id = cursor
+    col = filters.sort_col
+    if col == 'id':
+        return f"id {'<' if filters.desc else '>'} %s", (row_id,)
+    if not filters.desc:
+        if value is None:
+            return f"(({col} IS NULL AND id > %s) OR {col} IS NOT NULL)", (row_id,)
+        return f"({col} > %s OR ({col} = %s AND id > %s))", (value, value, row_id)
+    if value is None:
+        return f"({col} IS NULL AND id < %s)", (row_id,)
+    return f"({col} < %s OR ({col} = %s AND id < %s) OR {col} IS NULL)", (value, value, row_id)
+
+
+# =========================
+# 执行
+# =========================
+def _hint(index):
+    return f"FORCE INDEX ({index})"
+
+
+def build_query(filters, fields, limit, after=None, hint=True, estimates=None):
+    """返回 (SQL, 参数, 计划)；多取一条判断是否还有下一页"""
+    p = plan(filters, limit, estimates)
+    where, params = filters.where()
+    keyset, keyset_params = _keyset(filters, decode_cursor(after, filters.sort_col))
+    if keyset:
+        where, params = f"{where} AND {keyset}", params + keyset_params
+    direction = 'DESC' if filters.desc else 'ASC'
+    order = f"id {direction}" if filters.sort_col == 'id' else f"{filters.sort_col} {direction}, id {direction}"
+    columns = ', '.join(fields)
+    if filters.sort_col not in fields:
+        columns += f", {filters.sort_col}"
+    sql = f"""
+        SELECT {columns} FROM tb_user {_hint(p['index']) if hint else ''}
+        WHERE {where}
+        ORDER BY {order}
+        LIMIT %s
+    """
+    return sql, params + (limit + 1,), p
+
+
+def _run(cursor, sql_fn):
+    """按计划的索引执行；索引不存在（迁移 10 未执行）时去掉索引提示重试，返回 (结果, 是否用了提示)"""
+    try:
+        return sql_fn(True), True
+    except pymysql.err.MySQLError as e:
+        # 1176: Key doesn't exist in table
+        if not (e.args and e.args[0] == 1176):
+            raise
+        print("Filter index missing, running without index hint:", e)
+        return sql_fn(False), False
+
+
+def filter_users(cursor, filters, fields, limit, after=None, explain=False):
+    """
+    返回 {items, next_cursor, limit, sort}；next_cursor 为下一页的 after（不透明字符串，按 id 升序时为整数）。
+    explain=True 时附带 plan（预期索引与 EXPLAIN 结果）。
+    """
+    estimates = load_estimates(cursor)
+
+    def query(hint):
+        sql, params, p = build_query(filters, fields, limit, after, hint=hint, estimates=estimates)
+        cursor.execute(sql, params)
+        return cursor.fetchall(), sql, params, p
+
+    (rows, sql, params, p), hinted = _run(cursor, query)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        if filters.sort_col == 'id' and not filters.desc:
+            next_cursor = last['id']
+        else:
+            next_cursor = encode_cursor(last[filters.sort_col], last['id'])
+    if filters.sort_col not in fields:
+        for r in rows:
+            r.pop(filters.sort_col, None)
+    page = {
+        'items': rows,
+        'next_cursor': next_cursor,
+        'limit': limit,
+        'sort': ('-' if filters.desc else '') + filters.sort_col,
+    }
+    if explain:
+        page['plan'] = dict(p, hinted=hinted, explain=explain_query(cursor, sql, params, p['index']))
+    return page
+
+
+def count_users(cursor, filters):
+    """命中总数（调用方负责缓存）；不涉及排序，按规则选可用列最多的索引"""
+    where, params = filters.where()
+
+    def query(hint):
+        cursor.execute(f"SELECT COUNT(*) AS cnt FROM tb_user {_hint(plan(filters)['index']) if hint else ''} "
+                       f"WHERE {where}", params)
+        return cursor.fetchone()['cnt']
+
+    return _run(cursor, query)[0]
+
+
+def explain_query(cursor, sql, params, expected):
+    """EXPLAIN 实际执行的 SQL：优化器选用的索引、预估扫描行数、是否 filesort，以及是否与预期一致"""
+    cursor.execute("EXPLAIN " + sql, params)
+    rows = cursor.fetchall()
+    first = rows[0] if rows else {}
+    extra = first.get('Extra') or ''
+    return {
+        'key': first.get('key'),
+        'type': first.get('type'),
+        'rows': first.get('rows'),
+        'filtered': first.get('filtered'),
+        'extra': extra,
+        'filesort': 'filesort' in extra,
+        'as_expected': first.get('key') == expected,
+    }
+
+
+def main(argv=None):
+    import argparse
+    import os
+
+    import pymysql.cursors
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="对常见筛选组合逐个 EXPLAIN，核对索引选择")
+    parser.add_argument("--db", default=os.getenv('DB_NAME', 'alumni_mgmt'))
+    args = parser.parse_args(argv)
+    conn = pymysql.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', 3306)),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        db=args.db,
+        charset='utf8mb4',
+        cursorclass=pymysql.cursors.DictCursor,
+    )
+    try:
+        with conn.cursor() as cursor:
+            for query_args in QUERY_MIX:
+                filters = parse_filters(query_args)
+                sql, params, p = build_query(filters, ['id', 'name'], 50, estimates=load_estimates(cursor))
+                report = explain_query(cursor, sql, params, p['index'])
+                flag = 'ok' if report['as_expected'] else 'MISMATCH'
+                print(f"{flag:<8} {json.dumps(query_args, ensure_ascii=False)}\n"
+                      f"         expected={p['index']} used={p['used_columns']} ordered={p['ordered']} "
+                      f"estimated_rows={p['estimated_rows']} "
+                      f"actual={report['key']} rows={report['rows']} extra={report['extra']}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# services/http_cache.py
+# 条件请求（ETag / Last-Modified）：
+# - 校验值只由 updated_at（列表为 max(updated_at) + 行数）和请求参数算出，在查询、序列化正文之前就能判断
+# - If-None-Match 优先于 If-Modified-Since（RFC 9110）；命中时直接返回 304，不带正文
+# - updated_at 只精确到秒，因此使用弱 ETag（W/"..."）
+import datetime
+import hashlib
+import json
+
+from flask import Response
+from werkzeug.http import parse_date
+
+# 前端轮询时每次都要向服务端确认，但可以用 304 省掉正文
+CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(*parts):
+    """由任意可 JSON 序列化的部分算出 ETag 值（不含引号与 W/ 前缀）"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:24]
+
+
+def to_utc(value):
+    """
+    数据库中的 TIMESTAMP 取出为不带时区的 datetime，按 UTC 处理；整数视为 Unix 时间戳，
+    字符串为读缓存中保存的 HTTP 日期
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return parse_date(value)
+    if isinstance(value, (int, float)):
+        return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """请求带的校验值与当前一致时返回 True（只用于 GET / HEAD）"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def set_validators(response, etag, last_modified=None):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    return set_validators(Response(status=304), etag, last_modified)
@@ -0,0 +1,312 @@
+# services/jobs.py
+# AI 异步任务引擎：提交后立即返回任务 id，由每个 worker 内有界的线程池执行慢速的 LLM 调用
+# - 并发上限 max_workers、排队上限 max_queue，超出时拒绝提交（调用方返回 503）
+# - 任务状态、结果和错误持久化在 ai_job 表中，任意 worker 都能查询
+# - 记录排队等待时间、执行时间，以及本进程的队列深度
+# - 本进程接收的未完成任务定期写心跳（heartbeat_at），只有心跳过期或所属进程已退出的任务才被判为中断
+# - 任务内部的子任务（如批量生成摘要的各个分包）通过 map 使用同一组执行名额，总并发不超过 max_workers
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+FINISHED = ('succeeded', 'failed')
+
+
+class QueueFull(RuntimeError):
+    """排队任务数已达上限"""
+
+
+class UnknownJobKind(ValueError):
+    """未注册的任务类型"""
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:     # 没有权限等：进程存在
+        return True
+    return True
+
+
+class JobEngine:
+    def __init__(self, db_pool, max_workers=4, max_queue=100, window=500, heartbeat_interval=30):
+        self.db_pool = db_pool
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.heartbeat_interval = heartbeat_interval
+        self._handlers = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-job')
+        # 执行名额：任务本身和它的子任务都要先拿到名额才调用大模型
+        self._slots = threading.Semaphore(max_workers)
+        self._active = set()                   # 本进程接收、尚未结束的任务 id（需要写心跳）
+        self._heartbeat_pid = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._counters = {'submitted': 0, 'rejected': 0, 'succeeded': 0, 'failed': 0}
+        self._wait = deque(maxlen=window)      # 排队等待秒数
+        self._run = deque(maxlen=window)       # 执行秒数
+
+    def register(self, kind, handler):
+        """handler(params) -> 可 JSON 序列化的结果"""
+        self._handlers[kind] = handler
+
+    @property
+    def kinds(self):
+        return sorted(self._handlers)
+
+    @staticmethod
+    def worker_id():
+        """主机名:进程号；gunicorn fork 之后每个 worker 不同"""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    # -------------------------
+    # 提交 / 执行
+    # -------------------------
+    def submit(self, kind, params, owner_id=None):
+        if kind not in self._handlers:
+            raise UnknownJobKind(kind)
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._counters['rejected'] += 1
+                raise QueueFull(f"AI 任务排队已满（{self.max_queue}），请稍后再试")
+            self._queued += 1
+            self._counters['submitted'] += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            with self.db_pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO ai_job (id, kind, status, params, owner_id, worker, heartbeat_at)
+                    VALUES (%s, %s, 'queued', %s, %s, %s, NOW(3))
+                """, (job_id, kind, json.dumps(params, ensure_ascii=False), owner_id, self.worker_id()))
+                conn.commit()
+            with self._lock:
+                self._active.add(job_id)
+            self._ensure_heartbeat()
+            self._executor.submit(self._run_job, job_id, kind, params, time.monotonic())
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+                self._active.discard(job_id)
+            raise
+        return job_id
+
+    def _update(self, sql, params):
+        with self.db_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            conn.commit()
+
+    def _run_job(self, job_id, kind, params, enqueued_at):
+        with self._slots:
+            self._run_job_in_slot(job_id, kind, params, enqueued_at)
+
+    def _run_job_in_slot(self, job_id, kind, params, enqueued_at):
+        started = time.monotonic()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._wait.append(started - enqueued_at)
+        status = 'failed'
+        try:
+            self._update("UPDATE ai_job SET status='running', started_at=NOW(3) WHERE id=%s", (job_id,))
+            try:
+                result = self._handlers[kind](params)
+            except Exception as e:
+                print(f"AI job {kind} {job_id} error:", e)
+                self._update(
+                    "UPDATE ai_job SET status='failed', error=%s, finished_at=NOW(3) WHERE id=%s",
+                    (str(e)[:4000], job_id)
+                )
+            else:
+                self._update(
+                    "UPDATE ai_job SET status='succeeded', result=%s, finished_at=NOW(3) WHERE id=%s",
+                    (json.dumps(result, ensure_ascii=False, default=str), job_id)
+                )
+                status = 'succeeded'
+        except Exception as e:
+            # 数据库写入失败：任务状态无法持久化，只能记录日志
+            print(f"AI job {job_id} persist error:", e)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._active.discard(job_id)
+                self._counters[status] += 1
+                self._run.append(time.monotonic() - started)
+
+    def map(self, fn, items):
+        """
+        在任务内部并发执行子任务，按 items 顺序返回结果。调用方线程（已占用一个名额）自己处理子任务，
+        另起的辅助线程每处理一项前先拿一个空闲名额，拿不到就让调用方继续处理，因此总并发不超过 max_workers。
+        """
+        items = list(items)
+        results = [None] * len(items)
+        errors = []
+        lock = threading.Lock()
+        next_index = [0]
+
+        def take():
+            with lock:
+                if next_index[0] >= len(items):
+                    return None
+                next_index[0] += 1
+                return next_index[0] - 1
+
+        def left():
+            with lock:
+                return next_index[0] < len(items)
+
+        def work(i):
+            try:
+                results[i] = fn(items[i])
+            except Exception as e:
+                errors.append(e)
+
+        def helper():
+            while left():
+                if not self._slots.acquire(timeout=0.05):
+                    continue
+                try:
+                    i = take()
+                    if i is None:
+                        return
+                    work(i)
+                finally:
+                    self._slots.release()
+
+        helpers = [threading.Thread(target=helper, name='ai-job-sub', daemon=True)
+                   for _ in range(min(self.max_workers, len(items)) - 1)]
+        for t in helpers:
+            t.start()
+        while True:
+            i = take()
+            if i is None:
+                break
+            work(i)
+        for t in helpers:
+            t.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    # -------------------------
+    # 查询
+    # -------------------------
+    def get(self, job_id):
+        with self.db_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT id, kind, status, result, error, owner_id, created_at, started_at, finished_at
+                FROM ai_job WHERE id=%s
+            """, (job_id,))
+            job = cursor.fetchone()
+        if job and job['result'] is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+    # -------------------------
+    # 心跳与中断任务清理
+    # -------------------------
+    def _ensure_heartbeat(self):
+        """每个进程第一次提交任务时启动心跳线程（fork 之后子进程需要自己的线程）"""
+        if not self.heartbeat_interval or self._heartbeat_pid == os.getpid():
+            return
+        with self._lock:
+            if self._heartbeat_pid == os.getpid():
+                return
+            self._heartbeat_pid = os.getpid()
+        threading.Thread(target=self._heartbeat_loop, name='ai-job-heartbeat', daemon=True).start()
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                self.heartbeat()
+            except Exception as e:
+                print("AI job heartbeat error:", e)
+
+    def heartbeat(self):
+        with self._lock:
+            ids = list(self._active)
+        if not ids:
+            return 0
+        with self.db_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE ai_job SET heartbeat_at=NOW(3)
+                WHERE id IN ({', '.join(['%s'] * len(ids))}) AND status IN ('queued', 'running')
+            """, ids)
+            conn.commit()
+            return cursor.rowcount
+
+    def expire_stale(self, max_age_seconds):
+        """
+        将已中断的任务标记为失败：所属进程在本机且已退出，或心跳超过 max_age 秒未更新
+        （其他主机上的 worker 只能看心跳）。仍在运行的任务每 heartbeat_interval 秒更新一次心跳，不受影响。
+        """
+        host = socket.gethostname()
+        with self.db_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT id, worker FROM ai_job WHERE status IN ('queued', 'running') AND worker IS NOT NULL
+            """)
+            dead = []
+            for r in cursor.fetchall():
+                worker_host, _, pid = r['worker'].rpartition(':')
+                if worker_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                    dead.append(r['id'])
+            expired = 0
+            if dead:
+                cursor.execute(f"""
+                    UPDATE ai_job SET status='failed', error='任务执行中断（worker 已退出）', finished_at=NOW(3)
+                    WHERE id IN ({', '.join(['%s'] * len(dead))}) AND status IN ('queued', 'running')
+                """, dead)
+                expired += cursor.rowcount
+            # 心跳列为空的是加心跳之前创建的任务，按创建时间判断
+            cursor.execute("""
+                UPDATE ai_job SET status='failed', error='任务执行中断（worker 心跳超时）', finished_at=NOW(3)
+                WHERE status IN ('queued', 'running')
+                  AND COALESCE(heartbeat_at, created_at) < NOW(3) - INTERVAL %s SECOND
+            """, (int(max_age_seconds),))
+            expired += cursor.rowcount
+            conn.commit()
+            return expired
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return None
+        v = sorted(values)
+        pick = lambda p: v[min(len(v) - 1, int(p * len(v)))]
+        return {'avg_ms': round(sum(v) / len(v) * 1000, 1), 'p50_ms': round(pick(0.5) * 1000, 1),
+                'p95_ms': round(pick(0.95) * 1000, 1), 'max_ms': round(v[-1] * 1000, 1)}
+
+    def stats(self, with_db=True):
+        with self._lock:
+            data = dict(self._counters)
+            data.update({
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'queued': self._queued,
+                'running': self._running,
+                'wait': self._summary(self._wait),
+                'run': self._summary(self._run),
+            })
+        if with_db:
+            # 所有 worker 的总体情况（走 idx_status_created）
+            with self.db_pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT status, COUNT(*) AS cnt FROM ai_job
+                    WHERE status IN ('queued', 'running') GROUP BY status
+                """)
+                data['cluster'] = {r['status']: r['cnt'] for r in cursor.fetchall()}
+                cursor.execute("""
+                    SELECT MIN(created_at) AS oldest FROM ai_job WHERE status='queued'
+                """)
+                oldest = cursor.fetchone()['oldest']
+                data['cluster']['oldest_queued_at'] = str(oldest) if oldest else None
+        return data
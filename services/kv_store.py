@@ -0,0 +1,168 @@
+# services/kv_store.py
+# 通用键值缓存后端：
+# - MemoryStore：进程内 LRU + TTL，有条目上限（每个 worker 一份）
+# - RedisStore：多个 gunicorn worker 共享（需要安装 redis 包）
+# 通过 URL 选择：memory:// 或 redis://host:6379/0
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryStore:
+    """线程安全的 LRU + TTL 缓存。值按原对象保存，调用方不要修改取出的对象。"""
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()      # key -> (value, expires_at 或 None)
+        self._counters = {}             # 版本号计数器，不参与 LRU 淘汰（淘汰后归零会让旧缓存"复活"）
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'expired': 0}
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._stats['misses'] += 1
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            self._stats['sets'] += 1
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data.update({'backend': 'memory', 'entries': len(self._data), 'max_entries': self.max_entries,
+                         'counters': len(self._counters)})
+        return data
+
+
+class RedisStore:
+    """Redis 共享缓存，值以 JSON 保存；所有 key 加上命名空间前缀"""
+    def __init__(self, url, namespace='ams'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("使用 redis:// 缓存需要安装 redis 包：pip install redis")
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'errors': 0}
+
+    def _k(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key):
+        try:
+            raw = self._redis.get(self._k(key))
+        except Exception as e:
+            # 缓存不可用时按未命中处理，不影响主流程
+            print("Redis get error:", e)
+            self._count('errors')
+            return None
+        if raw is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        try:
+            self._redis.set(self._k(key), json.dumps(value, ensure_ascii=False, default=str),
+                            ex=int(ttl) if ttl else None)
+            self._count('sets')
+        except Exception as e:
+            print("Redis set error:", e)
+            self._count('errors')
+
+    def delete(self, key):
+        try:
+            self._redis.delete(self._k(key))
+        except Exception as e:
+            print("Redis delete error:", e)
+            self._count('errors')
+
+    def get_counter(self, key):
+        try:
+            raw = self._redis.get(self._k(key))
+        except Exception as e:
+            print("Redis get error:", e)
+            self._count('errors')
+            return -int(time.time() * 1000)
+        return int(raw) if raw is not None else 0
+
+    def incr(self, key):
+        try:
+            return int(self._redis.incr(self._k(key)))
+        except Exception as e:
+            print("Redis incr error:", e)
+            self._count('errors')
+            # 返回一个不会与正常版本号冲突的值，等价于让相关缓存失效
+            return -int(time.time() * 1000)
+
+    def clear(self):
+        try:
+            for key in self._redis.scan_iter(match=self._k('*'), count=1000):
+                self._redis.delete(key)
+        except Exception as e:
+            print("Redis clear error:", e)
+            self._count('errors')
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        data['backend'] = 'redis'
+        return data
+
+
+def make_store(url=None, max_entries=10000, namespace='ams'):
+    """按 URL 创建缓存后端：空 / memory:// → MemoryStore，redis:// / rediss:// → RedisStore"""
+    url = (url or 'memory://').strip()
+    if url.startswith('memory://'):
+        return MemoryStore(max_entries=max_entries)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisStore(url, namespace=namespace)
+    raise ValueError(f"不支持的缓存地址: {url}")
+
+
+def hit_ratio(stats):
+    total = stats.get('hits', 0) + stats.get('misses', 0)
+    return round(stats.get('hits', 0) / total, 4) if total else None
@@ -0,0 +1,116 @@
+# services/llm_cache.py
+# LLM 响应缓存：相同 (模型, system, 规范化后的 prompt, temperature) 直接返回上次的结果
+# - 后端可选进程内 LRU（TTL + 条目上限）或 Redis（多个 worker 共享命中）
+# - 支持按标签失效：例如 tags=["user:12"]，该校友资料变更后调用 invalidate("user:12")
+#   实现方式是把标签的版本号并入缓存键，失效时只需把版本号 +1，旧条目随 TTL / LRU 自然淘汰
+# - 标签版本号与读缓存一样：redis:// 时保存在 Redis 中；进程内 LRU 时由调用方传入 DbVersions，
+#   保存在 MySQL 的 cache_version 表中，任一 worker 失效后其他 worker 在版本号记忆期（默认 1 秒）内生效。
+#   不传 versions 时版本号只在本 worker 内，失效不会影响其他 worker
+import hashlib
+import json
+import threading
+
+from .kv_store import hit_ratio
+from .llm_client import DEFAULT_SYSTEM
+from .read_cache import DbVersions, StoreVersions
+
+ALL_TAG = "__all__"
+# cache_version.name 为 VARCHAR(64)，更长的标签名按摘要保存
+MAX_TAG_NAME = 64
+
+
+def normalize_prompt(prompt):
+    """去掉首尾空白并把连续空白压缩成一个空格（路由里的多行 f-string 带有缩进）"""
+    return " ".join((prompt or "").split())
+
+
+class CachedLLMClient:
+    def __init__(self, client, store, ttl=86400, versions=None):
+        self.client = client
+        self.store = store
+        self.ttl = ttl
+        self.versions = versions or StoreVersions(store)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'bypass': 0, 'invalidations': 0}
+
+    def __getattr__(self, name):
+        # model / base_url 等属性直接透传给底层客户端
+        return getattr(self.client, name)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def _tag_name(tag):
+        name = f"llmtag:{tag}"
+        if len(name) > MAX_TAG_NAME:
+            name = "llmtag:#" + hashlib.sha1(tag.encode("utf-8")).hexdigest()
+        return name
+
+    def _tag_version(self, tag):
+        return self.versions.get(self._tag_name(tag))
+
+    def cache_key(self, prompt, system=DEFAULT_SYSTEM, temperature=0.3, tags=()):
+        versions = [(t, self._tag_version(t)) for t in (ALL_TAG,) + tuple(sorted(tags or ()))]
+        raw = json.dumps([self.client.model, system, normalize_prompt(prompt), temperature, versions],
+                         ensure_ascii=False)
+        return "llm:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def ask(self, prompt, system=DEFAULT_SYSTEM, temperature=0.3, tags=(), refresh=False):
+        """
+        先查缓存，未命中再调用模型并写回。
+        refresh=True 时跳过读取、强制重新生成并覆盖缓存（对应请求头 Cache-Control: no-cache）。
+        """
+        key = self.cache_key(prompt, system, temperature, tags)
+        if refresh:
+            self._count('bypass')
+        else:
+            cached = self.store.get(key)
+            if cached is not None:
+                self._count('hits')
+                return cached
+            self._count('misses')
+
+        text = self.client.ask(prompt, system=system, temperature=temperature)
+        self.store.set(key, text, ttl=self.ttl)
+        return text
+
+    def ask_stream(self, prompt, system=DEFAULT_SYSTEM, temperature=0.3, tags=(), refresh=False):
+        """
+        流式版本：命中缓存时一次性返回整段文本；否则边生成边返回，完整生成结束后才写入缓存
+        （中途断开的不完整结果不会被缓存）。
+        """
+        key = self.cache_key(prompt, system, temperature, tags)
+        if refresh:
+            self._count('bypass')
+        else:
+            cached = self.store.get(key)
+            if cached is not None:
+                self._count('hits')
+                yield cached
+                return
+            self._count('misses')
+
+        parts = []
+        stream = self.client.ask_stream(prompt, system=system, temperature=temperature)
+        try:
+            for piece in stream:
+                parts.append(piece)
+                yield piece
+        finally:
+            stream.close()
+        self.store.set(key, "".join(parts), ttl=self.ttl)
+
+    def invalidate(self, tag=None):
+        """让某个标签（不传则全部）下的缓存失效"""
+        self.versions.bump([self._tag_name(tag or ALL_TAG)])
+        self._count('invalidations')
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        data['hit_ratio'] = hit_ratio(data)
+        data['versions'] = 'db' if isinstance(self.versions, DbVersions) else 'store'
+        data['store'] = self.store.stats()
+        return data
@@ -1,4 +1,82 @@
-import os, requests
+import os, json, random, threading, time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import registry as metrics
+
+# =========================
+# 进程级共享 Session：同一 worker 内所有 LLMClient 复用 keep-alive 连接，避免每次都做 TCP/TLS 握手
+# =========================
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size=None):
+    """返回当前进程共享的 requests.Session（fork 后在子进程中重新创建）"""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            size = pool_size or int(os.getenv("LLM_POOL_SIZE", 10))
+            s = requests.Session()
+            # 重试由 LLMClient 自己控制（需要读取 Retry-After），这里关掉 urllib3 的重试
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=size, max_retries=0)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session, _session_pid = s, pid
+    return _session
+
+
+class LLMStats:
+    """调用统计：次数、失败、重试、延迟分位数（最近 N 次）"""
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.status = {}
+
+    def record(self, latency, retries, status=None, ok=True):
+        with self._lock:
+            self.calls += 1
+            self.retries += retries
+            if not ok:
+                self.failures += 1
+            if status is not None:
+                self.status[str(status)] = self.status.get(str(status), 0) + 1
+            self._latencies.append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            lat = sorted(self._latencies)
+            data = {
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "status": dict(self.status),
+            }
+        if lat:
+            pick = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))]
+            data.update({
+                "latency_avg_ms": round(sum(lat) / len(lat) * 1000, 1),
+                "latency_p50_ms": round(pick(0.50) * 1000, 1),
+                "latency_p95_ms": round(pick(0.95) * 1000, 1),
+                "latency_max_ms": round(lat[-1] * 1000, 1),
+            })
+        return data
+
+
+# 进程内所有 LLMClient 共享一份统计
+stats = LLMStats()
+
+DEFAULT_SYSTEM = "你是校友管理系统的小助手。"
+
 
 class LLMClient:
     """OpenAI-compatible client for Volcengine Ark / Doubao / Qwen."""
@@ -9,33 +87,75 @@ class LLMClient:
       注意去掉结尾的 /。
     - api_key：认证用的 API key，从环境变量 LLM_API_KEY 读。
     - model：指定要用的模型，在火山 Ark 是接入点 ID（ep-xxxxxx）。
-    - timeout：请求超时时间，默认 60 秒。
+    - timeout：读取超时（等待模型返回），默认 60 秒，可用 LLM_READ_TIMEOUT 配置。
+    - connect_timeout：建连超时，默认 5 秒，可用 LLM_CONNECT_TIMEOUT 配置。
+    - max_retries：429 / 5xx / 连接失败时的最大重试次数，默认 3，可用 LLM_MAX_RETRIES 配置。
+    - backoff：指数退避的基础秒数，实际等待为 backoff * 2^n 的随机抖动，上限 backoff_max。
     """
-    def __init__(self, base_url=None, api_key=None, model=None, timeout=60):
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url=None, api_key=None, model=None, timeout=None,
+                 connect_timeout=None, max_retries=None, backoff=None, backoff_max=None):
         # 正确 base_url：不要带 /v1，也不要再拼 /chat/completions
         self.base_url = (base_url or os.getenv("LLM_BASE_URL")
                          or "https://ark.cn-beijing.volces.com/api/v3").rstrip("/")
         self.api_key = api_key or os.getenv("LLM_API_KEY", "")
         # Ark 的 model 通常是接入点ID，形如 ep-xxxxxxxx
         self.model = model or os.getenv("LLM_MODEL", "ep-xxxxxxxx")
-        self.timeout = timeout
+        self.timeout = float(timeout or os.getenv("LLM_READ_TIMEOUT", 60))
+        self.connect_timeout = float(connect_timeout or os.getenv("LLM_CONNECT_TIMEOUT", 5))
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("LLM_MAX_RETRIES", 3))
+        self.backoff = float(backoff if backoff is not None else os.getenv("LLM_BACKOFF", 0.5))
+        self.backoff_max = float(backoff_max if backoff_max is not None else os.getenv("LLM_BACKOFF_MAX", 8))
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _retry_delay(self, attempt, response=None):
+        """优先使用服务端的 Retry-After（秒），否则指数退避 + 全抖动"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+    def _post(self, payload, stream=False):
+        """带重试地发送请求，返回成功的 Response 和重试次数"""
+        if not self.base_url or not self.api_key:
+            raise RuntimeError("LLM_BASE_URL / LLM_API_KEY 未配置")
+
+        url = f"{self.base_url}/chat/completions"   # ← 正确路径
+        session = get_session()
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = session.post(url, json=payload, headers=self._headers(), stream=stream,
+                                        timeout=(self.connect_timeout, self.timeout))
+            except requests.ConnectionError:
+                # 只重试连接失败（含建连超时）；读超时说明模型已在生成，重试代价太高，直接抛出
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if response.status_code not in self.RETRY_STATUS or attempt >= self.max_retries:
+                    return response, attempt
+                response.close()
+            time.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
     """
     ask 方法：
     - prompt：用户的问题或指令。
     - system：系统角色，默认是校友管理系统的助手。
     - temperature：温度参数，控制生成的随机性，默认 0.3。
     """
-    def ask(self, prompt, system="你是校友管理系统的小助手。", temperature=0.3):
-        if not self.base_url or not self.api_key:
-            raise RuntimeError("LLM_BASE_URL / LLM_API_KEY 未配置")
-
-        url = f"{self.base_url}/chat/completions"   # ← 正确路径
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            # 关键：禁用 gzip/deflate 协商，避免错误解压
-            "Accept-Encoding": "identity",
-            "Content-Type": "application/json",
-        }
+    def ask(self, prompt, system=DEFAULT_SYSTEM, temperature=0.3):
         payload = {
             "model": self.model,  # ep-...（方舟接入点ID）
             "messages": [
@@ -46,7 +166,61 @@ class LLMClient:
             "stream": False,
         }
 
-        r = requests.post(url, json=payload, headers=headers, timeout=self.timeout)
-        r.raise_for_status()
-        data = r.json()
-        return data["choices"][0]["message"]["content"]
+        start = time.monotonic()
+        retries, status, text = 0, None, ""
+        try:
+            r, retries = self._post(payload)
+            status = r.status_code
+            r.raise_for_status()
+            data = r.json()
+            text = data["choices"][0]["message"]["content"]
+        except Exception:
+            stats.record(time.monotonic() - start, retries, status, ok=False)
+            raise
+        finally:
+            metrics.observe_llm(time.monotonic() - start, len(system) + len(prompt), len(text or ""))
+        stats.record(time.monotonic() - start, retries, status)
+        return text
+
+    """
+    ask_stream 方法：参数同 ask，以生成器形式逐段返回模型输出（OpenAI 兼容的 SSE 流）。
+    调用方提前关闭生成器（例如浏览器断开）时，会立即关闭与上游的连接，上游随之停止生成。
+    """
+    def ask_stream(self, prompt, system=DEFAULT_SYSTEM, temperature=0.3):
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": temperature,
+            "stream": True,
+        }
+
+        start = time.monotonic()
+        retries, status, ok = 0, None, False
+        r = None
+        response_chars = 0
+        try:
+            r, retries = self._post(payload, stream=True)
+            status = r.status_code
+            r.raise_for_status()
+            # SSE 响应通常不带 charset，按字节读取再用 utf-8 解码，避免中文乱码
+            for raw in r.iter_lines():
+                if not raw or not raw.startswith(b"data:"):
+                    continue
+                data = raw[5:].strip()
+                if data == b"[DONE]":
+                    break
+                chunk = json.loads(data.decode("utf-8"))
+                choices = chunk.get("choices") or []
+                piece = choices[0].get("delta", {}).get("content") if choices else None
+                if piece:
+                    response_chars += len(piece)
+                    yield piece
+            ok = True
+        finally:
+            if r is not None:
+                r.close()
+            stats.record(time.monotonic() - start, retries, status, ok=ok)
+            metrics.observe_llm(time.monotonic() - start, len(system) + len(prompt), response_chars)
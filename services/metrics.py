@@ -0,0 +1,329 @@
+# services/metrics.py
+# 请求级指标：
+# - 每个路由的请求数与延迟直方图
+# - 分阶段计时：数据库（等待连接 / execute / fetch）、大模型调用（含提示词 / 回复字符数）、响应序列化
+# - 当前请求的各阶段耗时累计在线程局部变量中，用于 Server-Timing 响应头和慢请求日志
+# - Prometheus 文本格式输出；多个 gunicorn worker 各自把快照写到 METRICS_DIR/<pid>.json，
+#   /api/metrics 读取全部文件汇总（计数器与直方图相加；仪表盘只取仍存活的 worker）；
+#   已退出 worker 的快照并入 _retired.json 后删除，计数器不会因 worker 重启而变小，目录中的文件数也不会一直增长
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:     # 非 POSIX 平台：不合并已退出 worker 的快照
+    fcntl = None
+
+# 延迟直方图的桶（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+RETIRED_FILE = '_retired.json'      # 已退出 worker 的计数器与直方图累计值
+LOCK_FILE = '.lock'
+
+# 提示词 / 回复字符数的桶
+SIZE_BUCKETS = (100, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+PHASES = ('db_wait', 'db_execute', 'db_fetch', 'llm', 'serialize')
+
+HELP = {
+    'ams_http_requests_total': ('counter', "HTTP 请求数"),
+    'ams_http_request_duration_seconds': ('histogram', "HTTP 请求处理耗时（流式响应只计到返回响应头）"),
+    'ams_phase_duration_seconds': ('histogram', "各阶段单次操作耗时：db_wait 为等待连接池，db_execute / db_fetch "
+                                                "为一次执行 / 取结果，llm 为一次模型调用，serialize 为一次 JSON 序列化"),
+    'ams_llm_prompt_chars': ('histogram', "大模型提示词字符数（含 system）"),
+    'ams_llm_response_chars': ('histogram', "大模型回复字符数"),
+    'ams_slow_requests_total': ('counter', "超过慢请求阈值的请求数"),
+    'ams_db_pool_connections': ('gauge', "数据库连接池连接数"),
+    'ams_db_pool_events_total': ('counter', "数据库连接池事件（建连、回收、等待超时等）"),
+}
+
+
+def _key(name, labels):
+    return name + '|' + ','.join(f"{k}={v}" for k, v in sorted(labels.items()))
+
+
+def _split(key):
+    name, _, raw = key.partition('|')
+    labels = dict(item.split('=', 1) for item in raw.split(',')) if raw else {}
+    return name, labels
+
+
+class Registry:
+    def __init__(self, slow_ms=1000, slow_log_size=100):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}       # key -> [各桶计数..., +Inf 计数, sum]
+        self._buckets = {}          # 指标名 -> 桶
+        self._local = threading.local()
+        self.slow_ms = slow_ms
+        self.slow_log = deque(maxlen=slow_log_size)
+
+    # -------------------------
+    # 基本操作
+    # -------------------------
+    def inc(self, name, labels=None, value=1):
+        key = _key(name, labels or {})
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None, buckets=LATENCY_BUCKETS):
+        key = _key(name, labels or {})
+        with self._lock:
+            self._buckets.setdefault(name, buckets)
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    h[i] += 1
+                    break
+            else:
+                h[len(buckets)] += 1
+            h[-1] += value
+
+    # -------------------------
+    # 请求与阶段
+    # -------------------------
+    def begin_request(self):
+        self._local.phases = {}
+        self._local.start = time.perf_counter()
+
+    def end_request(self, method, route, status):
+        """记录请求耗时，返回 (总耗时秒, {阶段: [耗时秒, 次数]})"""
+        start = getattr(self._local, 'start', None)
+        phases = getattr(self._local, 'phases', None) or {}
+        self._local.start = self._local.phases = None
+        if start is None:
+            return 0.0, phases
+        elapsed = time.perf_counter() - start
+        self.inc('ams_http_requests_total', {'method': method, 'route': route, 'status': str(status)})
+        self.observe('ams_http_request_duration_seconds', elapsed, {'method': method, 'route': route})
+        if elapsed * 1000 >= self.slow_ms:
+            self.inc('ams_slow_requests_total', {'route': route})
+            entry = {
+                'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'method': method, 'route': route, 'status': status,
+                'total_ms': round(elapsed * 1000, 1),
+                'phases': {p: {'ms': round(v[0] * 1000, 1), 'count': v[1]} for p, v in phases.items()},
+            }
+            self.slow_log.append(entry)
+            breakdown = " ".join(f"{p}={v['ms']}ms/{v['count']}" for p, v in entry['phases'].items())
+            print(f"Slow request: {method} {route} {status} {entry['total_ms']}ms {breakdown}".rstrip())
+        return elapsed, phases
+
+    def current_phases(self):
+        return dict(getattr(self._local, 'phases', None) or {})
+
+    def observe_phase(self, phase, seconds):
+        self.observe('ams_phase_duration_seconds', seconds, {'phase': phase})
+        phases = getattr(self._local, 'phases', None)
+        if phases is not None:
+            item = phases.setdefault(phase, [0.0, 0])
+            item[0] += seconds
+            item[1] += 1
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_phase(name, time.perf_counter() - start)
+
+    def observe_llm(self, seconds, prompt_chars, response_chars):
+        self.observe_phase('llm', seconds)
+        self.observe('ams_llm_prompt_chars', prompt_chars, buckets=SIZE_BUCKETS)
+        self.observe('ams_llm_response_chars', response_chars, buckets=SIZE_BUCKETS)
+
+    # -------------------------
+    # 快照与输出
+    # -------------------------
+    def snapshot(self, gauges=None, counters=None):
+        """
+        本进程的全部指标；gauges / counters 为 {key: 值}，由调用方在采集时计算
+        （例如连接池状态与连接池自进程启动以来的累计事件数）
+        """
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'time': time.time(),
+                'counters': dict(self._counters, **(counters or {})),
+                'histograms': {k: list(v) for k, v in self._histograms.items()},
+                'buckets': {k: list(v) for k, v in self._buckets.items()},
+                'gauges': dict(gauges or {}),
+            }
+
+
+def gauge_key(name, labels=None):
+    return _key(name, labels or {})
+
+
+# =========================
+# 多 worker 汇总
+# =========================
+def write_snapshot(directory, snapshot):
+    """原子地写入本 worker 的快照文件"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{snapshot['pid']}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _load(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _add(total, snap):
+    """把 snap 的计数器与直方图加到 total 上"""
+    for k, v in snap['counters'].items():
+        total['counters'][k] = total['counters'].get(k, 0) + v
+    for k, v in snap['histograms'].items():
+        cur = total['histograms'].get(k)
+        if cur is None or len(cur) != len(v):
+            total['histograms'][k] = list(v)
+        else:
+            total['histograms'][k] = [a + b for a, b in zip(cur, v)]
+    total['buckets'].update(snap.get('buckets', {}))
+
+
+def retire_dead(directory):
+    """
+    把已退出 worker 的快照并入 RETIRED_FILE 后删除，返回处理的文件数；
+    多个 worker 同时调用时由文件锁串行化，先合并写入、再删除快照，中途失败最多少删一个文件
+    """
+    if fcntl is None:
+        return 0
+    dead = [name for name in os.listdir(directory)
+            if name.endswith('.json') and name[:-5].isdigit() and not _alive(int(name[:-5]))]
+    if not dead:
+        return 0
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            path = os.path.join(directory, RETIRED_FILE)
+            retired = _load(path) or {'pid': None, 'counters': {}, 'histograms': {}, 'buckets': {}, 'gauges': {}}
+            done = []
+            for name in dead:
+                # 加锁前可能已被其他 worker 处理
+                snap = _load(os.path.join(directory, name))
+                if snap is None:
+                    continue
+                _add(retired, snap)
+                done.append(name)
+            if not done:
+                return 0
+            retired['time'] = time.time()
+            tmp = f"{path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(retired, f)
+            os.replace(tmp, path)
+            for name in done:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+            return len(done)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read_snapshots(directory):
+    snapshots = []
+    if not directory or not os.path.isdir(directory):
+        return snapshots
+    try:
+        retire_dead(directory)
+    except OSError as e:
+        print("Metrics retire error:", e)
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        snap = _load(os.path.join(directory, name))
+        if snap is not None:
+            snapshots.append(snap)
+    return snapshots
+
+
+def merge(snapshots):
+    """计数器、直方图跨 worker 相加（已退出 worker 的累计值保留）；仪表盘只取存活的 worker"""
+    merged = {'counters': {}, 'histograms': {}, 'buckets': {}, 'gauges': {}, 'workers': 0}
+    for snap in snapshots:
+        _add(merged, snap)
+        # RETIRED_FILE 的 pid 为 None
+        if snap.get('pid') and _alive(snap['pid']):
+            merged['workers'] += 1
+            for k, v in snap['gauges'].items():
+                merged['gauges'][k] = merged['gauges'].get(k, 0) + v
+    return merged
+
+
+def _fmt_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in sorted(labels.items())) + '}'
+
+
+def _fmt_bound(b):
+    return str(int(b)) if float(b).is_integer() else repr(float(b))
+
+
+def render(merged):
+    """Prometheus 文本格式（0.0.4）"""
+    lines, seen = [], set()
+
+    def header(name):
+        if name in seen:
+            return
+        seen.add(name)
+        kind, text = HELP.get(name, ('untyped', ''))
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for key in sorted(merged['counters']):
+        name, labels = _split(key)
+        header(name)
+        lines.append(f"{name}{_fmt_labels(labels)} {merged['counters'][key]}")
+    for key in sorted(merged['gauges']):
+        name, labels = _split(key)
+        header(name)
+        lines.append(f"{name}{_fmt_labels(labels)} {merged['gauges'][key]}")
+    for key in sorted(merged['histograms']):
+        name, labels = _split(key)
+        header(name)
+        values = merged['histograms'][key]
+        buckets = merged['buckets'].get(name, LATENCY_BUCKETS)
+        cumulative = 0
+        for bound, count in zip(buckets, values):
+            cumulative += count
+            lines.append(f"{name}_bucket{_fmt_labels(dict(labels, le=_fmt_bound(bound)))} {cumulative}")
+        count = cumulative + values[len(buckets)]
+        lines.append(f"{name}_bucket{_fmt_labels(dict(labels, le='+Inf'))} {count}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {round(values[-1], 6)}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+    lines.append("# HELP ams_workers 仍在运行、已上报指标的 worker 数")
+    lines.append("# TYPE ams_workers gauge")
+    lines.append(f"ams_workers {merged['workers']}")
+    return "\n".join(lines) + "\n"
+
+
+# 进程内共享一份；慢请求阈值由 app 启动时按 SLOW_REQUEST_MS 设置
+registry = Registry()
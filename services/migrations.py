@@ -0,0 +1,369 @@
+# services/migrations.py
+# 数据库版本管理：schema_version 表记录已执行的迁移，按版本号顺序向前执行
+# 所有迁移都必须是幂等的（IF NOT EXISTS / 先检查再变更），重复执行不会破坏数据
+import time
+
+LOCK_NAME = "alumni_schema_migrate"
+
+# 每一项：(版本号, 描述, 函数(cursor))，版本号只增不改
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """注册一个迁移函数"""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+# =========================
+# 工具函数（供迁移内部使用）
+# =========================
+def table_exists(cursor, table):
+    cursor.execute("""
+        SELECT COUNT(*) AS cnt FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table,))
+    return cursor.fetchone()['cnt'] > 0
+
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*) AS cnt FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone()['cnt'] > 0
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT COUNT(*) AS cnt FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, index))
+    return cursor.fetchone()['cnt'] > 0
+
+
+def add_index_if_missing(cursor, table, index, ddl):
+    """ddl 形如 "KEY idx_x (a, b)"，已存在同名索引则跳过"""
+    if not index_exists(cursor, table, index):
+        cursor.execute(f"ALTER TABLE {table} ADD {ddl}")
+        print(f"  + {table}.{index}")
+
+
+# =========================
+# 迁移列表
+# =========================
+@migration(1, "创建 tb_user / auth_user 基础表")
+def _m001_base_tables(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tb_user (
+      id INT PRIMARY KEY AUTO_INCREMENT,
+      name VARCHAR(100) NOT NULL,
+      gender VARCHAR(10) DEFAULT NULL,
+      age INT DEFAULT NULL,
+      phone VARCHAR(30) DEFAULT NULL,
+      email VARCHAR(120) DEFAULT NULL,
+      grad_year INT DEFAULT NULL,
+      degree VARCHAR(64) DEFAULT NULL,
+      major VARCHAR(128) DEFAULT NULL,
+      city VARCHAR(64) DEFAULT NULL,
+      country VARCHAR(64) DEFAULT NULL,
+      bio TEXT DEFAULT NULL,
+      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+      updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+      KEY idx_name (name),
+      KEY idx_phone (phone),
+      KEY idx_major (major),
+      KEY idx_city (city),
+      KEY idx_grad_year (grad_year)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS auth_user (
+      id INT PRIMARY KEY AUTO_INCREMENT,
+      username VARCHAR(50) UNIQUE NOT NULL,
+      password_hash VARCHAR(255) NOT NULL,
+      role ENUM('admin', 'user') DEFAULT 'user',
+      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+      updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+      last_login TIMESTAMP NULL,
+      is_active BOOLEAN DEFAULT TRUE,
+      KEY idx_username (username),
+      KEY idx_role (role)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+@migration(2, "写入示例校友数据与默认管理员（仅在表为空时）")
+def _m002_seed(cursor):
+    cursor.execute("SELECT COUNT(*) AS count FROM tb_user")
+    if cursor.fetchone()['count'] == 0:
+        cursor.execute("""
+        INSERT INTO tb_user (name, gender, age, phone, email, grad_year, degree, major, city, country, bio) VALUES
+        ('张三', '男', 30, '13800000001', 'zhangsan@example.com', 2017, '硕士', '计算机科学', '北京', '中国', '后端工程师，分布式存储方向'),
+        ('李四', '女', 29, '13800000002', 'lisi@example.com', 2018, '本科', '通信工程', '上海', '中国', '运营商网络优化，5G 项目'),
+        ('王五', '男', 28, '13800000003', 'wangwu@example.com', 2019, '硕士', '人工智能', '深圳', '中国', '算法工程师，NLP/LLM'),
+        ('Lucy', '女', 31, '13800000004', 'lucy@example.com', 2016, '硕士', '软件工程', 'New York', 'USA', '全栈开发，React/Flask')
+        """)
+        print("  ✓ 示例数据插入成功")
+
+    cursor.execute("SELECT COUNT(*) AS count FROM auth_user WHERE role='admin'")
+    if cursor.fetchone()['count'] == 0:
+        from werkzeug.security import generate_password_hash
+        cursor.execute(
+            "INSERT INTO auth_user (username, password_hash, role, is_active) VALUES ('admin', %s, 'admin', TRUE)",
+            (generate_password_hash('admin123'),)
+        )
+        print("  ✓ 默认管理员账户创建成功 (用户名: admin, 密码: admin123)")
+
+
+@migration(3, "校友搜索：ngram 全文索引与 email 索引")
+def _m003_search_indexes(cursor):
+    # ngram 解析器需要 MySQL 5.7.6+；InnoDB 一次只能新建一个 FULLTEXT 索引，所以逐个执行
+    add_index_if_missing(cursor, 'tb_user', 'ft_user_all',
+                         "FULLTEXT KEY ft_user_all (name, major, city, country, bio) WITH PARSER ngram")
+    add_index_if_missing(cursor, 'tb_user', 'ft_user_name',
+                         "FULLTEXT KEY ft_user_name (name) WITH PARSER ngram")
+    add_index_if_missing(cursor, 'tb_user', 'ft_user_major',
+                         "FULLTEXT KEY ft_user_major (major) WITH PARSER ngram")
+    add_index_if_missing(cursor, 'tb_user', 'ft_user_bio',
+                         "FULLTEXT KEY ft_user_bio (bio) WITH PARSER ngram")
+    add_index_if_missing(cursor, 'tb_user', 'idx_email', "KEY idx_email (email)")
+
+
+@migration(4, "tb_user.updated_at 索引（增量同步 / 变更轮询）")
+def _m004_updated_at_index(cursor):
+    add_index_if_missing(cursor, 'tb_user', 'idx_updated_at', "KEY idx_updated_at (updated_at, id)")
+
+
+@migration(5, "AI 异步任务表 ai_job")
+def _m005_ai_job(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ai_job (
+      id CHAR(32) PRIMARY KEY,
+      kind VARCHAR(32) NOT NULL,
+      status ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+      params MEDIUMTEXT,
+      result MEDIUMTEXT,
+      error TEXT,
+      owner_id INT DEFAULT NULL,
+      created_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+      started_at DATETIME(3) NULL,
+      finished_at DATETIME(3) NULL,
+      KEY idx_status_created (status, created_at),
+      KEY idx_owner_created (owner_id, created_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+
+@migration(6, "预生成校友摘要表 alumni_summary")
+def _m006_alumni_summary(cursor):
+    # content_hash 为生成摘要时所用字段的 SHA-256，资料未变化的校友批量任务会跳过
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS alumni_summary (
+      user_id INT PRIMARY KEY,
+      summary TEXT NOT NULL,
+      content_hash CHAR(64) NOT NULL,
+      model VARCHAR(128) DEFAULT NULL,
+      generated_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+      KEY idx_generated_at (generated_at),
+      CONSTRAINT fk_summary_user FOREIGN KEY (user_id) REFERENCES tb_user (id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+@migration(7, "校友删除记录表 tb_user_tombstone（变更订阅）")
+def _m007_user_tombstone(cursor):
+    # 删除校友时在同一事务中写入一条记录，供 /api/users/changes 返回删除事件；seq 即订阅游标
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tb_user_tombstone (
+      seq BIGINT PRIMARY KEY AUTO_INCREMENT,
+      user_id INT NOT NULL,
+      deleted_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+      KEY idx_deleted_at (deleted_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+@migration(8, "auth_user.session_gen（会话吊销）")
+def _m008_session_gen(cursor):
+    # 禁用 / 删除账户时 +1，登录时记入会话；两者不一致的会话视为已吊销
+    if not column_exists(cursor, 'auth_user', 'session_gen'):
+        cursor.execute("ALTER TABLE auth_user ADD COLUMN session_gen INT NOT NULL DEFAULT 0")
+
+
+@migration(9, "校友统计汇总表 tb_user_stats（仪表盘）")
+def _m009_user_stats(cursor):
+    # dim 为维度名（grad_year、city:grad_year 等），k1 / k2 为取值（交叉维度用两列），cnt 为人数；
+    # 由写入校友的事务增量维护，services/alumni_stats.py 定期全量重算纠偏
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tb_user_stats (
+      dim VARCHAR(32) NOT NULL,
+      k1 VARCHAR(128) NOT NULL DEFAULT '',
+      k2 VARCHAR(128) NOT NULL DEFAULT '',
+      cnt BIGINT NOT NULL DEFAULT 0,
+      PRIMARY KEY (dim, k1, k2)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin
+    """)
+    from .alumni_stats import recount
+    report = recount(cursor)
+    print(f"  ✓ 校友统计初始化完成：{report['buckets']} 个桶，{report['total']} 位校友")
+
+
+@migration(10, "tb_user 结构化筛选复合索引")
+def _m010_filter_indexes(cursor):
+    # 按常见筛选组合设计：等值列在前、毕业年份（范围 / 排序）在后；InnoDB 二级索引隐含以 id 结尾，
+    # 等值条件之后可按 (grad_year, id) 顺序直接分页。选用规则见 services/filters.py
+    add_index_if_missing(cursor, 'tb_user', 'idx_city_degree_grad',
+                         "KEY idx_city_degree_grad (city, degree, grad_year)")
+    add_index_if_missing(cursor, 'tb_user', 'idx_major_grad', "KEY idx_major_grad (major, grad_year)")
+    add_index_if_missing(cursor, 'tb_user', 'idx_degree_grad', "KEY idx_degree_grad (degree, grad_year)")
+    add_index_if_missing(cursor, 'tb_user', 'idx_country_city', "KEY idx_country_city (country, city)")
+    # 单列 idx_city / idx_major 是上面复合索引的最左前缀，删除以减少写入开销
+    for index in ('idx_city', 'idx_major'):
+        if index_exists(cursor, 'tb_user', index):
+            cursor.execute(f"ALTER TABLE tb_user DROP INDEX {index}")
+            print(f"  - tb_user.{index}")
+
+
+@migration(11, "校友搜索：手机号 / 邮箱 ngram 全文索引（子串匹配）")
+def _m011_contact_fulltext(cursor):
+    # idx_phone / idx_email 只能加速前缀匹配；手机号中间几位、邮箱中间的片段靠 ngram 短语匹配
+    add_index_if_missing(cursor, 'tb_user', 'ft_user_contact',
+                         "FULLTEXT KEY ft_user_contact (phone, email) WITH PARSER ngram")
+
+
+@migration(12, "ai_job 执行进程与心跳")
+def _m012_ai_job_heartbeat(cursor):
+    # 启动时只把所属进程已退出、或心跳过期的任务判为中断，不误伤其他仍在运行的 worker 的任务
+    if not column_exists(cursor, 'ai_job', 'worker'):
+        cursor.execute("""
+        ALTER TABLE ai_job
+          ADD COLUMN worker VARCHAR(128) NULL AFTER owner_id,
+          ADD COLUMN heartbeat_at DATETIME(3) NULL AFTER finished_at
+        """)
+
+
+@migration(13, "读缓存版本号表 cache_version")
+def _m013_cache_version(cursor):
+    # 进程内读缓存的失效版本号（services/read_cache.py），所有 worker 共享
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS cache_version (
+      name VARCHAR(64) PRIMARY KEY,
+      version BIGINT NOT NULL DEFAULT 0
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+@migration(14, "会话吊销记录表 auth_session_revocation（增量刷新）")
+def _m014_session_revocation(cursor):
+    # 禁用 / 启用 / 删除账户时写入该账户最新的 session_gen 与 is_active（删除账户后记录仍保留），
+    # 各 worker 按 updated_at 增量拉取（services/sessions.py），不再定期全量读取 auth_user
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS auth_session_revocation (
+      user_id INT PRIMARY KEY,
+      session_gen INT NOT NULL,
+      is_active TINYINT(1) NOT NULL,
+      updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+      KEY idx_updated_at (updated_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+@migration(15, "tb_user_stats 分片计数（写事务不再争用同一行）")
+def _m015_user_stats_shards(cursor):
+    # 已有计数都在分片 0；之后每个写事务随机加到一个分片上，读取时按 (dim, k1, k2) 求和
+    if not column_exists(cursor, 'tb_user_stats', 'shard'):
+        cursor.execute("""
+        ALTER TABLE tb_user_stats
+          ADD COLUMN shard TINYINT UNSIGNED NOT NULL DEFAULT 0 AFTER k2,
+          DROP PRIMARY KEY,
+          ADD PRIMARY KEY (dim, k1, k2, shard)
+        """)
+
+
+# =========================
+# 执行引擎
+# =========================
+def ensure_version_table(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+      version INT PRIMARY KEY,
+      description VARCHAR(255) NOT NULL,
+      applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+      duration_ms INT DEFAULT NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def current_version(cursor):
+    """读取当前版本：主键上的 MAX，O(1)；版本表不存在时返回 0"""
+    try:
+        cursor.execute("SELECT MAX(version) AS v FROM schema_version")
+    except Exception as e:
+        # 1146: Table doesn't exist
+        if getattr(e, 'args', [None])[0] == 1146:
+            return 0
+        raise
+    row = cursor.fetchone()
+    return (row and row['v']) or 0
+
+
+def pending(cursor):
+    v = current_version(cursor)
+    return [m for m in MIGRATIONS if m[0] > v]
+
+
+def migrate(conn, lock_timeout=60, target=None):
+    """
+    在 MySQL 命名锁保护下执行所有未执行的迁移：
+    多个 worker 同时启动时只有一个真正执行，其余等待锁释放后发现已是最新版本直接返回。
+    返回本次执行的版本号列表。
+    """
+    applied = []
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT GET_LOCK(%s, %s) AS ok", (LOCK_NAME, lock_timeout))
+        if not cursor.fetchone()['ok']:
+            raise RuntimeError(f"获取迁移锁超时（{lock_timeout}s），可能有其他进程正在迁移")
+        try:
+            ensure_version_table(cursor)
+            conn.commit()
+            for version, description, fn in pending(cursor):
+                if target is not None and version > target:
+                    break
+                print(f"→ 执行迁移 {version}: {description}")
+                start = time.monotonic()
+                fn(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description, duration_ms) VALUES (%s, %s, %s)",
+                    (version, description, int((time.monotonic() - start) * 1000))
+                )
+                # DDL 会隐式提交；这里提交数据变更和版本记录
+                conn.commit()
+                applied.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+    return applied
+
+
+def status(cursor):
+    ensure_version_table(cursor)
+    cursor.execute("SELECT version, description, applied_at, duration_ms FROM schema_version ORDER BY version")
+    done = {r['version']: r for r in cursor.fetchall()}
+    return [{
+        'version': v,
+        'description': d,
+        'applied_at': done[v]['applied_at'] if v in done else None,
+        'duration_ms': done[v]['duration_ms'] if v in done else None,
+    } for v, d, _ in MIGRATIONS]
@@ -0,0 +1,120 @@
+# services/pagination.py
+# 列表接口通用：基于主键 id 的游标分页（keyset）、字段投影、可选的总数统计（带缓存）
+import time
+import threading
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class PageArgsError(ValueError):
+    """分页 / 字段参数不合法"""
+
+
+def parse_page_args(args, default_limit=DEFAULT_LIMIT, max_limit=MAX_LIMIT):
+    """从 request.args 读取 after / limit，返回 (after, limit)"""
+    try:
+        after = int(args.get('after') or 0)
+        limit = int(args.get('limit') or default_limit)
+    except (TypeError, ValueError):
+        raise PageArgsError("after / limit 必须是整数")
+    if after < 0:
+        raise PageArgsError("after 不能为负数")
+    if limit <= 0:
+        raise PageArgsError("limit 必须大于 0")
+    return after, min(limit, max_limit)
+
+
+def parse_offset(args, max_offset=10000):
+    """相关度排序的搜索结果无法按 id 翻页，用 offset 分页；限制最大 offset 防止深翻页"""
+    try:
+        offset = int(args.get('offset') or 0)
+    except (TypeError, ValueError):
+        raise PageArgsError("offset 必须是整数")
+    if offset < 0 or offset > max_offset:
+        raise PageArgsError(f"offset 必须在 0 ~ {max_offset} 之间")
+    return offset
+
+
+def parse_fields(value, allowed, default):
+    """
+    解析 ?fields=name,major,city，返回要查询的列（总是包含 id，保持 allowed 中的顺序）。
+    未传 fields 时返回 default。
+    """
+    if not value:
+        return list(default)
+    wanted = {f.strip() for f in value.split(',') if f.strip()}
+    unknown = wanted - set(allowed)
+    if unknown:
+        raise PageArgsError(f"不支持的字段: {', '.join(sorted(unknown))}")
+    wanted.add('id')
+    return [f for f in allowed if f in wanted]
+
+
+def parse_ids(value, max_ids=MAX_LIMIT):
+    """
+    解析 ?ids=3,1,2 或 JSON 中的 id 数组，返回去重后的 id 列表（保持传入顺序）。
+    """
+    if isinstance(value, str):
+        value = [v for v in (p.strip() for p in value.split(',')) if v]
+    if not isinstance(value, list) or not value:
+        raise PageArgsError("ids 不能为空")
+    ids, seen = [], set()
+    for v in value:
+        if isinstance(v, bool):
+            raise PageArgsError("ids 必须是正整数")
+        try:
+            i = int(v)
+        except (TypeError, ValueError):
+            raise PageArgsError("ids 必须是正整数")
+        if i <= 0:
+            raise PageArgsError("ids 必须是正整数")
+        if i not in seen:
+            seen.add(i)
+            ids.append(i)
+    if len(ids) > max_ids:
+        raise PageArgsError(f"一次最多 {max_ids} 个 id")
+    return ids
+
+
+def build_page(rows, limit):
+    """
+    rows 按 id 升序、多查了一条（limit + 1）用于判断是否还有下一页。
+    返回 {items, next_cursor, limit}
+    """
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    return {
+        'items': items,
+        'next_cursor': items[-1]['id'] if has_more and items else None,
+        'limit': limit,
+    }
+
+
+class CountCache:
+    """COUNT(*) 结果的进程内 TTL 缓存，避免每次翻页都做一次全量计数"""
+    def __init__(self, ttl=30, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit and hit[1] > now:
+                return hit[0]
+        value = compute()
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                # 简单处理：先清掉已过期的，仍然满了就整体清空
+                self._data = {k: v for k, v in self._data.items() if v[1] > now}
+                if len(self._data) >= self.max_entries:
+                    self._data.clear()
+            self._data[key] = (value, now + self.ttl)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
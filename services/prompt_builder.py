@@ -0,0 +1,154 @@
+# services/prompt_builder.py
+# AI 搜索重排提示词构造：在 token 预算内放入候选，只保留与相关度有关的字段
+# - 不发送手机号、邮箱、性别、年龄等个人信息
+# - 固定的说明放在最前面（system + 提示词开头），可变的候选和查询放在后面，
+#   服务端的前缀缓存（prompt caching）可以命中
+# - 先保证每位候选的基本信息，剩余预算按"注水"方式分配给简介：短简介完整保留，长简介统一截断
+# - token 数为估算值：中日韩字符按 1 个，其余字符按 4 个 1 个
+import math
+import re
+import threading
+
+_CJK = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+RANK_SYSTEM = "你是校友管理系统的小助手，负责根据用户的搜索意图为候选校友按相关度排序。"
+
+RANK_INSTRUCTIONS = """请从下列候选校友中挑选与用户搜索最相关的前 5 名，按相关度排序，每条给出一句话理由（简短）。
+输出 JSON 数组，字段：id, reason。不要多余文本。
+候选（id | 姓名 | 毕业 | 专业 | 所在地 | 简介）："""
+
+# 每条候选除简介外的字段
+RANK_FIELDS = ('name', 'grad_year', 'degree', 'major', 'city', 'country')
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中日韩字符及全角标点按 1 个 token，其余字符 4 个 1 个"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """按估算的 token 数截断，超出时以省略号结尾"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 1:
+        return ""
+    used, cut = 0.0, 0
+    for i, ch in enumerate(text):
+        used += 1.0 if _CJK.match(ch) else 0.25
+        if used > max_tokens - 1:
+            cut = i
+            break
+    return text[:cut] + "…"
+
+
+def _base_line(row):
+    edu = " ".join(str(row[f]) for f in ('grad_year', 'degree') if row.get(f))
+    place = " ".join(row[f] for f in ('city', 'country') if row.get(f))
+    return f"id={row['id']} | {row.get('name') or ''} | {edu} | {row.get('major') or ''} | {place} | "
+
+
+def _bio_cap(bio_tokens, available):
+    """求最大的统一上限 c，使 sum(min(t, c)) <= available"""
+    if sum(bio_tokens) <= available:
+        return max(bio_tokens, default=0)
+    lo, hi = 0, max(bio_tokens, default=0)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if sum(min(t, mid) for t in bio_tokens) <= available:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def legacy_tokens(q, rows):
+    """原来的全字段提示词（含联系方式、完整简介）的估算 token 数，仅用于统计节省量"""
+    items = "\n".join(
+        f"- id={r['id']}, 姓名={r.get('name')}, 性别={r.get('gender')}, 年龄={r.get('age')}, 电话={r.get('phone')}, "
+        f"邮箱={r.get('email')}, 专业={r.get('major')}, 城市={r.get('city')}, 国家={r.get('country')}, "
+        f"摘要={(r.get('bio') or '')[:120]}"
+        for r in rows
+    ) or "（无）"
+    return estimate_tokens(f"用户搜索：{q}\n以下是候选（最多20条）：\n{items}\n"
+                           "请挑选最相关的前 5 名，并按相关度排序输出，每条给出一句话理由（简短）。\n"
+                           "输出 JSON 数组，字段：id, reason。不要多余文本。") + estimate_tokens("你是校友管理系统的小助手。")
+
+
+def build_rank_prompt(q, rows, budget=1000, max_bio_tokens=60):
+    """
+    构造重排提示词，返回 (system, prompt, info)。
+    rows 按检索得分降序，需包含 id、RANK_FIELDS 与 bio；预算连基本信息都放不下时从末尾丢弃候选。
+    每段简介最多 max_bio_tokens，预算不足时进一步统一截短。
+    info 含估算的 prompt_tokens、baseline_tokens（原提示词）、节省比例、截断与丢弃数量。
+    """
+    tail = f"\n用户搜索：{q}"
+    fixed = estimate_tokens(RANK_SYSTEM) + estimate_tokens(RANK_INSTRUCTIONS) + estimate_tokens(tail)
+    bases = [_base_line(r) for r in rows]
+    base_tokens = [estimate_tokens(b) + 1 for b in bases]     # +1 为换行
+
+    kept = len(rows)
+    while kept and fixed + sum(base_tokens[:kept]) > budget:
+        kept -= 1
+
+    bios = [(rows[i].get('bio') or '').replace("\n", " ") for i in range(kept)]
+    bio_tokens = [estimate_tokens(b) for b in bios]
+    cap = min(max_bio_tokens, _bio_cap(bio_tokens, budget - fixed - sum(base_tokens[:kept])))
+
+    lines, truncated = [], 0
+    for i in range(kept):
+        bio = bios[i]
+        if bio_tokens[i] > cap:
+            bio = truncate_to_tokens(bio, cap)
+            truncated += 1
+        lines.append(bases[i] + bio)
+
+    prompt = RANK_INSTRUCTIONS + "\n" + ("\n".join(lines) or "（无）") + tail
+    tokens = estimate_tokens(RANK_SYSTEM) + estimate_tokens(prompt)
+    baseline = legacy_tokens(q, rows)
+    info = {
+        'budget': budget,
+        'prompt_tokens': tokens,
+        'baseline_tokens': baseline,
+        'saved_tokens': baseline - tokens,
+        'saved_pct': round((baseline - tokens) / baseline * 100, 1) if baseline else 0.0,
+        'candidates': kept,
+        'dropped_candidates': len(rows) - kept,
+        'truncated_bios': truncated,
+        'bio_token_cap': cap,
+    }
+    return RANK_SYSTEM, prompt, info
+
+
+class RankPromptStats:
+    """累计的提示词节省量与大模型耗时（每个 worker 一份）"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.baseline_tokens = 0
+        self.llm_ms = 0.0
+
+    def record(self, info, llm_ms):
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += info['prompt_tokens']
+            self.baseline_tokens += info['baseline_tokens']
+            self.llm_ms += llm_ms
+
+    def snapshot(self):
+        with self._lock:
+            n = self.requests
+            return {
+                'requests': n,
+                'avg_prompt_tokens': round(self.prompt_tokens / n, 1) if n else None,
+                'avg_baseline_tokens': round(self.baseline_tokens / n, 1) if n else None,
+                'saved_pct': round((self.baseline_tokens - self.prompt_tokens) / self.baseline_tokens * 100, 1)
+                             if self.baseline_tokens else None,
+                'avg_llm_ms': round(self.llm_ms / n, 1) if n else None,
+            }
+
+
+stats = RankPromptStats()
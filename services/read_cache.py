@@ -0,0 +1,181 @@
+# services/read_cache.py
+# 校友读缓存（read-through）：
+# - 单个校友按 id 缓存；列表页、搜索结果页按"列表版本号"缓存
+# - 写入（新增 / 更新 / 删除 / 批量导入）后使对应校友的版本号和列表版本号 +1，旧条目不再被读到，随 TTL / LRU 淘汰
+# - 版本号在加载数据之前读取：加载期间发生写入时，结果写在旧版本的键下，不会把旧数据缓存成新的
+# 后端与 LLM 缓存相同（services/kv_store.py）。版本号必须所有 worker 共享，写入才能立即对所有 worker 失效：
+# - redis:// 时版本号与缓存条目一起保存在 Redis 中（StoreVersions）
+# - 进程内 LRU 时条目在每个 worker 各一份，版本号保存在 MySQL 的 cache_version 表（DbVersions，迁移 13）。
+#   读到的版本号在 worker 内记住 memo_ttl 秒（默认 1 秒），期间读缓存不再查库；
+#   本 worker 的写入立即生效，其他 worker 的写入最多晚 memo_ttl 秒生效
+import datetime
+import hashlib
+import json
+import threading
+import time
+
+from werkzeug.http import http_date
+
+from .kv_store import hit_ratio
+
+LIST_VERSION_KEY = "users:list"
+KINDS = ('user', 'list', 'query')
+
+
+def _plain(value):
+    """把日期转成与 Flask jsonify 相同的字符串，内存和 Redis 两种后端返回的内容一致"""
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return http_date(value)
+    return value
+
+
+class StoreVersions:
+    """版本号保存在缓存后端中，只有共享后端（Redis）才能跨 worker 失效"""
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, name):
+        return self.store.get_counter(name)
+
+    def bump(self, names):
+        for name in names:
+            self.store.incr(name)
+
+
+class DbVersions:
+    """版本号保存在 MySQL cache_version 表中，所有 worker 共享；memo_ttl=0 时每次读取都查库"""
+    def __init__(self, db_pool, memo_ttl=1.0, max_entries=10000):
+        self.db_pool = db_pool
+        self.memo_ttl = memo_ttl
+        self.max_entries = max_entries
+        self._memo = {}  # name -> (version, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._memo.get(name)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+        try:
+            with self.db_pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("SELECT version FROM cache_version WHERE name=%s", (name,))
+                row = cursor.fetchone()
+        except Exception as e:
+            # 读不到版本号时按未命中处理：返回一个不会与正常版本号冲突的值（不记住）
+            print("Cache version read error:", e)
+            return -int(time.time() * 1000)
+        version = row['version'] if row else 0
+        if self.memo_ttl > 0:
+            with self._lock:
+                if len(self._memo) >= self.max_entries:
+                    self._memo = {k: v for k, v in self._memo.items() if v[1] > now}
+                    if len(self._memo) >= self.max_entries:
+                        self._memo.clear()
+                self._memo[name] = (version, now + self.memo_ttl)
+        return version
+
+    def bump(self, names):
+        # 按名称顺序加锁，并发写入之间不会死锁；在写入事务提交之后调用，只持有行锁一瞬间
+        try:
+            with self.db_pool.connection() as conn, conn.cursor() as cursor:
+                cursor.executemany("""
+                    INSERT INTO cache_version (name, version) VALUES (%s, 1)
+                    ON DUPLICATE KEY UPDATE version = version + 1
+                """, [(n,) for n in sorted(set(names))])
+                conn.commit()
+        except Exception as e:
+            # 写入已经提交，不因失效失败而报错；旧条目最多保留 TTL 秒
+            print("Cache version bump error:", e)
+        # 提交之后再丢掉本 worker 记住的版本号，本 worker 之后的读取立即看到新版本
+        with self._lock:
+            for name in names:
+                self._memo.pop(name, None)
+
+
+class ReadCache:
+    def __init__(self, store, ttl=300, versions=None):
+        self.store = store
+        self.ttl = ttl
+        self.versions = versions or StoreVersions(store)
+        self._lock = threading.Lock()
+        self._stats = {kind: {'hits': 0, 'misses': 0} for kind in KINDS}
+        self._stats['invalidations'] = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _count(self, kind, name):
+        with self._lock:
+            self._stats[kind][name] += 1
+
+    def _read_through(self, kind, key, loader):
+        value = self.store.get(key)
+        if value is not None:
+            self._count(kind, 'hits')
+            return value
+        self._count(kind, 'misses')
+        value = loader()
+        if value is not None:
+            value = _plain(value)
+            self.store.set(key, value, ttl=self.ttl)
+        return value
+
+    # -------------------------
+    # 读取
+    # -------------------------
+    def get_user(self, user_id, loader):
+        """loader() 返回该校友的 dict，不存在时返回 None（不缓存）"""
+        if not self.enabled:
+            return loader()
+        version = self.versions.get(f"user:{user_id}")
+        return self._read_through('user', f"user:{user_id}:v{version}", loader)
+
+    def get_list(self, params, loader, kind='list'):
+        """
+        params 为决定结果的全部参数（游标、字段、关键词等），loader() 返回整页结果。
+        kind 为 'list'（无关键词的列表页）或 'query'（搜索结果页），只影响统计。
+        """
+        if not self.enabled:
+            return loader()
+        version = self.versions.get(LIST_VERSION_KEY)
+        digest = hashlib.sha1(json.dumps(params, ensure_ascii=False, sort_keys=True, default=str)
+                              .encode('utf-8')).hexdigest()
+        return self._read_through(kind, f"{kind}:v{version}:{digest}", loader)
+
+    # -------------------------
+    # 失效
+    # -------------------------
+    def list_version(self):
+        """列表版本号：每次写入都单调递增，也用作列表 ETag 的一部分（关闭缓存时同样维护）"""
+        return self.versions.get(LIST_VERSION_KEY)
+
+    def user_version(self, user_id):
+        """单个校友的版本号：每次写入该校友都单调递增，也用作详情 ETag 的一部分"""
+        return self.versions.get(f"user:{user_id}")
+
+    def invalidate(self, *user_ids):
+        """校友资料变更后调用：这些校友的缓存和所有列表 / 搜索结果缓存失效"""
+        self.versions.bump([f"user:{user_id}" for user_id in user_ids] + [LIST_VERSION_KEY])
+        with self._lock:
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            data = {kind: dict(self._stats[kind]) for kind in KINDS}
+            data['invalidations'] = self._stats['invalidations']
+        for kind in KINDS:
+            data[kind]['hit_ratio'] = hit_ratio(data[kind])
+        data['hit_ratio'] = hit_ratio({
+            'hits': sum(data[k]['hits'] for k in KINDS),
+            'misses': sum(data[k]['misses'] for k in KINDS),
+        })
+        data['ttl'] = self.ttl
+        data['versions'] = 'db' if isinstance(self.versions, DbVersions) else 'store'
+        data['store'] = self.store.stats()
+        return data
@@ -0,0 +1,219 @@
+# services/search.py
+# 校友关键词搜索：
+# - fulltext：基于 ngram 全文索引（迁移 3），按字段加权打分、按相关度排序分页
+# - like：原来的七列 LIKE '%kw%' 全表扫描，作为兜底和基准对照
+# 两种模式都支持附加查询扩展词（services/ai_query.py），所有关键词合并为一次查询；
+# 也可以附加结构化筛选条件（services/filters.py），与关键词按 AND 组合
+import os
+
+import pymysql
+
+# 相关度权重：姓名 > 专业/城市 > 简介/国家
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'major': 2.0,
+    'city': 2.0,
+    'country': 1.0,
+    'bio': 1.0,
+}
+# 手机号 / 邮箱前缀命中直接给高分（走 idx_phone / idx_email）
+EXACT_CONTACT_SCORE = 10.0
+# 手机号 / 邮箱中间的片段（如 13812345678 中的 1234）靠 ngram 全文索引匹配（迁移 11），与 LIKE 模式一致
+CONTACT_MATCH_SCORE = 5.0
+
+# ngram_token_size 默认为 2，比它短的关键词全文索引查不到，只能走 LIKE
+NGRAM_TOKEN_SIZE = int(os.getenv('NGRAM_TOKEN_SIZE', 2))
+
+# memory 模式由 services/search_index.py 的进程内索引处理，这里只在其不可用时兜底走 fulltext
+SEARCH_MODES = ('fulltext', 'like', 'memory')
+
+
+def default_mode():
+    mode = os.getenv('SEARCH_MODE', 'fulltext')
+    return mode if mode in SEARCH_MODES else 'fulltext'
+
+
+def _phrase(keyword):
+    # 布尔模式下用双引号包成短语：ngram 要求相邻分词连续出现，语义接近子串匹配
+    return '"' + keyword.replace('"', ' ').strip() + '"'
+
+
+def _like_prefix(keyword):
+    return keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _fulltext_hits_sql(keyword, extra_terms=()):
+    """
+    返回 (命中子查询 SQL, 参数)，子查询结果为 (id, score)，同一 id 可能出现多次。
+    extra_terms（查询扩展得到的关键词）与 keyword 在同一个布尔查询中按"或"匹配，
+    命中的词越多相关度越高；手机号 / 邮箱（前缀与子串）只按原始 keyword 匹配。
+    """
+    terms = [keyword] + [t for t in extra_terms if t != keyword]
+    phrase = " ".join(_phrase(t) for t in terms)
+    in_list = ", ".join(["%s"] * len(terms))
+    score_sql = (
+        f"{FIELD_WEIGHTS['name']} * MATCH(name) AGAINST(%s IN BOOLEAN MODE)"
+        f" + {FIELD_WEIGHTS['major']} * MATCH(major) AGAINST(%s IN BOOLEAN MODE)"
+        f" + {FIELD_WEIGHTS['bio']} * MATCH(bio) AGAINST(%s IN BOOLEAN MODE)"
+        f" + {FIELD_WEIGHTS['city']} * ((city IN ({in_list})) IS TRUE)"
+        f" + {FIELD_WEIGHTS['country']} * ((country IN ({in_list})) IS TRUE)"
+        " + MATCH(name, major, city, country, bio) AGAINST(%s IN BOOLEAN MODE)"
+    )
+    sql = f"""
+        SELECT id, {score_sql} AS score
+        FROM tb_user
+        WHERE MATCH(name, major, city, country, bio) AGAINST(%s IN BOOLEAN MODE)
+        UNION ALL
+        SELECT id, {EXACT_CONTACT_SCORE} FROM tb_user WHERE phone LIKE %s
+        UNION ALL
+        SELECT id, {EXACT_CONTACT_SCORE} FROM tb_user WHERE email LIKE %s
+        UNION ALL
+        SELECT id, {CONTACT_MATCH_SCORE} FROM tb_user WHERE MATCH(phone, email) AGAINST(%s IN BOOLEAN MODE)
+    """
+    prefix = _like_prefix(keyword)
+    params = (phrase, phrase, phrase) + tuple(terms) * 2 + (phrase, phrase, prefix, prefix, _phrase(keyword))
+    return sql, params
+
+
+def _filter_sql(filters):
+    """结构化筛选条件（列名不带表别名），没有时为 ('1=1', ())"""
+    return filters.where() if filters is not None else ('1=1', ())
+
+
+def _search_fulltext(cursor, keyword, fields, limit, offset, extra_terms=(), filters=None):
+    hits_sql, hits_params = _fulltext_hits_sql(keyword, extra_terms)
+    filter_where, filter_params = _filter_sql(filters)
+    columns = ', '.join(f"u.{f}" for f in fields)
+    cursor.execute(f"""
+        SELECT {columns}, s.score AS _score
+        FROM (
+            SELECT id, MAX(score) AS score FROM ({hits_sql}) hits GROUP BY id
+        ) s
+        JOIN tb_user u ON u.id = s.id
+        WHERE {filter_where}
+        ORDER BY s.score DESC, u.id
+        LIMIT %s OFFSET %s
+    """, hits_params + filter_params + (limit + 1, offset))
+    return cursor.fetchall()
+
+
+LIKE_WHERE = """
+    (name    LIKE CONCAT('%%', %s, '%%')
+  OR phone   LIKE CONCAT('%%', %s, '%%')
+  OR email   LIKE CONCAT('%%', %s, '%%')
+  OR major   LIKE CONCAT('%%', %s, '%%')
+  OR city    LIKE CONCAT('%%', %s, '%%')
+  OR country LIKE CONCAT('%%', %s, '%%')
+  OR bio     LIKE CONCAT('%%', %s, '%%'))
+"""
+
+
+def _like_where(keyword, extra_terms=()):
+    """多个关键词合并为一次扫描：任一关键词命中任一列即可"""
+    terms = [keyword] + [t for t in extra_terms if t != keyword]
+    return " OR ".join([LIKE_WHERE] * len(terms)), tuple(t for t in terms for _ in range(7))
+
+
+def _search_like(cursor, keyword, fields, limit, offset, extra_terms=(), filters=None):
+    where, params = _like_where(keyword, extra_terms)
+    filter_where, filter_params = _filter_sql(filters)
+    cursor.execute(f"""
+        SELECT {', '.join(fields)}
+        FROM tb_user
+        WHERE ({where}) AND {filter_where}
+        ORDER BY id
+        LIMIT %s OFFSET %s
+    """, params + filter_params + (limit + 1, offset))
+    return cursor.fetchall()
+
+
+def _fulltext_terms(extra_terms):
+    # 比 ngram 分词长度短的扩展词全文索引查不到，直接丢弃
+    return tuple(t for t in extra_terms if len(t) >= NGRAM_TOKEN_SIZE)
+
+
+def _resolve_mode(keyword, mode):
+    mode = mode or default_mode()
+    if mode == 'memory':
+        mode = 'fulltext'
+    if mode == 'fulltext' and len(keyword) < NGRAM_TOKEN_SIZE:
+        mode = 'like'
+    return mode
+
+
+def _run(mode, fulltext_fn, like_fn):
+    """先按 fulltext 执行，索引不可用时回退到 LIKE，返回 (结果, 实际模式)"""
+    if mode == 'fulltext':
+        try:
+            return fulltext_fn(), mode
+        except pymysql.err.MySQLError as e:
+            # 1191: 找不到匹配的 FULLTEXT 索引（迁移 3 未执行，或数据库不支持 ngram）
+            if not (e.args and e.args[0] == 1191):
+                raise
+            print("Fulltext search unavailable, falling back to LIKE:", e)
+    return like_fn(), 'like'
+
+
+def search_users(cursor, keyword, fields, limit=20, offset=0, mode=None, extra_terms=(), filters=None):
+    """
+    搜索校友，结果按相关度排序（like 模式按 id），offset 分页。
+    extra_terms 为查询扩展得到的关键词，与 keyword 合并为一次查询，结果按 id 去重；
+    filters 为结构化筛选条件（services.filters.Filters），只保留同时满足的校友。
+    返回 {items, next_offset, limit, mode}；fulltext 模式下每条记录带 _score。
+    """
+    extra_terms = tuple(extra_terms or ())
+    rows, mode = _run(
+        _resolve_mode(keyword, mode),
+        lambda: _search_fulltext(cursor, keyword, fields, limit, offset, _fulltext_terms(extra_terms), filters),
+        lambda: _search_like(cursor, keyword, fields, limit, offset, extra_terms, filters),
+    )
+    return {
+        'items': rows[:limit],
+        'next_offset': offset + limit if len(rows) > limit else None,
+        'limit': limit,
+        'mode': mode,
+    }
+
+
+def count_matches(cursor, keyword, mode=None, extra_terms=(), filters=None):
+    """命中总数（调用方负责缓存）"""
+    extra_terms = tuple(extra_terms or ())
+    filter_where, filter_params = _filter_sql(filters)
+
+    def _fulltext():
+        hits_sql, hits_params = _fulltext_hits_sql(keyword, _fulltext_terms(extra_terms))
+        if filters is None:
+            cursor.execute(f"SELECT COUNT(DISTINCT id) AS cnt FROM ({hits_sql}) hits", hits_params)
+        else:
+            cursor.execute(f"""
+                SELECT COUNT(*) AS cnt
+                FROM (SELECT DISTINCT id FROM ({hits_sql}) hits) s
+                JOIN tb_user u ON u.id = s.id
+                WHERE {filter_where}
+            """, hits_params + filter_params)
+        return cursor.fetchone()['cnt']
+
+    def _like():
+        where, params = _like_where(keyword, extra_terms)
+        cursor.execute(f"SELECT COUNT(*) AS cnt FROM tb_user WHERE ({where}) AND {filter_where}",
+                       params + filter_params)
+        return cursor.fetchone()['cnt']
+
+    return _run(_resolve_mode(keyword, mode), _fulltext, _like)[0]
+
+
+def filter_where(keyword, mode=None, extra_terms=()):
+    """
+    返回 (WHERE 条件, 参数, 实际模式)，只筛选不打分，供按主键顺序流式扫描（导出）使用。
+    fulltext 模式在 FULLTEXT 索引不存在时执行会报 1191，调用方可改用 mode='like' 重试。
+    """
+    extra_terms = tuple(extra_terms or ())
+    mode = _resolve_mode(keyword, mode)
+    if mode == 'fulltext':
+        terms = [keyword] + [t for t in _fulltext_terms(extra_terms) if t != keyword]
+        prefix = _like_prefix(keyword)
+        where = ("(MATCH(name, major, city, country, bio) AGAINST(%s IN BOOLEAN MODE)"
+                 " OR phone LIKE %s OR email LIKE %s OR MATCH(phone, email) AGAINST(%s IN BOOLEAN MODE))")
+        return where, (" ".join(_phrase(t) for t in terms), prefix, prefix, _phrase(keyword)), mode
+    where, params = _like_where(keyword, extra_terms)
+    return f"({where})", params, 'like'
@@ -0,0 +1,395 @@
+# services/search_index.py
+# 进程内倒排索引：SEARCH_MODE=memory 时，关键词搜索直接在内存中完成，不访问 MySQL
+# - 分词：中文按单字 + 相邻二字（bigram），英文/数字按三字（trigram），
+#   因此手机号、邮箱、英文单词中间的片段也能命中，与 LIKE '%kw%' 语义一致
+# - 启动时后台全量构建；本 worker 的增删改实时更新；其他 worker 的改动通过轮询 updated_at 追平（每次往回多读一段，不漏掉较晚提交的事务）
+# - 文档以紧凑的 JSON bytes 保存，只在返回结果时解码；内存占用有上限（全量构建和增量更新都检查）并可查询
+import bisect
+import datetime
+import json
+import re
+import sys
+import threading
+import time
+from array import array
+
+import pymysql.cursors
+
+# 与 LIKE 搜索相同的七个字段参与检索
+SEARCH_FIELDS = ('name', 'phone', 'email', 'major', 'city', 'country', 'bio')
+
+_CJK_RUN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+_WORD = re.compile(r'[0-9a-z]+')
+
+# 英文/数字按 trigram 建索引；不足 3 个字符的英文/数字词单独建索引，查询时只能精确匹配整个词
+GRAM = 3
+
+# 新词条的估算开销（词条字符串 + 只有一个 id 的 array），以及每个 id 在 array('i') 中占的字节
+_TERM_OVERHEAD = sys.getsizeof(array('i', (0,)))
+_POSTING_BYTES = array('i').itemsize
+
+
+class IndexUnavailable(Exception):
+    """索引未就绪或查询不适合内存索引（调用方应回退到数据库搜索）"""
+
+
+def _grams(word):
+    if len(word) < GRAM:
+        return [word]
+    return [word[i:i + GRAM] for i in range(len(word) - GRAM + 1)]
+
+
+def _doc_tokens(text):
+    """文档分词：中文单字 + bigram，英文/数字 trigram（短于 3 个字符的词整体作为一个词条）"""
+    text = text.casefold()
+    out = set()
+    for run in _CJK_RUN.findall(text):
+        out.update(run)
+        out.update(run[i:i + 2] for i in range(len(run) - 1))
+    for word in _WORD.findall(text):
+        out.update(_grams(word))
+    return out
+
+
+def _query_terms(keyword):
+    """
+    查询分词：返回 (必须全部命中的词条列表, 是否有无法用索引过滤的短英文/数字词)。
+    短于 3 个字符的英文/数字词可能是文档中更长单词的一部分，倒排表无法筛选，只靠最后的子串校验。
+    """
+    text = keyword.casefold()
+    terms = []
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    short = False
+    for word in _WORD.findall(text):
+        if len(word) < GRAM:
+            short = True
+        else:
+            terms.extend(_grams(word))
+    return list(dict.fromkeys(terms)), short
+
+
+class InvertedIndex:
+    def __init__(self, fields, max_docs=1_000_000, max_bytes=512 * 1024 * 1024, poll_overlap=30):
+        self.fields = list(fields)                 # 文档中保存的字段（顺序固定）
+        self._search_pos = [self.fields.index(f) for f in SEARCH_FIELDS]
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        # 轮询时多读水位线之前 poll_overlap 秒的记录：updated_at 在语句执行时取值，事务提交可能更晚
+        self.poll_overlap = poll_overlap
+
+        self._lock = threading.RLock()
+        self._postings = {}                        # term -> array('i')，id 升序
+        self._docs = {}                            # id -> JSON bytes
+        self._bytes = 0                            # 估算的内存占用：增量维护，memory_bytes() 时校准
+
+        self.ready = False
+        self.disabled_reason = None
+        self.watermark = None                      # 已同步到的 updated_at
+        self.built_at = None
+        self.build_seconds = None
+        self.last_poll = 0.0
+        self._poll_lock = threading.Lock()
+        self._counters = {'searches': 0, 'fallbacks': 0, 'upserts': 0, 'removes': 0, 'polls': 0}
+
+    # -------------------------
+    # 文档编解码
+    # -------------------------
+    def _encode(self, row):
+        return json.dumps([row.get(f) for f in self.fields], ensure_ascii=False,
+                          separators=(',', ':'), default=str).encode('utf-8')
+
+    def _decode(self, data):
+        return json.loads(data)
+
+    def _text_of(self, values):
+        return " ".join(str(values[i]) for i in self._search_pos if values[i] is not None)
+
+    # -------------------------
+    # 增量维护
+    # -------------------------
+    def _add(self, doc_id, values):
+        for term in _doc_tokens(self._text_of(values)):
+            plist = self._postings.get(term)
+            if plist is None:
+                self._postings[term] = array('i', (doc_id,))
+                self._bytes += sys.getsizeof(term) + _TERM_OVERHEAD
+            elif plist[-1] < doc_id:
+                plist.append(doc_id)
+                self._bytes += _POSTING_BYTES
+            else:
+                pos = bisect.bisect_left(plist, doc_id)
+                if pos == len(plist) or plist[pos] != doc_id:
+                    plist.insert(pos, doc_id)
+                    self._bytes += _POSTING_BYTES
+
+    def _discard(self, doc_id):
+        data = self._docs.pop(doc_id, None)
+        if data is None:
+            return
+        self._bytes -= sys.getsizeof(data) + 28
+        for term in _doc_tokens(self._text_of(self._decode(data))):
+            plist = self._postings.get(term)
+            if plist is None:
+                continue
+            pos = bisect.bisect_left(plist, doc_id)
+            if pos < len(plist) and plist[pos] == doc_id:
+                del plist[pos]
+                self._bytes -= _POSTING_BYTES
+            if not plist:
+                del self._postings[term]
+                self._bytes -= sys.getsizeof(term) + _TERM_OVERHEAD
+
+    def upsert(self, row):
+        """插入或更新一条校友记录（row 为 dict，至少包含 id 和检索字段），内容有变化时返回 True"""
+        doc_id = int(row['id'])
+        data = self._encode(row)
+        with self._lock:
+            if self.disabled_reason is not None:
+                return False
+            if doc_id not in self._docs and len(self._docs) >= self.max_docs:
+                self._disable(f"文档数超过上限 {self.max_docs}")
+                return False
+            old = self._docs.get(doc_id)
+            if old == data:
+                return False
+            if old is not None:
+                self._discard(doc_id)
+            self._docs[doc_id] = data
+            self._bytes += sys.getsizeof(data) + 28
+            self._add(doc_id, self._decode(data))
+            self._counters['upserts'] += 1
+            if self._bytes > self.max_bytes:
+                self._disable_over_memory(self._bytes)
+            return True
+
+    def remove(self, doc_id):
+        with self._lock:
+            if doc_id in self._docs:
+                self._discard(doc_id)
+                self._counters['removes'] += 1
+
+    def _disable(self, reason):
+        self.ready = False
+        self.disabled_reason = reason
+        self._postings = {}
+        self._docs = {}
+        self._bytes = 0
+        print("Search index disabled:", reason)
+
+    def _disable_over_memory(self, used):
+        self._disable(f"内存占用 {used // (1024 * 1024)}MB 超过上限 {self.max_bytes // (1024 * 1024)}MB")
+
+    # -------------------------
+    # 全量构建 / 轮询追平
+    # -------------------------
+    def build(self, conn):
+        """流式读取 tb_user 全量构建（按 id 升序，倒排表直接追加）"""
+        start = time.monotonic()
+        postings, docs = {}, {}
+        watermark = None
+        with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(f"SELECT {', '.join(self.fields)}, updated_at AS _updated_at FROM tb_user ORDER BY id")
+            for row in cursor:
+                if len(docs) >= self.max_docs:
+                    self._disable(f"文档数超过上限 {self.max_docs}")
+                    return
+                doc_id = row['id']
+                ts = row.pop('_updated_at')
+                if ts is not None and (watermark is None or ts > watermark):
+                    watermark = ts
+                data = self._encode(row)
+                docs[doc_id] = data
+                for term in _doc_tokens(self._text_of(self._decode(data))):
+                    plist = postings.get(term)
+                    if plist is None:
+                        postings[term] = array('i', (doc_id,))
+                    else:
+                        plist.append(doc_id)
+
+        with self._lock:
+            self._postings, self._docs = postings, docs
+            self._bytes = 0
+            self.watermark = watermark
+            self.built_at = time.time()
+            self.build_seconds = round(time.monotonic() - start, 3)
+            self.last_poll = time.monotonic()
+            self.disabled_reason = None
+            self.ready = True
+
+        used = self.memory_bytes()
+        if used > self.max_bytes:
+            self._disable_over_memory(used)
+
+    def poll_due(self, interval):
+        return time.monotonic() - self.last_poll >= interval
+
+    def poll(self, conn, interval):
+        """
+        距上次轮询超过 interval 秒时，拉取 updated_at >= 水位线 - poll_overlap 的记录并更新索引，返回有变化的条数。
+        updated_at 只精确到秒、且较早取值的事务可能较晚提交，所以往回多读一段并依赖 upsert 的幂等性；
+        删除由 reconcile_ids 处理。同一时刻只有一个线程执行，其他线程直接跳过。
+        """
+        if not self.ready or not self.poll_due(interval):
+            return 0
+        if not self._poll_lock.acquire(blocking=False):
+            return 0
+        try:
+            changed = 0
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT {', '.join(self.fields)}, updated_at AS _updated_at
+                    FROM tb_user WHERE updated_at >= %s ORDER BY updated_at, id
+                """, (self._poll_since(),))
+                for row in cursor.fetchall():
+                    ts = row.pop('_updated_at')
+                    if self.upsert(row):
+                        changed += 1
+                    if ts is not None and (self.watermark is None or ts > self.watermark):
+                        self.watermark = ts
+            self.last_poll = time.monotonic()
+            self._counters['polls'] += 1
+            return changed
+        finally:
+            self._poll_lock.release()
+
+    def _poll_since(self):
+        if self.watermark is None:
+            return '1970-01-01 00:00:01'
+        return self.watermark - datetime.timedelta(seconds=self.poll_overlap)
+
+    def reconcile_ids(self, conn):
+        """对比数据库中的 id 集合，移除其他 worker 删除的记录"""
+        with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute("SELECT id FROM tb_user")
+            db_ids = {r[0] for r in cursor}
+        with self._lock:
+            stale = [i for i in self._docs if i not in db_ids]
+        for doc_id in stale:
+            self.remove(doc_id)
+        return len(stale)
+
+    # -------------------------
+    # 检索
+    # -------------------------
+    def _matches(self, values, needle):
+        return any(values[i] is not None and needle in str(values[i]).casefold() for i in self._search_pos)
+
+    def search(self, keyword, fields, limit=20, after=0):
+        """
+        按 id 升序返回命中记录，after 为游标。与 LIKE 模式语义一致：关键词整体是某个检索字段的子串（不区分大小写）。
+        返回 {items, next_cursor, limit, mode}；索引不可用、或关键词只有不足 3 个字符的英文/数字
+        （倒排表无法筛选）时抛出 IndexUnavailable。
+        """
+        if not self.ready:
+            raise IndexUnavailable(self.disabled_reason or "索引尚未构建完成")
+        missing = [f for f in fields if f not in self.fields]
+        if missing:
+            raise IndexUnavailable(f"索引中没有字段: {', '.join(missing)}")
+
+        terms, short = _query_terms(keyword)
+        needle = keyword.casefold()
+        with self._lock:
+            self._counters['searches'] += 1
+            if not terms:
+                raise IndexUnavailable("关键词太短，无法用索引筛选" if short else "关键词中没有可检索的词条")
+            lists = []
+            for term in terms:
+                plist = self._postings.get(term)
+                if plist is None:
+                    return {'items': [], 'next_cursor': None, 'limit': limit, 'mode': 'memory'}
+                lists.append(plist)
+            lists.sort(key=len)
+
+            # 以最短的倒排表为驱动，在其余表中二分查找求交集；候选再做一次子串校验
+            first, rest = lists[0], lists[1:]
+            items = []
+            pos = bisect.bisect_right(first, after)
+            while pos < len(first) and len(items) <= limit:
+                doc_id = first[pos]
+                pos += 1
+                ok = True
+                for plist in rest:
+                    j = bisect.bisect_left(plist, doc_id)
+                    if j == len(plist) or plist[j] != doc_id:
+                        ok = False
+                        break
+                if not ok:
+                    continue
+                values = self._decode(self._docs[doc_id])
+                if self._matches(values, needle):
+                    items.append(values)
+
+        has_more = len(items) > limit
+        idx = [self.fields.index(f) for f in fields]
+        items = [{f: values[i] for f, i in zip(fields, idx)} for values in items[:limit]]
+        return {
+            'items': items,
+            'next_cursor': items[-1]['id'] if has_more and items else None,
+            'limit': limit,
+            'mode': 'memory',
+        }
+
+    def note_fallback(self):
+        self._counters['fallbacks'] += 1
+
+    # -------------------------
+    # 统计与一致性检查
+    # -------------------------
+    def memory_bytes(self):
+        with self._lock:
+            total = sys.getsizeof(self._postings) + sys.getsizeof(self._docs)
+            for term, plist in self._postings.items():
+                total += sys.getsizeof(term) + sys.getsizeof(plist)
+            for data in self._docs.values():
+                total += sys.getsizeof(data) + 28   # 加上 int 键的开销
+            self._bytes = total                     # 顺带校准增量估算
+        return total
+
+    def stats(self):
+        used = self.memory_bytes()
+        with self._lock:
+            data = dict(self._counters)
+            data.update({
+                'ready': self.ready,
+                'disabled_reason': self.disabled_reason,
+                'docs': len(self._docs),
+                'terms': len(self._postings),
+                'postings': sum(len(p) for p in self._postings.values()),
+                'memory_mb': round(used / (1024 * 1024), 2),
+                'max_memory_mb': round(self.max_bytes / (1024 * 1024), 2),
+                'max_docs': self.max_docs,
+                'watermark': str(self.watermark) if self.watermark else None,
+                'build_seconds': self.build_seconds,
+            })
+        return data
+
+    def check_consistency(self, conn, sample_limit=20):
+        """逐行对比数据库与索引中的文档，报告缺失、多余和内容不一致的 id"""
+        missing, stale = [], []
+        seen = set()
+        with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(f"SELECT {', '.join(self.fields)} FROM tb_user ORDER BY id")
+            for row in cursor:
+                doc_id = row['id']
+                seen.add(doc_id)
+                with self._lock:
+                    data = self._docs.get(doc_id)
+                if data is None:
+                    missing.append(doc_id)
+                elif data != self._encode(row):
+                    stale.append(doc_id)
+        with self._lock:
+            extra = [i for i in self._docs if i not in seen]
+        return {
+            'db_rows': len(seen),
+            'index_docs': len(self._docs),
+            'missing': len(missing),
+            'extra': len(extra),
+            'stale': len(stale),
+            'consistent': not (missing or extra or stale),
+            'samples': {'missing': missing[:sample_limit], 'extra': extra[:sample_limit], 'stale': stale[:sample_limit]},
+        }
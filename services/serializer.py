@@ -0,0 +1,154 @@
+# services/serializer.py
+# 接口响应的 JSON 编码：
+# - 安装了 orjson 时用 orjson 编码（比标准库快约一倍），否则回退到标准库 json；JSON_BACKEND 可指定 auto / orjson / json
+# - 输出格式与 Flask jsonify 一致：datetime / date 编码为 HTTP 日期（"Wed, 21 Oct 2015 07:28:00 GMT"），
+#   Decimal / UUID 编码为字符串；非 ASCII 字符不再转义为 \uXXXX，直接输出 UTF-8
+# - iter_envelope 边读游标边编码大数组：按 {code, message, data: {items: [...], 其他字段}} 输出，
+#   items 攒够 CHUNK_BYTES 输出一块，其他字段（如 next_cursor）在 items 读完之后才计算
+import dataclasses
+import datetime
+import decimal
+import json
+import os
+import uuid
+
+try:
+    import orjson
+except ImportError:     # 未安装时回退到标准库 json
+    orjson = None
+
+BACKENDS = ('auto', 'orjson', 'json')
+CHUNK_BYTES = 64 * 1024     # 流式输出时攒够这么多字节再输出一块
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def _http_date(value):
+    # 与 werkzeug.http.http_date 相同：无时区的时间按 UTC 处理；每行都有 created_at / updated_at，手工拼接比 strftime 快
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    elif value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc)
+    return (f"{_WEEKDAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} "
+            f"{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT")
+
+
+def _default(value):
+    """标准库 / orjson 都不能直接编码的类型，规则与 Flask 默认的 JSON provider 相同"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return _http_date(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JsonSerializer:
+    """标准库 json（纯 Python 回退）"""
+    name = 'json'
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj).encode('utf-8')
+
+
+class OrjsonSerializer:
+    """orjson；datetime 交给 _default 编码，保持与 jsonify 相同的日期格式"""
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise RuntimeError("使用 orjson 编码需要安装 orjson 包：pip install orjson")
+        self._option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, default=_default, option=self._option)
+
+
+def make_serializer(name=None):
+    """按名称创建编码器：auto（默认，有 orjson 时用 orjson）/ orjson / json"""
+    name = (name or 'auto').strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"不支持的 JSON 编码器: {name}（可选: {', '.join(BACKENDS)}）")
+    if name == 'orjson' or (name == 'auto' and orjson is not None):
+        return OrjsonSerializer()
+    return JsonSerializer()
+
+
+_serializer = make_serializer(os.getenv('JSON_BACKEND'))
+
+
+def get_serializer():
+    return _serializer
+
+
+def set_serializer(serializer):
+    global _serializer
+    _serializer = serializer
+
+
+def dumps(obj):
+    """编码为 UTF-8 bytes"""
+    return _serializer.dumps(obj)
+
+
+def envelope(data=None, message="操作成功", code=200):
+    """统一响应格式 {code, message, data} 的完整 body"""
+    return _serializer.dumps({"code": code, "message": message, "data": data})
+
+
+def iter_envelope(items, message="操作成功", code=200, tail=None, chunk_bytes=CHUNK_BYTES):
+    """
+    逐块生成 {"code", "message", "data": {"items": [...], **tail()}} 的 bytes；
+    items 可以是任意迭代器（如服务端游标），不会整体放进内存；tail 在 items 读完之后调用，返回 data 的其他字段。
+    """
+    dumps = _serializer.dumps
+    head = dumps({"code": code, "message": message})
+    buf = bytearray(head[:-1])
+    buf += b',"data":{"items":['
+    first = True
+    for item in items:
+        if not first:
+            buf += b','
+        buf += dumps(item)
+        first = False
+        if len(buf) >= chunk_bytes:
+            yield bytes(buf)
+            buf.clear()
+    buf += b']'
+    for key, value in (tail() if tail else {}).items():
+        buf += b',' + dumps(key) + b':' + dumps(value)
+    buf += b'}}'
+    yield bytes(buf)
+
+
+class PageStream:
+    """
+    按游标分页的行迭代器：rows 按 id 升序、多查了一条（limit + 1）用于判断是否还有下一页，
+    与 pagination.build_page 的结果相同，但逐行产出；迭代结束后 tail() 返回 {next_cursor, limit}。
+    """
+    def __init__(self, rows, limit):
+        self.rows = rows
+        self.limit = limit
+        self.count = 0
+        self.next_cursor = None
+        self._last_id = None
+
+    def __iter__(self):
+        for row in self.rows:
+            if self.count >= self.limit:
+                # 第 limit + 1 条只用来判断还有没有下一页
+                self.next_cursor = self._last_id
+                break
+            self.count += 1
+            self._last_id = row['id']
+            yield row
+
+    def tail(self):
+        return {'next_cursor': self.next_cursor, 'limit': self.limit}
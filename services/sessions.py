@@ -0,0 +1,233 @@
+# services/sessions.py
+# 登录会话：
+# - ServerSessionInterface：服务端会话，Cookie 中只保存随机会话 id，会话内容存在 kv_store 中
+#   （memory:// 为进程内 LRU + TTL，只适合单 worker / 开发环境；redis:// 多个 worker 共享）
+# - RevocationIndex：会话吊销索引。auth_user.session_gen（迁移 8）在禁用 / 删除账户时 +1，
+#   同时写入 auth_session_revocation（迁移 14）。每个 worker 在内存中保存 {用户 id: (session_gen, is_active)}：
+#   首次见到某个用户时按主键查一次 auth_user，之后只按 updated_at 增量拉取吊销记录，
+#   每个请求只做一次字典查找；本 worker 的吊销立即生效，其他 worker 在一个刷新周期内生效
+# - AuthStats：会话加载与登录检查的耗时统计
+import datetime
+import secrets
+import threading
+import time
+from collections import deque
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+# =========================
+# 耗时统计
+# =========================
+class AuthStats:
+    """每类操作保留最近 window 次耗时，输出平均 / p50 / p95 / 最大值（毫秒）"""
+    def __init__(self, window=2000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._series = {}
+        self.counters = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._series.setdefault(name, deque(maxlen=self._window)).append(seconds)
+
+    def incr(self, name):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            series = {name: sorted(v) for name, v in self._series.items()}
+            data = dict(self.counters)
+        for name, lat in series.items():
+            if not lat:
+                continue
+            pick = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))]
+            data[name] = {
+                'count': len(lat),
+                'avg_ms': round(sum(lat) / len(lat) * 1000, 3),
+                'p50_ms': round(pick(0.50) * 1000, 3),
+                'p95_ms': round(pick(0.95) * 1000, 3),
+                'max_ms': round(lat[-1] * 1000, 3),
+            }
+        return data
+
+
+stats = AuthStats()
+
+
+# =========================
+# 吊销索引
+# =========================
+_MISSING = (-1, False)      # 账户已不存在
+
+
+def record_revocation(cursor, user_id, deleted=False):
+    """
+    在修改 auth_user 的同一事务中写入吊销记录：禁用 / 启用时在 UPDATE 之后调用；
+    删除账户时在 DELETE 之前调用（记录为 session_gen + 1、已禁用）
+    """
+    columns = "id, session_gen + 1, 0" if deleted else "id, session_gen, is_active"
+    cursor.execute(f"""
+        INSERT INTO auth_session_revocation (user_id, session_gen, is_active)
+        SELECT {columns} FROM auth_user WHERE id=%s
+        ON DUPLICATE KEY UPDATE session_gen=VALUES(session_gen), is_active=VALUES(is_active)
+    """, (user_id,))
+
+
+class RevocationIndex:
+    def __init__(self, db_pool, refresh_interval=5, overlap=30):
+        self.db_pool = db_pool
+        self.refresh_interval = refresh_interval
+        # 每次刷新多读 overlap 秒之前的记录：updated_at 在语句执行时取值，事务提交可能更晚
+        self.overlap = overlap
+        self._users = {}            # 用户 id -> (session_gen, is_active)，只保存本 worker 见过的用户
+        self._watermark = None      # 上次刷新开始时的数据库时间
+        self._loaded_at = 0.0       # 上次刷新成功的时间（time.time()）
+        self._refreshed = 0.0       # 上次尝试刷新的时间（monotonic）
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.lookups = 0
+
+    def _merge(self, user_id, entry, only_known=False):
+        # session_gen 只增不减：较旧的记录（重复拉取、与主键查询交错）不会覆盖较新的
+        with self._lock:
+            current = self._users.get(user_id)
+            if current is None and only_known:
+                return None
+            if current is None or entry[0] > current[0]:
+                self._users[user_id] = entry
+                return entry
+            return current
+
+    def refresh(self):
+        with self.db_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT NOW(3) AS now")
+            now = cursor.fetchone()['now']
+            rows = []
+            if self._watermark is not None:
+                cursor.execute(
+                    "SELECT user_id, session_gen, is_active FROM auth_session_revocation WHERE updated_at >= %s",
+                    (self._watermark - datetime.timedelta(seconds=self.overlap),))
+                rows = cursor.fetchall()
+        # 本 worker 还没见过的用户不必记录，首次出现时主键查询得到的就是最新状态
+        for r in rows:
+            self._merge(r['user_id'], (r['session_gen'], bool(r['is_active'])), only_known=True)
+        self._watermark = now
+        with self._lock:
+            self._loaded_at = time.time()
+            self.refreshes += 1
+
+    def _maybe_refresh(self):
+        if time.monotonic() - self._refreshed < self.refresh_interval:
+            return
+        # 只让一个线程去刷新，其他线程继续使用当前数据
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._refreshed = time.monotonic()
+            self.refresh()
+        except Exception as e:
+            self.refresh_errors += 1
+            print("Session revocation refresh error:", e)
+        finally:
+            self._refresh_lock.release()
+
+    def _lookup(self, user_id):
+        with self.db_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT session_gen, is_active FROM auth_user WHERE id=%s", (user_id,))
+            row = cursor.fetchone()
+        with self._lock:
+            self.lookups += 1
+        return self._merge(user_id, (row['session_gen'], bool(row['is_active'])) if row else _MISSING)
+
+    def is_valid(self, user):
+        """user 为会话中保存的 {'id', 'gen', ...}；查询数据库失败时抛出异常"""
+        self._maybe_refresh()
+        user_id = user.get('id')
+        with self._lock:
+            entry = self._users.get(user_id)
+        if entry is None:
+            # 本 worker 第一次见到该用户（新注册、刚登录或 worker 刚启动）
+            entry = self._lookup(user_id)
+        gen, active = entry
+        return active and user.get('gen', 0) == gen
+
+    def revoke(self, user_id, active=False):
+        """调用方已在数据库中把 session_gen +1 并提交后调用，使本 worker 立即生效"""
+        with self._lock:
+            if user_id in self._users:
+                gen, _ = self._users[user_id]
+                self._users[user_id] = (gen + 1, active)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._users),
+                'snapshot_age_s': round(time.time() - self._loaded_at, 1) if self._loaded_at else None,
+                'refresh_interval_s': self.refresh_interval,
+                'refreshes': self.refreshes,
+                'refresh_errors': self.refresh_errors,
+                'lookups': self.lookups,
+            }
+
+
+# =========================
+# 服务端会话
+# =========================
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.modified = False
+        self.user_at_open = (initial or {}).get('user')
+
+
+class ServerSessionInterface(SessionInterface):
+    """会话内容保存在 store 中，ttl 秒内没有修改则过期；登录用户变化时更换会话 id（防止会话固定）"""
+    def __init__(self, store, ttl=7 * 86400):
+        self.store = store
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(sid):
+        return f"sess:{sid}"
+
+    def open_session(self, app, request):
+        start = time.perf_counter()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        data = self.store.get(self._key(sid)) if sid and len(sid) <= 64 else None
+        stats.record('session_load', time.perf_counter() - start)
+        return ServerSession(data, sid=sid if data is not None else None)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.sid:
+                self.store.delete(self._key(session.sid))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified and session.sid:
+            return
+        old_sid, sid = session.sid, session.sid
+        if sid is None or session.get('user') != session.user_at_open:
+            sid = secrets.token_urlsafe(32)
+            if old_sid:
+                self.store.delete(self._key(old_sid))
+        self.store.set(self._key(sid), dict(session), ttl=self.ttl)
+        if sid != old_sid:
+            response.set_cookie(
+                name, sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain, path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
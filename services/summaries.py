@@ -0,0 +1,257 @@
+# services/summaries.py
+# 校友摘要批量预生成：按主键分块扫描 tb_user，多位校友打包进一个提示词，有界并发调用大模型，
+# 结果连同内容哈希写入 alumni_summary 表。
+# - 内容哈希在 MySQL 中计算（SHA2），扫描时直接过滤掉资料未变化的校友，只重新生成变化过的
+# - 打包结果缺失或解析失败的校友逐个重试
+# - 资料页通过 get_summary() 按主键一次查询读取摘要，不再等待大模型
+#
+# 命令行：
+#     python -m services.summaries              # 只生成缺失或过期的摘要
+#     python -m services.summaries --force      # 全部重新生成
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .llm_client import DEFAULT_SYSTEM
+
+# 参与摘要生成的字段：其中任一变化，摘要即视为过期
+SUMMARY_FIELDS = ('name', 'grad_year', 'degree', 'major', 'city', 'country', 'bio')
+
+# 字段以 \x1f 分隔后取 SHA-256；NULL 视为空串，与 content_hash() 保持一致
+HASH_SQL = "SHA2(CONCAT_WS(CHAR(31 USING utf8mb4), {}), 256)".format(
+    ", ".join(f"COALESCE(u.{f}, '')" for f in SUMMARY_FIELDS))
+
+BIO_MAX_CHARS = 300     # 提示词中每位校友简介的最大长度，控制打包后的提示词长度
+
+
+def content_hash(row):
+    """与 HASH_SQL 相同的算法，在 Python 侧计算"""
+    raw = "\x1f".join("" if row.get(f) is None else str(row.get(f)) for f in SUMMARY_FIELDS)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _profile_line(row):
+    bio = (row.get('bio') or '')[:BIO_MAX_CHARS]
+    edu = " ".join(str(row[f]) for f in ('grad_year', 'degree', 'major') if row.get(f))
+    place = " ".join(row[f] for f in ('city', 'country') if row.get(f))
+    return f"姓名：{row.get('name', '')}；毕业：{edu}；所在地：{place}；简介：{bio}"
+
+
+def single_prompt(row):
+    return f"""为以下校友生成一段简短"名片摘要"，50~120字，客观、可读性强：
+{_profile_line(row)}
+输出不要多余引言，直接给摘要文本。"""
+
+
+def pack_prompt(rows):
+    lines = "\n".join(f"[id={r['id']}] {_profile_line(r)}" for r in rows)
+    return f"""为以下 {len(rows)} 位校友分别生成一段简短"名片摘要"，每段50~120字，客观、可读性强：
+{lines}
+输出 JSON 对象，键为校友 id，值为该校友的摘要文本。不要多余文本。"""
+
+
+def parse_pack(text):
+    """解析打包结果，返回 {id: 摘要}；格式不对时返回空字典"""
+    left, right = (text or "").find("{"), (text or "").rfind("}")
+    if left == -1 or right <= left:
+        return {}
+    try:
+        data = json.loads(text[left:right + 1])
+    except ValueError:
+        return {}
+    out = {}
+    for k, v in data.items():
+        try:
+            out[int(k)] = str(v).strip()
+        except (TypeError, ValueError):
+            continue
+    return {k: v for k, v in out.items() if v}
+
+
+class SummaryPipeline:
+    def __init__(self, db_pool, client, pack_size=8, chunk_size=200, max_workers=4):
+        self.db_pool = db_pool
+        self.client = client
+        self.pack_size = max(1, pack_size)
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+
+    # -------------------------
+    # 读写
+    # -------------------------
+    def _fetch(self, after, limit, force):
+        # HAVING 中引用别名，哈希只计算一次；LEFT JOIN 走 alumni_summary 主键
+        having = "" if force else "HAVING old_hash IS NULL OR old_hash <> content_hash"
+        with self.db_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT u.id, {", ".join(f"u.{f}" for f in SUMMARY_FIELDS)},
+                       {HASH_SQL} AS content_hash, s.content_hash AS old_hash
+                FROM tb_user u LEFT JOIN alumni_summary s ON s.user_id = u.id
+                WHERE u.id > %s
+                {having}
+                ORDER BY u.id
+                LIMIT %s
+            """, (after, limit))
+            return cursor.fetchall()
+
+    def _save(self, rows, summaries):
+        sql = """
+            INSERT INTO alumni_summary (user_id, summary, content_hash, model, generated_at)
+            VALUES (%s, %s, %s, %s, NOW(3))
+            ON DUPLICATE KEY UPDATE summary=VALUES(summary), content_hash=VALUES(content_hash),
+                                    model=VALUES(model), generated_at=VALUES(generated_at)
+        """
+        model = getattr(self.client, 'model', None)
+        values = [(r['id'], summaries[r['id']], r['content_hash'], model) for r in rows if r['id'] in summaries]
+        if not values:
+            return 0
+        with self.db_pool.connection() as conn, conn.cursor() as cursor:
+            try:
+                cursor.executemany(sql, values)
+            except Exception as e:
+                # 生成期间有校友被删除（外键失败）时整批回滚，逐条写入并跳过失败的行
+                print("Save summaries error, retry one by one:", e)
+                conn.rollback()
+                saved = 0
+                for v in values:
+                    try:
+                        cursor.execute(sql, v)
+                        saved += 1
+                    except Exception:
+                        conn.rollback()
+                        continue
+                    conn.commit()
+                return saved
+            conn.commit()
+        return len(values)
+
+    # -------------------------
+    # 生成
+    # -------------------------
+    def _ask(self, prompt, counters):
+        with self._lock:
+            counters['llm_calls'] += 1
+        return self.client.ask(prompt, system=DEFAULT_SYSTEM)
+
+    def _summarize_pack(self, rows, counters):
+        """返回 {id: 摘要}；打包调用失败或结果缺失的校友逐个生成，单个失败的跳过"""
+        out = {}
+        if len(rows) > 1:
+            try:
+                out = parse_pack(self._ask(pack_prompt(rows), counters))
+            except Exception as e:
+                print("Summary pack error:", e)
+            out = {k: v for k, v in out.items() if any(r['id'] == k for r in rows)}
+        missing = [r for r in rows if r['id'] not in out]
+        if len(rows) > 1 and missing:
+            with self._lock:
+                counters['pack_misses'] += len(missing)
+        for r in missing:
+            try:
+                text = (self._ask(single_prompt(r), counters) or '').strip()
+            except Exception as e:
+                print(f"Summary error for user {r['id']}:", e)
+                continue
+            if text:
+                out[r['id']] = text
+        return out
+
+    def run(self, force=False, limit=None, map_fn=None):
+        """
+        扫描并生成摘要，返回统计信息。
+        force=True 时忽略内容哈希全部重新生成；limit 限制本次最多处理的校友数。
+        map_fn(fn, packs) 并发处理各个分包，作为异步任务运行时传入 JobEngine.map，与其他 AI 任务共用并发上限；
+        不传时（命令行）用自己的 max_workers 线程池。
+        """
+        counters = {'scanned': 0, 'generated': 0, 'failed': 0, 'llm_calls': 0, 'pack_misses': 0}
+        start = time.monotonic()
+        after = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='summary') as pool:
+            map_fn = map_fn or pool.map
+            while limit is None or counters['scanned'] < limit:
+                rows = self._fetch(after, self.chunk_size, force)
+                if not rows:
+                    break
+                after = rows[-1]['id']
+                if limit is not None:
+                    rows = rows[:limit - counters['scanned']]
+                counters['scanned'] += len(rows)
+
+                packs = [rows[i:i + self.pack_size] for i in range(0, len(rows), self.pack_size)]
+                summaries = {}
+                for result in map_fn(lambda p: self._summarize_pack(p, counters), packs):
+                    summaries.update(result)
+                saved = self._save(rows, summaries)
+                counters['generated'] += saved
+                counters['failed'] += len(rows) - saved
+        counters['elapsed_s'] = round(time.monotonic() - start, 2)
+        return counters
+
+    # -------------------------
+    # 查询
+    # -------------------------
+    def coverage(self):
+        """摘要覆盖情况：校友总数、已有摘要数、资料变化后已过期的摘要数"""
+        with self.db_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT COUNT(*) AS total, COUNT(s.user_id) AS summarized,
+                       COALESCE(SUM(s.content_hash <> {HASH_SQL}), 0) AS stale,
+                       MAX(s.generated_at) AS last_generated_at
+                FROM tb_user u LEFT JOIN alumni_summary s ON s.user_id = u.id
+            """)
+            data = cursor.fetchone()
+        data['stale'] = int(data['stale'])
+        return data
+
+
+def get_summary(cursor, user_id):
+    """
+    读取预生成的摘要：校友不存在返回 None；尚未生成时 summary 为 None。
+    fresh 表示生成后资料是否未再变化。
+    """
+    cursor.execute(f"""
+        SELECT u.id AS user_id, s.summary, s.model, s.generated_at,
+               s.content_hash = {HASH_SQL} AS fresh
+        FROM tb_user u LEFT JOIN alumni_summary s ON s.user_id = u.id
+        WHERE u.id = %s
+    """, (user_id,))
+    row = cursor.fetchone()
+    if row:
+        row['fresh'] = bool(row['fresh'])
+    return row
+
+
+def main(argv=None):
+    import argparse
+    import os
+    from dotenv import load_dotenv
+    from .db_pool import create_pool_from_env
+    from .llm_client import LLMClient
+
+    parser = argparse.ArgumentParser(description="批量预生成校友摘要")
+    parser.add_argument("--force", action="store_true", help="忽略内容哈希，全部重新生成")
+    parser.add_argument("--limit", type=int, default=None, help="本次最多处理的校友数")
+    parser.add_argument("--pack-size", type=int, default=None, help="每个提示词包含的校友数")
+    parser.add_argument("--workers", type=int, default=None, help="并发调用大模型的线程数")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    pool = create_pool_from_env()
+    pipeline = SummaryPipeline(
+        pool, LLMClient(),
+        pack_size=args.pack_size or int(os.getenv('SUMMARY_PACK_SIZE', 8)),
+        max_workers=args.workers or int(os.getenv('SUMMARY_WORKERS', 4)),
+    )
+    try:
+        result = pipeline.run(force=args.force, limit=args.limit)
+        print(json.dumps(result, ensure_ascii=False))
+        print(json.dumps(pipeline.coverage(), ensure_ascii=False, default=str))
+    finally:
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
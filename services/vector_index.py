@@ -0,0 +1,417 @@
+# services/vector_index.py
+# 本地语义检索：把每位校友的姓名、专业、城市、简介编码为向量，AI 搜索按余弦相似度取候选
+# - 特征：字符 n-gram（中文单字 + 二字，英文单词 + 三字母片段）经带符号哈希映射到 dim 维，
+#   乘以 IDF 后做 L2 归一化；纯 CPU，无需外部模型
+# - 向量以 float32 保存在一个 NumPy 矩阵中（10 万人、256 维约 100MB），查询时分块做矩阵乘法
+#   并用 argpartition 取 top-k（float16 虽省一半内存，但每次查询都要转换，反而慢一个数量级）
+# - 本 worker 的增删改实时更新；其他 worker 的改动与 InvertedIndex 一样按 updated_at 轮询追平（同样往回多读一段）
+# - 持久化为 .npy 文件，worker 启动时以 mmap（写时复制）加载，无需重新扫描全表
+# 需要安装 numpy
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import pymysql.cursors
+
+try:
+    import numpy as np
+except ImportError:     # 未安装时只有启用向量索引才会报错
+    np = None
+
+# 参与编码的字段及权重（简介信息量最大，但也最长，靠 IDF 和亚线性 tf 压住）
+VECTOR_FIELDS = {
+    'name': 1.0,
+    'major': 2.0,
+    'city': 1.0,
+    'bio': 1.0,
+}
+# 特征算法版本：分词或哈希方式变化时 +1，磁盘上的旧索引会被忽略并重建
+FEATURE_VERSION = 1
+SEARCH_CHUNK_ROWS = 65536     # 查询时每次参与矩阵乘法的行数，控制临时内存
+
+_CJK_RUN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+_WORD = re.compile(r'[0-9a-z]+')
+
+
+class IndexUnavailable(Exception):
+    """向量索引未就绪（调用方应回退到关键词检索）"""
+
+
+def _grams(text):
+    """文本 → n-gram 列表：中文单字 + 相邻二字，英文/数字单词 + 三字母片段"""
+    text = (text or '').casefold()
+    out = []
+    for run in _CJK_RUN.findall(text):
+        out.extend(run)
+        out.extend(run[i:i + 2] for i in range(len(run) - 1))
+    for word in _WORD.findall(text):
+        out.append(word)
+        padded = f"#{word}#"
+        if len(padded) > 4:
+            out.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return out
+
+
+class VectorIndex:
+    def __init__(self, dim=256, path=None, max_docs=1_000_000, poll_overlap=30):
+        if np is None:
+            raise RuntimeError("使用向量索引需要安装 numpy：pip install numpy")
+        self.dim = dim
+        self.path = path
+        self.max_docs = max_docs
+        # 轮询时多读水位线之前 poll_overlap 秒的记录：updated_at 在语句执行时取值，事务提交可能更晚
+        self.poll_overlap = poll_overlap
+
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((0, dim), dtype=np.float32)   # 前 _n 行有效
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._pos = {}                                        # id -> 行号
+        self._n = 0
+        self._idf = np.ones(dim, dtype=np.float32)
+
+        self.ready = False
+        self.disabled_reason = None
+        self.watermark = None
+        self.built_at = None
+        self.build_seconds = None
+        self.loaded_from = None
+        self.last_poll = 0.0
+        self.last_save = time.monotonic()
+        self.dirty = False
+        self._poll_lock = threading.Lock()
+        self._counters = {'searches': 0, 'upserts': 0, 'removes': 0, 'polls': 0, 'saves': 0}
+
+    # -------------------------
+    # 编码
+    # -------------------------
+    def _accumulate(self, vec, text, weight):
+        counts = {}
+        for g in _grams(text):
+            counts[g] = counts.get(g, 0) + 1
+        for g, c in counts.items():
+            h = zlib.crc32(g.encode('utf-8'))
+            # 低位选桶，最高位决定符号，减少哈希冲突带来的偏差
+            vec[h % self.dim] += (1.0 + math.log(c)) * weight * (1.0 if h & 0x80000000 else -1.0)
+
+    def _raw(self, row):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for field, weight in VECTOR_FIELDS.items():
+            if row.get(field):
+                self._accumulate(vec, str(row[field]), weight)
+        return vec
+
+    def _finish(self, vec):
+        vec *= self._idf
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def encode_row(self, row):
+        return self._finish(self._raw(row))
+
+    def encode_text(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        self._accumulate(vec, text, 1.0)
+        return self._finish(vec)
+
+    # -------------------------
+    # 增量维护
+    # -------------------------
+    def _ensure_capacity(self, n):
+        cap = self._matrix.shape[0]
+        if n <= cap:
+            return
+        new_cap = max(1024, int(cap * 1.5), n)
+        # 从磁盘 mmap 加载的矩阵在这里复制到内存
+        matrix = np.zeros((new_cap, self.dim), dtype=np.float32)
+        matrix[:self._n] = self._matrix[:self._n]
+        ids = np.zeros(new_cap, dtype=np.int64)
+        ids[:self._n] = self._ids[:self._n]
+        self._matrix, self._ids = matrix, ids
+
+    def upsert(self, row):
+        """插入或更新一位校友（row 至少包含 id 和 VECTOR_FIELDS），向量有变化时返回 True"""
+        doc_id = int(row['id'])
+        vec = self.encode_row(row)
+        with self._lock:
+            pos = self._pos.get(doc_id)
+            if pos is not None and np.array_equal(self._matrix[pos], vec):
+                return False
+            if pos is None:
+                if self._n >= self.max_docs:
+                    self._disable(f"文档数超过上限 {self.max_docs}")
+                    return False
+                self._ensure_capacity(self._n + 1)
+                pos = self._n
+                self._n += 1
+                self._pos[doc_id] = pos
+                self._ids[pos] = doc_id
+            self._matrix[pos] = vec
+            self.dirty = True
+            self._counters['upserts'] += 1
+            return True
+
+    def remove(self, doc_id):
+        """删除：用最后一行填补空位，矩阵保持紧凑"""
+        with self._lock:
+            pos = self._pos.pop(doc_id, None)
+            if pos is None:
+                return
+            last = self._n - 1
+            if pos != last:
+                self._matrix[pos] = self._matrix[last]
+                moved = int(self._ids[last])
+                self._ids[pos] = moved
+                self._pos[moved] = pos
+            self._n = last
+            self.dirty = True
+            self._counters['removes'] += 1
+
+    def _disable(self, reason):
+        self.ready = False
+        self.disabled_reason = reason
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._pos = {}
+        self._n = 0
+        print("Vector index disabled:", reason)
+
+    # -------------------------
+    # 全量构建 / 轮询追平
+    # -------------------------
+    def _select_columns(self):
+        return ', '.join(['id'] + list(VECTOR_FIELDS))
+
+    def build(self, conn):
+        """流式读取 tb_user：先收集原始 tf 向量与文档频率，再统一乘 IDF 并归一化"""
+        start = time.monotonic()
+        matrix = np.zeros((1024, self.dim), dtype=np.float32)
+        ids = []
+        df = np.zeros(self.dim, dtype=np.int64)
+        watermark = None
+        with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(f"SELECT {self._select_columns()}, updated_at AS _updated_at FROM tb_user ORDER BY id")
+            for row in cursor:
+                n = len(ids)
+                if n >= self.max_docs:
+                    self._disable(f"文档数超过上限 {self.max_docs}")
+                    return
+                ts = row.pop('_updated_at')
+                if ts is not None and (watermark is None or ts > watermark):
+                    watermark = ts
+                raw = self._raw(row)
+                df += raw != 0
+                if n >= matrix.shape[0]:
+                    grown = np.zeros((int(matrix.shape[0] * 1.5), self.dim), dtype=np.float32)
+                    grown[:n] = matrix
+                    matrix = grown
+                matrix[n] = raw
+                ids.append(row['id'])
+
+        n = len(ids)
+        idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+        for lo in range(0, n, SEARCH_CHUNK_ROWS):
+            block = matrix[lo:lo + SEARCH_CHUNK_ROWS] * idf
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix[lo:lo + SEARCH_CHUNK_ROWS] = block / norms
+
+        with self._lock:
+            self._matrix = matrix
+            self._ids = np.zeros(matrix.shape[0], dtype=np.int64)
+            self._ids[:n] = ids
+            self._pos = {doc_id: i for i, doc_id in enumerate(ids)}
+            self._n = n
+            self._idf = idf
+            self.watermark = watermark
+            self.built_at = time.time()
+            self.build_seconds = round(time.monotonic() - start, 3)
+            self.loaded_from = 'database'
+            self.last_poll = time.monotonic()
+            self.disabled_reason = None
+            self.dirty = True
+            self.ready = True
+
+    def poll_due(self, interval):
+        return time.monotonic() - self.last_poll >= interval
+
+    def poll(self, conn, interval):
+        """
+        拉取 updated_at >= 水位线 - poll_overlap 的记录并重新编码，返回有变化的条数（删除由 reconcile_ids 处理）。
+        往回多读的记录向量不变，不会重复计数，也不会把索引标记为需要落盘。
+        """
+        if not self.ready or not self.poll_due(interval):
+            return 0
+        if not self._poll_lock.acquire(blocking=False):
+            return 0
+        try:
+            changed = 0
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT {self._select_columns()}, updated_at AS _updated_at
+                    FROM tb_user WHERE updated_at >= %s ORDER BY updated_at, id
+                """, (self._poll_since(),))
+                for row in cursor.fetchall():
+                    ts = row.pop('_updated_at')
+                    if self.upsert(row):
+                        changed += 1
+                    if ts is not None and (self.watermark is None or ts > self.watermark):
+                        self.watermark = ts
+            self.last_poll = time.monotonic()
+            self._counters['polls'] += 1
+            return changed
+        finally:
+            self._poll_lock.release()
+
+    def _poll_since(self):
+        if self.watermark is None:
+            return '1970-01-01 00:00:01'
+        return self.watermark - timedelta(seconds=self.poll_overlap)
+
+    def reconcile_ids(self, conn):
+        """对比数据库中的 id 集合，移除其他 worker 删除的记录"""
+        with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute("SELECT id FROM tb_user")
+            db_ids = {r[0] for r in cursor}
+        with self._lock:
+            stale = [i for i in self._pos if i not in db_ids]
+        for doc_id in stale:
+            self.remove(doc_id)
+        return len(stale)
+
+    # -------------------------
+    # 持久化
+    # -------------------------
+    def _files(self, path):
+        return {name: os.path.join(path, f"{name}.npy") for name in ('matrix', 'ids', 'idf')}
+
+    def save(self, path=None):
+        """写入临时文件后原子替换；meta.json 最后写，加载时以其中的行数校验各文件是否配套"""
+        path = path or self.path
+        if not path or not self.ready:
+            return False
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            n = self._n
+            arrays = {'matrix': np.array(self._matrix[:n]), 'ids': self._ids[:n].copy(), 'idf': self._idf.copy()}
+            meta = {
+                'feature_version': FEATURE_VERSION,
+                'dim': self.dim,
+                'rows': n,
+                'watermark': self.watermark.isoformat() if self.watermark else None,
+                'saved_at': time.time(),
+            }
+            self.dirty = False
+        suffix = f".tmp-{os.getpid()}"
+        for name, file in self._files(path).items():
+            with open(file + suffix, 'wb') as f:
+                np.save(f, arrays[name])
+            os.replace(file + suffix, file)
+        meta_file = os.path.join(path, 'meta.json')
+        with open(meta_file + suffix, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_file + suffix, meta_file)
+        self.last_save = time.monotonic()
+        self._counters['saves'] += 1
+        return True
+
+    def load(self, path=None):
+        """从磁盘加载（mmap，写时复制）；文件缺失、版本或维度不符时返回 False，调用方应全量构建"""
+        path = path or self.path
+        meta_file = os.path.join(path or '', 'meta.json')
+        if not path or not os.path.exists(meta_file):
+            return False
+        try:
+            with open(meta_file, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('feature_version') != FEATURE_VERSION or meta.get('dim') != self.dim:
+                print("Vector index on disk is outdated, rebuilding")
+                return False
+            files = self._files(path)
+            matrix = np.load(files['matrix'], mmap_mode='c')
+            ids = np.load(files['ids'])
+            idf = np.load(files['idf'])
+            if matrix.shape != (meta['rows'], self.dim) or ids.shape[0] != meta['rows']:
+                print("Vector index files are inconsistent, rebuilding")
+                return False
+        except Exception as e:
+            print("Load vector index error:", e)
+            return False
+
+        with self._lock:
+            self._matrix, self._ids, self._idf = matrix, ids, idf.astype(np.float32)
+            self._n = int(meta['rows'])
+            self._pos = {int(doc_id): i for i, doc_id in enumerate(ids)}
+            self.watermark = datetime.fromisoformat(meta['watermark']) if meta.get('watermark') else None
+            self.built_at = meta.get('saved_at')
+            self.loaded_from = 'disk'
+            self.last_poll = 0.0        # 立即轮询一次，追平保存之后的改动
+            self.disabled_reason = None
+            self.dirty = False
+            self.ready = True
+        return True
+
+    # -------------------------
+    # 检索
+    # -------------------------
+    def search_many(self, texts, k=20, min_score=0.05):
+        """
+        批量查询：一次矩阵乘法同时计算多个查询的余弦相似度。
+        返回与 texts 对应的列表，每项为按相似度降序的 [(id, score), ...]。
+        """
+        if not self.ready:
+            raise IndexUnavailable(self.disabled_reason or "向量索引尚未构建完成")
+        queries = np.stack([self.encode_text(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+        results = [[] for _ in texts]
+        with self._lock:
+            self._counters['searches'] += len(texts)
+            n = self._n
+            best_scores, best_rows = [], []
+            for lo in range(0, n, SEARCH_CHUNK_ROWS):
+                block = self._matrix[lo:min(n, lo + SEARCH_CHUNK_ROWS)]
+                scores = block @ queries.T                      # (rows, 查询数)
+                if scores.shape[0] > k:
+                    top = np.argpartition(-scores, k, axis=0)[:k]
+                else:
+                    top = np.broadcast_to(np.arange(scores.shape[0])[:, None], scores.shape)
+                best_scores.append(np.take_along_axis(scores, top, axis=0))
+                best_rows.append(top + lo)
+            if not best_scores:
+                return results
+            scores = np.concatenate(best_scores)
+            rows = np.concatenate(best_rows)
+            ids = self._ids
+            for qi in range(len(texts)):
+                order = np.argsort(-scores[:, qi], kind='stable')[:k]
+                results[qi] = [(int(ids[rows[j, qi]]), round(float(scores[j, qi]), 4))
+                               for j in order if scores[j, qi] >= min_score]
+        return results
+
+    def search(self, text, k=20, min_score=0.05):
+        return self.search_many([text], k=k, min_score=min_score)[0]
+
+    # -------------------------
+    # 统计
+    # -------------------------
+    def stats(self):
+        with self._lock:
+            data = dict(self._counters)
+            data.update({
+                'ready': self.ready,
+                'disabled_reason': self.disabled_reason,
+                'docs': self._n,
+                'dim': self.dim,
+                'capacity': int(self._matrix.shape[0]),
+                'memory_mb': round(self._matrix.nbytes / (1024 * 1024), 2),
+                'mmap': isinstance(self._matrix, np.memmap),
+                'loaded_from': self.loaded_from,
+                'dirty': self.dirty,
+                'watermark': str(self.watermark) if self.watermark else None,
+                'build_seconds': self.build_seconds,
+                'path': self.path,
+            })
+        return data
@@ -0,0 +1,6 @@
+# tests/conftest.py
+# 测试只覆盖不需要数据库 / 大模型的纯逻辑模块；在项目根目录运行：python -m pytest -q
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
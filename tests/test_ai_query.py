@@ -0,0 +1,21 @@
+from services.ai_query import normalize_query, parse_keywords
+
+
+def test_parse_keywords_extracts_json_array():
+    text = '好的，扩写结果：\n["对象存储", "副本", "对象存储", "a", " CAP "]\n以上。'
+    assert parse_keywords(text) == ['对象存储', '副本', 'CAP']
+
+
+def test_parse_keywords_filters_and_limits():
+    assert parse_keywords('["一个非常非常非常长的关键词啊", 3, null, "ok"]') == ['ok']
+    assert parse_keywords('["a1", "a2", "a3", "a4"]', max_terms=2) == ['a1', 'a2']
+
+
+def test_parse_keywords_bad_output():
+    for text in (None, '', '没有数组', '][', '[不是 JSON]'):
+        assert parse_keywords(text) is None
+
+
+def test_normalize_query():
+    assert normalize_query('  Machine   Learning ') == 'machine learning'
+    assert normalize_query(None) == ''
@@ -0,0 +1,133 @@
+import re
+from collections import Counter
+
+import pytest
+
+from services import alumni_stats
+from services.alumni_stats import TOTAL, buckets, deltas
+
+ZHANG = {'grad_year': 2020, 'degree': '本科', 'major': '计算机', 'city': '北京', 'country': '中国', 'gender': '男'}
+LI = {'grad_year': 2021, 'degree': '硕士', 'major': '经济学', 'city': None, 'country': '中国', 'gender': '女'}
+
+
+class FakeCursor:
+    """按语句类型模拟 tb_user 与 tb_user_stats（分片行）"""
+    def __init__(self, users):
+        self.users = users
+        self.stats = Counter()      # (dim, k1, k2, shard) -> cnt
+        self.result = []
+
+    def execute(self, sql, args=None):
+        if 'FROM tb_user_stats GROUP BY' in sql:
+            sums = Counter()
+            for (dim, k1, k2, _), n in self.stats.items():
+                sums[(dim, k1, k2)] += n
+            self.result = [{'dim': d, 'k1': a, 'k2': b, 'cnt': n} for (d, a, b), n in sums.items()]
+        elif sql.startswith('SELECT COUNT(*)'):
+            self.result = [{'cnt': len(self.users)}]
+        elif 'GROUP BY' in sql:
+            cols = re.findall(r'CAST\((\w+) AS CHAR', sql)[:len(re.findall(r' AS k\d', sql))]
+            groups = Counter(tuple(None if u.get(c) is None else str(u[c]) for c in cols) for u in self.users)
+            self.result = [dict({f'k{i + 1}': v for i, v in enumerate(key)}, cnt=n) for key, n in groups.items()]
+        elif 'UNIX_TIMESTAMP()' in sql:
+            self.stats[(args[0], '', '', 0)] = 1_700_000_000
+        else:
+            raise AssertionError(sql)
+
+    def executemany(self, sql, rows):
+        for row in rows:
+            if len(row) == 4:       # 重算补差值：不指定分片，落在分片 0
+                row = row[:3] + (0,) + row[3:]
+            self.stats[row[:4]] += row[4]
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+    def totals(self):
+        sums = Counter()
+        for (dim, k1, k2, _), n in self.stats.items():
+            if not dim.startswith('_') or dim == TOTAL:
+                sums[(dim, k1, k2)] += n
+        return {k: n for k, n in sums.items() if n}
+
+
+def test_buckets_cover_all_dimensions():
+    keys = buckets(LI)
+    assert keys[0] == (TOTAL, '', '')
+    assert ('city', '', '') in keys                       # NULL 与空串同为"未填写"
+    assert ('grad_year', '2021', '') in keys
+    assert ('city:grad_year', '', '2021') in keys
+    assert len(keys) == 1 + len(alumni_stats.DIMENSIONS) + len(alumni_stats.CROSSTABS)
+
+
+def test_deltas_cancel_unchanged_buckets():
+    moved = dict(ZHANG, city='上海')
+    assert deltas([ZHANG], [moved]) == {
+        ('city', '北京', ''): -1, ('city', '上海', ''): 1,
+        ('city:grad_year', '北京', '2020'): -1, ('city:grad_year', '上海', '2020'): 1,
+        ('country:city', '中国', '北京'): -1, ('country:city', '中国', '上海'): 1,
+    }
+    assert deltas([ZHANG], [ZHANG]) == {}
+    assert deltas(after=[ZHANG, LI])[(TOTAL, '', '')] == 2
+    assert deltas(before=[LI])[('gender', '女', '')] == -1
+
+
+def test_apply_spreads_over_shards():
+    cursor = FakeCursor([])
+    for shard in range(3):
+        alumni_stats.apply(cursor, deltas(after=[ZHANG]), shard=shard)
+    assert {k[3] for k in cursor.stats} == {0, 1, 2}
+    assert cursor.totals()[(TOTAL, '', '')] == 3
+
+
+def expected(users):
+    return deltas(after=users)
+
+
+def test_recount_from_empty_table():
+    cursor = FakeCursor([ZHANG, LI])
+    report = alumni_stats.recount(cursor)
+    assert cursor.totals() == expected([ZHANG, LI])
+    assert report['total'] == 2 and report['corrected'] == 0
+    assert report['buckets'] == len(expected([ZHANG, LI]))
+
+
+def test_recount_corrects_only_drift():
+    users = [ZHANG, LI]
+    cursor = FakeCursor(users)
+    for user in users:
+        alumni_stats.record(cursor, after=[user])
+    # 漂移：少记一次北京、多记一个已经不存在的城市
+    cursor.stats[('city', '北京', '', 5)] -= 1
+    cursor.stats[('city', '广州', '', 7)] += 2
+    before = dict(cursor.stats)
+    report = alumni_stats.recount(cursor)
+    assert report['corrected'] == 2
+    assert cursor.totals() == expected(users)
+    changed = {k for k in cursor.stats if cursor.stats[k] != before.get(k)}
+    assert changed == {('city', '北京', '', 0), ('city', '广州', '', 0), (alumni_stats.REBUILT_AT, '', '', 0)}
+
+
+def test_recount_drift_commutes_with_concurrent_writes():
+    # 快照中只有 ZHANG；重算读完之后另一个事务新增了 LI 并加上自己的增量
+    cursor = FakeCursor([ZHANG])
+    cursor.stats[('city', '北京', '', 3)] = 5      # 漂移
+    alumni_stats.recount(cursor)
+    alumni_stats.record(cursor, after=[LI])
+    assert cursor.totals() == expected([ZHANG, LI])
+
+
+@pytest.mark.parametrize('raw,dims', [
+    ('', list(alumni_stats.AVAILABLE)),
+    ('city, city:grad_year,city', ['city', 'city:grad_year']),
+])
+def test_parse_dims(raw, dims):
+    assert alumni_stats.parse_dims(raw) == dims
+
+
+def test_parse_dims_rejects_unknown():
+    with pytest.raises(alumni_stats.StatsArgsError):
+        alumni_stats.parse_dims('city,salary')
@@ -0,0 +1,69 @@
+import io
+
+import pytest
+
+from services.bulk_import import RowError, USER_COLUMNS, iter_rows, validate_user, validate_user_patch
+
+
+def row(values):
+    return dict(zip(USER_COLUMNS, values))
+
+
+def test_validate_user_normalizes():
+    values = validate_user({'name': '  张伟 ', 'age': '30', 'grad_year': 2018, 'city': None, 'extra': 'x'})
+    data = row(values)
+    assert data['name'] == '张伟' and data['age'] == 30 and data['grad_year'] == 2018
+    assert data['city'] == '' and data['phone'] == ''
+    assert len(values) == len(USER_COLUMNS)
+
+
+@pytest.mark.parametrize('age,expected', [(30, 30), (30.0, 30), (' 30.0 ', 30), ('', None), (None, None)])
+def test_validate_user_accepts_integral_ages(age, expected):
+    assert row(validate_user({'name': '张伟', 'age': age}))['age'] == expected
+
+
+@pytest.mark.parametrize('data,message', [
+    ({'name': '张伟', 'age': 30.5}, 'age 必须是整数'),
+    ({'name': '张伟', 'grad_year': '二〇一八'}, 'grad_year 必须是整数'),
+    ({'name': '  '}, '姓名不能为空'),
+    ({}, '姓名不能为空'),
+    (['张伟'], '数据必须是对象'),
+])
+def test_validate_user_rejects(data, message):
+    with pytest.raises(RowError, match=message):
+        validate_user(data)
+
+
+def test_validate_user_patch_keeps_only_given_fields():
+    assert validate_user_patch({'id': 3, 'city': ' 上海 ', 'age': 31.0}) == {'city': '上海', 'age': 31}
+    assert validate_user_patch({'phone': None}) == {'phone': ''}
+
+
+@pytest.mark.parametrize('data,message', [
+    ({'id': 3}, '没有要更新的字段'),
+    ({'name': ' '}, '姓名不能为空'),
+    ({'age': 'abc'}, 'age 必须是整数'),
+    ('city=上海', '数据必须是对象'),
+])
+def test_validate_user_patch_rejects(data, message):
+    with pytest.raises(RowError, match=message):
+        validate_user_patch(data)
+
+
+def test_csv_rows_with_chinese_headers():
+    data = '\ufeff姓名,年龄,邮箱\r\n张伟,30,zw@example.com\r\n,,\r\n李娜,,ln@example.com\r\n'.encode('utf-8')
+    rows = list(iter_rows(io.BytesIO(data), 'csv'))
+    assert rows == [(2, {'name': '张伟', 'age': '30', 'email': 'zw@example.com'}),
+                    (4, {'name': '李娜', 'age': '', 'email': 'ln@example.com'})]
+
+
+def test_jsonl_rows_report_parse_errors():
+    data = b'{"name": "\xe5\xbc\xa0\xe4\xbc\x9f", "age": 30.0}\n\n{broken\n'
+    rows = list(iter_rows(io.BytesIO(data), 'jsonl'))
+    assert rows[0] == (1, {'name': '张伟', 'age': 30.0})
+    assert rows[1][0] == 3 and isinstance(rows[1][1], RowError)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        iter_rows(io.BytesIO(b''), 'xlsx')
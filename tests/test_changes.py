@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+from services import changes
+from services.changes import CursorError, CursorExpired, decode_cursor, encode_cursor, fetch_changes
+
+NOW = 1_720_000_000
+
+
+class FakeCursor:
+    """tb_user 行为 {'id', 'name', 'ts'}，删除记录为 {'seq', 'user_id', 'at'}，时间均为秒级时间戳"""
+    def __init__(self, users=(), tombstones=(), now=NOW):
+        self.users = list(users)
+        self.tombstones = list(tombstones)
+        self.now = now
+        self.result = []
+        self.statements = []
+
+    def execute(self, sql, args=()):
+        self.statements.append(sql)
+        if 'FROM tb_user_tombstone' in sql and 'MAX(seq)' in sql:
+            self.result = [{'seq': max((t['seq'] for t in self.tombstones), default=0)}]
+        elif 'FROM tb_user_tombstone' in sql:
+            seq, settle, limit = args
+            rows = [t for t in self.tombstones if t['seq'] > seq and t['at'] < self.now - settle]
+            self.result = [{'seq': t['seq'], 'user_id': t['user_id']} for t in sorted(rows, key=lambda t: t['seq'])][:limit]
+        elif 'FROM tb_user' in sql:
+            ts, _, after_id, settle, limit = args
+            rows = [u for u in self.users
+                    if (u['ts'] > ts or (u['ts'] == ts and u['id'] > after_id)) and u['ts'] < self.now - settle]
+            rows.sort(key=lambda u: (u['ts'], u['id']))
+            self.result = [{'id': u['id'], 'name': u['name'], 'updated_at': u['ts'], '_ts': u['ts']}
+                           for u in rows[:limit]]
+        else:
+            raise AssertionError(sql)
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+
+def user(user_id, ts, name='x'):
+    return {'id': user_id, 'name': name, 'ts': ts}
+
+
+def sync(cursor, state, **kwargs):
+    page = fetch_changes(cursor, ['id', 'name'], state, **kwargs)
+    return page, decode_cursor(page['next_cursor'])
+
+
+def test_cursor_round_trip():
+    state = {'ts': NOW, 'id': 12, 'seq': 7, 't': int(time.time())}
+    token = encode_cursor(state)
+    assert '=' not in token
+    assert decode_cursor(token) == state
+
+
+@pytest.mark.parametrize('token', ['', 'not-base64!', encode_cursor({'ts': 1, 'id': 2}),
+                                   encode_cursor({'ts': 'x', 'id': 1, 'seq': 0, 't': 0})])
+def test_invalid_cursor(token):
+    with pytest.raises(CursorError):
+        decode_cursor(token)
+
+
+def test_cursor_expired():
+    token = encode_cursor({'ts': 0, 'id': 0, 'seq': 0, 't': int(time.time()) - 8 * 86400})
+    with pytest.raises(CursorExpired):
+        decode_cursor(token, retention_days=7)
+    assert decode_cursor(token, retention_days=30)['seq'] == 0
+    assert issubclass(CursorExpired, CursorError)
+
+
+def test_initial_state_skips_old_deletions():
+    cursor = FakeCursor(tombstones=[{'seq': 5, 'user_id': 1, 'at': NOW - 100}])
+    assert changes.initial_state(cursor) == {'ts': 0, 'id': 0, 'seq': 5}
+
+
+def test_keyset_paging_within_same_second():
+    cursor = FakeCursor(users=[user(3, NOW - 60), user(1, NOW - 60), user(2, NOW - 50)])
+    page, state = sync(cursor, {'ts': 0, 'id': 0, 'seq': 0}, limit=1)
+    assert [r['id'] for r in page['items']] == [1] and page['has_more']
+    page, state = sync(cursor, state, limit=1)
+    assert [r['id'] for r in page['items']] == [3] and page['has_more']
+    page, state = sync(cursor, state, limit=5)
+    assert [r['id'] for r in page['items']] == [2] and not page['has_more']
+    assert (state['ts'], state['id']) == (NOW - 50, 2)
+    assert '_ts' not in page['items'][0]
+
+
+def test_settle_window_holds_back_recent_changes():
+    cursor = FakeCursor(users=[user(1, NOW - 10), user(2, NOW - 1)],
+                        tombstones=[{'seq': 1, 'user_id': 9, 'at': NOW - 10}, {'seq': 2, 'user_id': 8, 'at': NOW}])
+    page, state = sync(cursor, {'ts': 0, 'id': 0, 'seq': 0})
+    assert [r['id'] for r in page['items']] == [1]
+    assert page['deleted'] == [9]
+    # 更早的行此时才提交：游标没有越过它，下次仍能拉到
+    cursor.users.append(user(5, NOW - 3))
+    cursor.now = NOW + 5
+    page, state = sync(cursor, state)
+    assert [r['id'] for r in page['items']] == [5, 2]
+    assert page['deleted'] == [8]
+    assert state['seq'] == 2
+
+
+def test_no_changes_keeps_position():
+    cursor = FakeCursor()
+    start = {'ts': NOW - 100, 'id': 4, 'seq': 3}
+    page, state = sync(cursor, start)
+    assert page['items'] == [] and page['deleted'] == [] and not page['has_more']
+    assert (state['ts'], state['id'], state['seq']) == (NOW - 100, 4, 3)
+
+
+def test_required_fields_are_added():
+    cursor = FakeCursor()
+    fetch_changes(cursor, ['name'], {'ts': 0, 'id': 0, 'seq': 0})
+    assert 'SELECT name, id, updated_at, UNIX_TIMESTAMP(updated_at) AS _ts' in cursor.statements[0]
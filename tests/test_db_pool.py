@@ -0,0 +1,159 @@
+import threading
+import time
+
+import pymysql
+import pytest
+
+from services import db_pool
+from services.db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConn:
+    def __init__(self):
+        self.open = True
+        self.rollbacks = 0
+        self.pings = 0
+        self.fail_rollback = False
+        self.fail_ping = False
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise pymysql.err.OperationalError(2006, 'gone away')
+        self.rollbacks += 1
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.fail_ping:
+            raise pymysql.err.OperationalError(2006, 'gone away')
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def connects(monkeypatch):
+    made = []
+
+    def connect(**kwargs):
+        made.append(FakeConn())
+        return made[-1]
+    monkeypatch.setattr(db_pool.pymysql, 'connect', connect)
+    return made
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(db_pool.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_checkout_reuses_idle_connection(connects):
+    pool = ConnectionPool(size=2, max_overflow=0)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    stats = pool.stats()
+    assert stats['created'] == 1 and stats['checkouts'] == 2
+    assert stats['idle'] == 1 and stats['in_use'] == 0
+
+
+def test_release_rolls_back_open_transaction(connects):
+    pool = ConnectionPool(size=1)
+    with pool.connection() as conn:
+        pass
+    assert conn.rollbacks == 1 and conn.open
+
+
+def test_failed_rollback_discards_connection(connects):
+    pool = ConnectionPool(size=1)
+    pc = pool.acquire()
+    pc.conn.fail_rollback = True
+    pool.release(pc)
+    assert not pc.conn.open
+    assert pool.stats()['discarded'] == 1 and pool.stats()['idle'] == 0
+
+
+def test_operational_error_discards_connection(connects):
+    pool = ConnectionPool(size=1)
+    with pytest.raises(pymysql.err.OperationalError):
+        with pool.connection():
+            raise pymysql.err.OperationalError(2013, 'lost connection')
+    assert not connects[0].open
+    assert pool.stats()['idle'] == 0 and pool.stats()['in_use'] == 0
+
+
+def test_overflow_connections_are_closed_on_release(connects):
+    pool = ConnectionPool(size=1, max_overflow=1, timeout=0.01)
+    a, b = pool.acquire(), pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(a)
+    pool.release(b)
+    stats = pool.stats()
+    assert stats['idle'] == 1 and stats['discarded'] == 1 and stats['wait_timeouts'] == 1
+
+
+def test_waiter_gets_released_connection(connects):
+    pool = ConnectionPool(size=1, max_overflow=0, timeout=2)
+    pc = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(pc)
+    waiter.join(1)
+    assert got and got[0] is pc
+
+
+def test_recycle_old_connection(connects, clock):
+    pool = ConnectionPool(size=1, recycle=60)
+    with pool.connection():
+        pass
+    clock[0] += 61
+    with pool.connection() as conn:
+        assert conn is connects[1]
+    assert not connects[0].open
+    assert pool.stats()['recycled'] == 1
+
+
+def test_ping_idle_connection_and_reconnect_on_failure(connects, clock):
+    pool = ConnectionPool(size=1, recycle=0, ping_interval=30)
+    with pool.connection():
+        pass
+    clock[0] += 10
+    with pool.connection():
+        pass
+    assert connects[0].pings == 0
+    clock[0] += 31
+    connects[0].fail_ping = True
+    with pool.connection() as conn:
+        assert conn is connects[1]
+    assert connects[0].pings == 1 and pool.stats()['ping_failed'] == 1
+
+
+def test_connect_failure_frees_slot(monkeypatch):
+    def connect(**kwargs):
+        raise pymysql.err.OperationalError(2003, "can't connect")
+    monkeypatch.setattr(db_pool.pymysql, 'connect', connect)
+    pool = ConnectionPool(size=1, max_overflow=0)
+    for _ in range(3):
+        with pytest.raises(pymysql.err.OperationalError):
+            pool.acquire()
+    assert pool.stats()['in_use'] == 0
+
+
+def test_fork_resets_pool(connects, monkeypatch):
+    pool = ConnectionPool(size=2)
+    with pool.connection():
+        pass
+    assert pool.stats()['idle'] == 1
+    # 子进程不能沿用父进程的 socket：换了 pid 后丢弃继承来的连接和计数
+    child_pid = pool.stats()['pid'] + 1
+    monkeypatch.setattr(db_pool.os, 'getpid', lambda: child_pid)
+    with pool.connection() as conn:
+        assert conn is connects[1]
+    stats = pool.stats()
+    assert stats['pid'] == child_pid
+    assert stats['created'] == 1 and stats['checkouts'] == 1 and stats['idle'] == 1
@@ -0,0 +1,116 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+
+import pytest
+
+from services import export
+
+FIELDS = ['id', 'name', 'city', 'created_at']
+ROWS = [
+    (1, '张伟', '北京', datetime.datetime(2024, 7, 1, 8, 0, 0)),
+    (2, 'Lucy, "L"', None, None),
+]
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.executed = []
+
+    def execute(self, sql, args=None):
+        self.executed.append((sql, args))
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.rows = rows
+        self.released = []
+
+    def acquire(self):
+        pool = self
+
+        class Conn:
+            def cursor(self, cls=None):
+                return FakeCursor(pool.rows)
+
+        class Pooled:
+            conn = Conn()
+        return Pooled()
+
+    def release(self, pc, discard=False):
+        self.released.append(discard)
+
+
+def run(fmt, rows=ROWS, **kwargs):
+    pool = FakePool(rows)
+    done = []
+    body = b''.join(export.stream_users(pool, FIELDS, fmt, on_done=lambda *a: done.append(a), **kwargs))
+    return body, pool, done
+
+
+def test_csv_output():
+    body, pool, done = run('csv')
+    text = body.decode('utf-8')
+    assert text.startswith('\ufeff')
+    assert list(csv.reader(io.StringIO(text[1:]))) == [
+        FIELDS,
+        ['1', '张伟', '北京', '2024-07-01 08:00:00'],
+        ['2', 'Lucy, "L"', '', ''],
+    ]
+    assert pool.released == [False]
+    assert done == [(2, len(body))]
+
+
+def test_jsonl_output():
+    body, _, _ = run('jsonl')
+    lines = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+    assert lines == [
+        {'id': 1, 'name': '张伟', 'city': '北京', 'created_at': '2024-07-01 08:00:00'},
+        {'id': 2, 'name': 'Lucy, "L"', 'city': None, 'created_at': None},
+    ]
+
+
+@pytest.mark.parametrize('fmt', export.EXPORT_FORMATS)
+def test_gzip_output_matches_plain(fmt):
+    plain, _, _ = run(fmt)
+    zipped, _, done = run(fmt, gzip=True)
+    assert gzip.decompress(zipped) == plain
+    assert done == [(2, len(zipped))]
+
+
+def test_large_export_is_chunked(monkeypatch):
+    monkeypatch.setattr(export, 'CHUNK_BYTES', 100)
+    rows = [(i, f'name{i}', 'city', None) for i in range(500)]
+    pool = FakePool(rows)
+    chunks = list(export.stream_users(pool, FIELDS, 'jsonl'))
+    assert len(chunks) > 10
+    assert len(b''.join(chunks).splitlines()) == 500
+
+
+def test_closed_early_discards_connection():
+    pool = FakePool(ROWS)
+    body = export.stream_users(pool, FIELDS, 'csv')
+    next(body)
+    body.close()
+    assert pool.released == [True]
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        next(export.stream_users(FakePool(ROWS), FIELDS, 'xml'))
+
+
+def test_build_query_without_keyword():
+    sql, params, mode = export.build_query(['id', 'name'])
+    assert sql == "SELECT id, name FROM tb_user ORDER BY id"
+    assert params == () and mode is None
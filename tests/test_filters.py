@@ -0,0 +1,73 @@
+import pytest
+
+from services import filters
+
+
+def parse(**args):
+    return filters.parse_filters({k: str(v) for k, v in args.items()})
+
+
+def test_no_filter_args():
+    assert filters.parse_filters({'limit': '10'}) is None
+
+
+def test_parse_and_where():
+    f = parse(city='北京,上海', degree='硕士', grad_year_from=2015, grad_year_to=2018, sort='-grad_year')
+    assert f.kind('city') == 'in' and f.kind('degree') == 'eq' and f.kind('grad_year') == 'range'
+    assert (f.sort_col, f.desc) == ('grad_year', True)
+    where, params = f.where()
+    assert where == "degree = %s AND city IN (%s, %s) AND grad_year BETWEEN %s AND %s"
+    assert params == ('硕士', '北京', '上海', 2015, 2018)
+
+
+@pytest.mark.parametrize('args', [
+    {'grad_year': '2015', 'grad_year_from': '2010'},
+    {'grad_year_from': '2020', 'grad_year_to': '2010'},
+    {'grad_year': '20x5'},
+    {'grad_year_to': '1800'},
+    {'sort': 'age'},
+    {'city': ','.join(str(i) for i in range(filters.MAX_VALUES + 1))},
+])
+def test_parse_errors(args):
+    with pytest.raises(filters.FilterError):
+        filters.parse_filters(args)
+
+
+def test_sort_with_keyword_rejected():
+    with pytest.raises(filters.FilterError):
+        filters.parse_filters({'sort': 'name'}, keyword='张')
+
+
+def test_rule_plan_prefers_longest_usable_prefix():
+    p = filters.plan(parse(city='深圳', degree='硕士', grad_year_from=2017, grad_year_to=2019))
+    assert p == {'index': 'idx_city_degree_grad', 'used_columns': ['city', 'degree', 'grad_year'],
+                 'ordered': False, 'estimated_rows': None}
+    # 等值列之后正好是排序列：按索引顺序分页，不需要 filesort
+    p = filters.plan(parse(major='计算机科学', sort='grad_year'))
+    assert (p['index'], p['ordered']) == ('idx_major_grad', True)
+    # 没有可用的筛选列时按排序列的索引扫描
+    assert filters.plan(parse(gender='女', sort='name'))['index'] == 'idx_name'
+    assert filters.plan(parse(sort='-updated_at'))['index'] == 'idx_updated_at'
+
+
+def test_cost_plan_uses_estimates():
+    f = parse(gender='女', city='北京')
+    estimates = {'total': 100000, 'city': {'北京': 500}, 'gender': {'女': 50000}}
+    p = filters.plan(f, limit=50, estimates=estimates)
+    assert p['index'] == 'idx_city_degree_grad' and p['estimated_rows'] == 600
+    # 条件几乎不筛掉任何行时，按主键顺序扫描凑满一页更便宜
+    estimates = {'total': 100000, 'city': {'北京': 99000}, 'gender': {'女': 99000}}
+    p = filters.plan(f, limit=50, estimates=estimates)
+    assert p['index'] == 'PRIMARY' and p['ordered']
+
+
+def test_cursor_round_trip_and_keyset():
+    token = filters.encode_cursor(2017, 42)
+    assert filters.decode_cursor(token, 'grad_year') == (2017, 42)
+    assert filters.decode_cursor('42', 'id') == (42, 42)
+    with pytest.raises(filters.FilterError):
+        filters.decode_cursor('not-a-cursor', 'grad_year')
+    sql, params, p = filters.build_query(parse(city='北京', sort='-grad_year'), ['id', 'name'], 20, after=token)
+    assert 'FORCE INDEX (' + p['index'] + ')' in sql
+    assert 'ORDER BY grad_year DESC, id DESC' in sql and ', grad_year FROM' in sql
+    assert params == ('北京', 2017, 2017, 42, 21)
@@ -0,0 +1,46 @@
+import datetime
+
+from flask import Flask, request
+
+from services import http_cache
+
+app = Flask(__name__)
+
+
+def test_make_etag_is_stable_and_sensitive():
+    assert http_cache.make_etag('users', 1, {'b': 2, 'a': 1}) == http_cache.make_etag('users', 1, {'a': 1, 'b': 2})
+    assert http_cache.make_etag('users', 1) != http_cache.make_etag('users', 2)
+
+
+def test_to_utc():
+    naive = datetime.datetime(2024, 1, 2, 3, 4, 5, 678)
+    assert http_cache.to_utc(naive) == datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    assert http_cache.to_utc(0) == datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+    assert http_cache.to_utc('Tue, 02 Jan 2024 03:04:05 GMT') == http_cache.to_utc(naive)
+    assert http_cache.to_utc(None) is None
+
+
+def test_if_none_match_takes_precedence():
+    last = http_cache.to_utc(1_700_000_000)
+    with app.test_request_context(headers={'If-None-Match': 'W/"abc"',
+                                           'If-Modified-Since': 'Tue, 02 Jan 2099 00:00:00 GMT'}):
+        assert http_cache.is_not_modified(request, 'abc', last)
+        assert not http_cache.is_not_modified(request, 'other', last)
+
+
+def test_if_modified_since():
+    last = http_cache.to_utc(1_700_000_000)
+    with app.test_request_context(headers={'If-Modified-Since': 'Tue, 14 Nov 2023 22:13:20 GMT'}):
+        assert http_cache.is_not_modified(request, 'abc', last)
+        assert not http_cache.is_not_modified(request, 'abc', http_cache.to_utc(1_700_000_001))
+    with app.test_request_context(method='POST', headers={'If-None-Match': 'W/"abc"'}):
+        assert not http_cache.is_not_modified(request, 'abc', last)
+
+
+def test_not_modified_response():
+    with app.test_request_context():
+        resp = http_cache.not_modified('abc', http_cache.to_utc(1_700_000_000))
+    assert resp.status_code == 304
+    assert resp.headers['ETag'] == 'W/"abc"'
+    assert resp.headers['Cache-Control'] == http_cache.CACHE_CONTROL
+    assert resp.headers['Last-Modified'] == 'Tue, 14 Nov 2023 22:13:20 GMT'
@@ -0,0 +1,224 @@
+import contextlib
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from services import jobs
+from services.jobs import JobEngine, QueueFull, UnknownJobKind
+
+
+class FakeDb:
+    """ai_job 表放在内存中，now 为数据库时间（秒）"""
+    def __init__(self):
+        self.jobs = {}
+        self.now = 1000.0
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def add(self, job_id, worker, heartbeat_at, status='running', created_at=None):
+        self.jobs[job_id] = {'id': job_id, 'kind': 'x', 'status': status, 'worker': worker,
+                             'heartbeat_at': heartbeat_at, 'created_at': created_at or heartbeat_at or self.now,
+                             'result': None, 'error': None}
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _pending(self, ids=None):
+        return [j for j in self.db.jobs.values()
+                if j['status'] in ('queued', 'running') and (ids is None or j['id'] in ids)]
+
+    def execute(self, sql, args=()):
+        sql = ' '.join(sql.split())
+        with self.db.lock:
+            jobs_, now = self.db.jobs, self.db.now
+            if sql.startswith('INSERT INTO ai_job'):
+                job_id, kind, params, owner_id, worker = args
+                self.db.add(job_id, worker, now, status='queued')
+                jobs_[job_id]['kind'] = kind
+            elif "SET status='running'" in sql:
+                jobs_[args[0]]['status'] = 'running'
+            elif "SET status='succeeded'" in sql:
+                jobs_[args[1]].update(status='succeeded', result=args[0])
+            elif "SET status='failed', error=%s" in sql:
+                jobs_[args[1]].update(status='failed', error=args[0])
+            elif sql.startswith('SELECT id, kind, status'):
+                job = jobs_.get(args[0])
+                self.result = [dict(job)] if job else []
+            elif 'SET heartbeat_at' in sql:
+                rows = self._pending(set(args))
+                for j in rows:
+                    j['heartbeat_at'] = now
+                self.rowcount = len(rows)
+            elif sql.startswith('SELECT id, worker'):
+                self.result = [{'id': j['id'], 'worker': j['worker']} for j in self._pending() if j['worker']]
+            elif '已退出' in sql:
+                rows = self._pending(set(args))
+                for j in rows:
+                    j.update(status='failed', error='worker 已退出')
+                self.rowcount = len(rows)
+            elif '心跳超时' in sql:
+                rows = [j for j in self._pending()
+                        if (j['heartbeat_at'] if j['heartbeat_at'] is not None else j['created_at']) < now - args[0]]
+                for j in rows:
+                    j.update(status='failed', error='心跳超时')
+                self.rowcount = len(rows)
+            else:
+                raise AssertionError(sql)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+
+@pytest.fixture
+def db():
+    return FakeDb()
+
+
+def engine_for(db, **kwargs):
+    kwargs.setdefault('heartbeat_interval', 0)
+    return JobEngine(db, **kwargs)
+
+
+def wait_finished(engine, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = engine.get(job_id)
+        if job['status'] in jobs.FINISHED:
+            return job
+        time.sleep(0.005)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_succeeds_and_result_is_persisted(db):
+    engine = engine_for(db)
+    engine.register('double', lambda p: {'value': p['n'] * 2})
+    job = wait_finished(engine, engine.submit('double', {'n': 21}))
+    assert job['status'] == 'succeeded' and job['result'] == {'value': 42}
+    stats = engine.stats(with_db=False)
+    assert stats['submitted'] == 1 and stats['succeeded'] == 1
+    assert stats['queued'] == 0 and stats['running'] == 0
+
+
+def test_job_failure_is_recorded(db):
+    engine = engine_for(db)
+
+    def boom(params):
+        raise RuntimeError('模型超时')
+    engine.register('boom', boom)
+    job = wait_finished(engine, engine.submit('boom', {}))
+    assert job['status'] == 'failed' and db.jobs[job['id']]['error'] == '模型超时'
+    assert engine.stats(with_db=False)['failed'] == 1
+
+
+def test_unknown_kind(db):
+    with pytest.raises(UnknownJobKind):
+        engine_for(db).submit('nope', {})
+
+
+def test_queue_full_rejects(db):
+    engine = engine_for(db, max_workers=1, max_queue=1)
+    release = threading.Event()
+    engine.register('block', lambda p: release.wait(5))
+    first = engine.submit('block', {})
+    try:
+        deadline = time.monotonic() + 5
+        while engine.stats(with_db=False)['queued'] and time.monotonic() < deadline:
+            time.sleep(0.005)
+        second = engine.submit('block', {})
+        with pytest.raises(QueueFull):
+            engine.submit('block', {})
+        assert engine.stats(with_db=False)['rejected'] == 1
+    finally:
+        release.set()
+    wait_finished(engine, first)
+    wait_finished(engine, second)
+
+
+def test_slots_cap_jobs_and_sub_tasks(db):
+    engine = engine_for(db, max_workers=2)
+    lock = threading.Lock()
+    current, peak = [0], [0]
+
+    def call_model(item):
+        with lock:
+            current[0] += 1
+            peak[0] = max(peak[0], current[0])
+        time.sleep(0.01)
+        with lock:
+            current[0] -= 1
+        return item * 10
+
+    engine.register('batch', lambda p: engine.map(call_model, range(p['n'])))
+    ids = [engine.submit('batch', {'n': 6}) for _ in range(3)]
+    results = [wait_finished(engine, job_id)['result'] for job_id in ids]
+    assert results == [[0, 10, 20, 30, 40, 50]] * 3
+    assert peak[0] <= 2
+
+
+def test_map_raises_first_error(db):
+    engine = engine_for(db, max_workers=2)
+
+    def fn(item):
+        if item == 3:
+            raise ValueError('bad item')
+        return item
+
+    with engine._slots:
+        with pytest.raises(ValueError):
+            engine.map(fn, range(5))
+
+
+def test_heartbeat_touches_only_active_jobs(db):
+    engine = engine_for(db, max_workers=1)
+    release = threading.Event()
+    engine.register('block', lambda p: release.wait(5))
+    job_id = engine.submit('block', {})
+    db.add('other', 'otherhost:1', 900.0)
+    db.now = 1010.0
+    assert engine.heartbeat() == 1
+    assert db.jobs[job_id]['heartbeat_at'] == 1010.0 and db.jobs['other']['heartbeat_at'] == 900.0
+    release.set()
+    wait_finished(engine, job_id)
+    assert engine.heartbeat() == 0
+
+
+def test_expire_stale(db, monkeypatch):
+    host = socket.gethostname()
+    monkeypatch.setattr(jobs, '_pid_alive', lambda pid: pid == os.getpid())
+    db.now = 2000.0
+    db.add('dead-local', f"{host}:999999", 1990.0)
+    db.add('alive-local', f"{host}:{os.getpid()}", 1990.0)
+    db.add('stale-remote', 'otherhost:1', 1000.0)
+    db.add('fresh-remote', 'otherhost:1', 1990.0)
+    db.add('legacy', None, None, created_at=1000.0)
+    db.add('done', f"{host}:999999", 1000.0, status='succeeded')
+    engine = engine_for(db)
+    assert engine.expire_stale(300) == 3
+    status = {job_id: j['status'] for job_id, j in db.jobs.items()}
+    assert status == {'dead-local': 'failed', 'alive-local': 'running', 'stale-remote': 'failed',
+                      'fresh-remote': 'running', 'legacy': 'failed', 'done': 'succeeded'}
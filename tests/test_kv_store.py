@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from services.kv_store import MemoryStore, hit_ratio, make_store
+
+
+def test_lru_eviction_keeps_recent():
+    store = MemoryStore(max_entries=2)
+    store.set('a', 1)
+    store.set('b', 2)
+    assert store.get('a') == 1
+    store.set('c', 3)
+    assert store.get('b') is None
+    assert store.get('a') == 1 and store.get('c') == 3
+    assert store.stats()['evictions'] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    store = MemoryStore()
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    store.set('k', 'v', ttl=5)
+    store.set('forever', 'v')
+    now[0] += 6
+    assert store.get('k') is None
+    assert store.get('forever') == 'v'
+    assert store.stats()['expired'] == 1
+
+
+def test_counters_survive_eviction_and_clear():
+    store = MemoryStore(max_entries=1)
+    assert store.get_counter('ver') == 0
+    assert store.incr('ver') == 1
+    store.set('a', 1)
+    store.set('b', 2)
+    store.clear()
+    assert store.get_counter('ver') == 1
+
+
+def test_hit_ratio_and_delete():
+    store = MemoryStore()
+    store.set('a', 1)
+    store.get('a')
+    store.delete('a')
+    store.get('a')
+    assert hit_ratio(store.stats()) == 0.5
+    assert hit_ratio({}) is None
+
+
+def test_make_store():
+    assert isinstance(make_store(None), MemoryStore)
+    assert make_store('memory://', max_entries=3).max_entries == 3
+    with pytest.raises(ValueError):
+        make_store('memcached://localhost')
@@ -0,0 +1,123 @@
+import contextlib
+import time
+
+import pytest
+
+from services.kv_store import MemoryStore
+from services.llm_cache import CachedLLMClient, normalize_prompt
+from services.read_cache import DbVersions
+
+
+class FakeLLM:
+    model = 'fake-model'
+
+    def __init__(self):
+        self.calls = 0
+
+    def ask(self, prompt, system=None, temperature=0.3):
+        self.calls += 1
+        return f"answer {self.calls}"
+
+    def ask_stream(self, prompt, system=None, temperature=0.3):
+        self.calls += 1
+        yield 'part1 '
+        yield f"part{self.calls}"
+
+
+class VersionTable:
+    """模拟 MySQL 中的 cache_version 表，供多个 DbVersions（多个 worker）共享"""
+    def __init__(self):
+        self.versions = {}
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self
+
+    @contextlib.contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, args):
+        self.row = {'version': self.versions[args[0]]} if args[0] in self.versions else None
+
+    def fetchone(self):
+        return self.row
+
+    def executemany(self, sql, rows):
+        for (name,) in rows:
+            self.versions[name] = self.versions.get(name, 0) + 1
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_normalize_prompt():
+    assert normalize_prompt('  你好\n    世界  ') == '你好 世界'
+    assert normalize_prompt(None) == ''
+
+
+def test_hit_after_miss_and_refresh_bypass():
+    llm = CachedLLMClient(FakeLLM(), MemoryStore())
+    assert llm.ask('问题') == 'answer 1'
+    assert llm.ask('  问题 ') == 'answer 1'
+    assert llm.ask('问题', refresh=True) == 'answer 2'
+    assert llm.ask('问题') == 'answer 2'
+    stats = llm.stats()
+    assert (stats['hits'], stats['misses'], stats['bypass']) == (2, 1, 1)
+    assert stats['versions'] == 'store'
+
+
+def test_tag_invalidation_only_affects_tagged_entries():
+    llm = CachedLLMClient(FakeLLM(), MemoryStore())
+    llm.ask('摘要 12', tags=['user:12'])
+    llm.ask('摘要 13', tags=['user:13'])
+    llm.invalidate('user:12')
+    assert llm.ask('摘要 12', tags=['user:12']) == 'answer 3'
+    assert llm.ask('摘要 13', tags=['user:13']) == 'answer 2'
+    llm.invalidate()
+    assert llm.ask('摘要 13', tags=['user:13']) == 'answer 4'
+
+
+def test_stream_caches_only_complete_output():
+    llm = CachedLLMClient(FakeLLM(), MemoryStore())
+    stream = llm.ask_stream('问题')
+    next(stream)
+    stream.close()
+    assert ''.join(llm.ask_stream('问题')) == 'part1 part2'
+    assert list(llm.ask_stream('问题')) == ['part1 part2']
+
+
+def test_invalidation_reaches_other_workers_through_db_versions(clock):
+    table = VersionTable()
+    store_a, store_b = MemoryStore(), MemoryStore()
+    worker_a = CachedLLMClient(FakeLLM(), store_a, versions=DbVersions(table, memo_ttl=1))
+    worker_b = CachedLLMClient(FakeLLM(), store_b, versions=DbVersions(table, memo_ttl=1))
+    assert worker_a.ask('摘要 12', tags=['user:12']) == 'answer 1'
+    worker_b.invalidate('user:12')
+    assert table.versions == {'llmtag:user:12': 1}
+    clock[0] += 1.5
+    assert worker_a.ask('摘要 12', tags=['user:12']) == 'answer 2'
+    assert worker_a.stats()['versions'] == 'db'
+
+
+def test_memory_store_versions_stay_in_one_worker():
+    worker_a = CachedLLMClient(FakeLLM(), MemoryStore())
+    worker_b = CachedLLMClient(FakeLLM(), MemoryStore())
+    worker_a.ask('摘要 12', tags=['user:12'])
+    worker_b.invalidate('user:12')
+    assert worker_a.ask('摘要 12', tags=['user:12']) == 'answer 1'
+
+
+def test_long_tag_names_fit_version_table():
+    table = VersionTable()
+    llm = CachedLLMClient(FakeLLM(), MemoryStore(), versions=DbVersions(table, memo_ttl=0))
+    llm.invalidate('x' * 100)
+    assert all(len(name) <= 64 for name in table.versions)
+    assert llm.ask('q', tags=['x' * 100]) == 'answer 1'
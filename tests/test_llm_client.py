@@ -0,0 +1,116 @@
+# LLMClient 的重试与退避：对 bench/fake_llm_server.py 发真实的 HTTP 请求，退避等待只记录时长、不真的等
+import socket
+import time
+import types
+
+import pytest
+import requests
+
+from bench.fake_llm_server import start_in_thread
+from services import llm_client
+from services.llm_client import LLMClient
+
+
+def patch_sleep(monkeypatch, sleep):
+    # 只替换 llm_client 看到的 time 模块，模拟服务端线程里的 sleep 不受影响
+    monkeypatch.setattr(llm_client, 'time', types.SimpleNamespace(monotonic=time.monotonic, sleep=sleep))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waited = []
+    patch_sleep(monkeypatch, waited.append)
+    return waited
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(**options):
+        srv, base_url = start_in_thread(latency=0, token_delay=0, **options)
+        servers.append(srv)
+        return srv, base_url
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+def client(base_url, **kwargs):
+    return LLMClient(base_url=base_url, api_key='fake', model='fake-model', connect_timeout=1, timeout=5, **kwargs)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_retries_5xx_then_succeeds(server, sleeps):
+    srv, base_url = server(first_failures=2)
+    assert client(base_url, max_retries=3, backoff=0.5, backoff_max=8).ask('你好').startswith('（模拟回复）')
+    assert srv.config.counters['requests'] == 3
+    assert len(sleeps) == 2
+    # 全抖动：第 n 次重试等待 [0, backoff * 2^n]
+    assert 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+
+
+def test_retry_after_is_capped(server, sleeps):
+    srv, base_url = server(first_failures=2, fail_status=429, retry_after=30)
+    client(base_url, max_retries=3, backoff_max=2).ask('你好')
+    assert sleeps == [2, 2]
+
+
+def test_retry_after_below_cap_is_honoured(server, sleeps):
+    _, base_url = server(first_failures=1, fail_status=503, retry_after=0.25)
+    client(base_url, max_retries=3, backoff_max=2).ask('你好')
+    assert sleeps == [0.25]
+
+
+def test_gives_up_after_max_retries(server, sleeps):
+    srv, base_url = server(first_failures=10, fail_status=503)
+    with pytest.raises(requests.HTTPError) as exc:
+        client(base_url, max_retries=2).ask('你好')
+    assert exc.value.response.status_code == 503
+    assert srv.config.counters['requests'] == 3
+    assert len(sleeps) == 2
+
+
+def test_client_errors_are_not_retried(server, sleeps):
+    srv, base_url = server(first_failures=1, fail_status=400)
+    with pytest.raises(requests.HTTPError):
+        client(base_url, max_retries=3).ask('你好')
+    assert srv.config.counters['requests'] == 1
+    assert sleeps == []
+
+
+def test_retries_connection_errors(monkeypatch, server):
+    # 第一次连接被拒绝；等待期间在同一端口启动服务，重试即成功
+    port = free_port()
+    started = []
+
+    def sleep(seconds):
+        if not started:
+            started.append(server(port=port))
+
+    patch_sleep(monkeypatch, sleep)
+    before = llm_client.stats.snapshot()['retries']
+    text = client(f"http://127.0.0.1:{port}/v1", max_retries=3).ask('你好')
+    assert text.startswith('（模拟回复）')
+    assert started and started[0][0].config.counters['requests'] == 1
+    assert llm_client.stats.snapshot()['retries'] == before + 1
+
+
+def test_connection_errors_give_up_after_max_retries(sleeps):
+    with pytest.raises(requests.ConnectionError):
+        client(f"http://127.0.0.1:{free_port()}/v1", max_retries=2).ask('你好')
+    assert len(sleeps) == 2
+
+
+def test_stream_retries_then_streams(server, sleeps):
+    srv, base_url = server(first_failures=1, fail_status=502)
+    text = ''.join(client(base_url, max_retries=2).ask_stream('你好'))
+    assert text.startswith('（模拟回复）')
+    assert srv.config.counters['requests'] == 2 and srv.config.counters['streams'] == 1
+    assert len(sleeps) == 1
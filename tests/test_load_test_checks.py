@@ -0,0 +1,75 @@
+# bench/load_test.py 的响应校验：内容不对的 2xx 响应要被判为 invalid
+import json
+
+import pytest
+import requests
+
+from bench import load_test
+
+CTX = {'credentials': {'username': 'admin', 'password': 'x'}, 'base_url': 'http://app'}
+
+
+def response(data, status=200):
+    resp = requests.models.Response()
+    resp.status_code = status
+    resp._content = json.dumps({'code': status, 'message': 'ok', 'data': data}).encode('utf-8')
+    return resp
+
+
+def req(path='/api/users', **params):
+    return {'url': CTX['base_url'] + path, 'params': params}
+
+
+def test_page():
+    ok = response({'items': [{'id': 11}, {'id': 12}], 'next_cursor': 12, 'limit': 2})
+    assert load_test.check_page(CTX, req(after=10, limit=2), ok) is None
+    unsorted = response({'items': [{'id': 12}, {'id': 11}], 'next_cursor': None, 'limit': 2})
+    assert load_test.check_page(CTX, req(after=10, limit=2), unsorted)
+    before_cursor = response({'items': [{'id': 5}], 'next_cursor': None, 'limit': 2})
+    assert load_test.check_page(CTX, req(after=10, limit=2), before_cursor)
+    too_many = response({'items': [{'id': 11}, {'id': 12}, {'id': 13}], 'next_cursor': None, 'limit': 2})
+    assert load_test.check_page(CTX, req(limit=2), too_many)
+    assert load_test.check_page_total(CTX, req(limit=2), response({'items': [{'id': 1}], 'next_cursor': None}))
+
+
+def test_like_search():
+    items = [{'id': 1, 'name': 'Lucy', 'bio': None}, {'id': 2, 'name': '张', 'email': 'LUCY@example.com'}]
+    assert load_test.check_like_search(CTX, req(keyword='lucy'), response({'items': items})) is None
+    assert load_test.check_like_search(CTX, req(keyword='bob'), response({'items': items}))
+
+
+def test_filter():
+    params = {'city': '北京', 'degree': '硕士', 'grad_year_from': 2012, 'grad_year_to': 2020}
+    good = [{'id': 1, 'city': '北京', 'degree': '硕士', 'grad_year': 2015}]
+    assert load_test.check_filter(CTX, req(**params), response({'items': good})) is None
+    assert load_test.check_filter(CTX, req(**params), response({'items': [dict(good[0], city='上海')]}))
+    assert load_test.check_filter(CTX, req(**params), response({'items': [dict(good[0], grad_year=2021)]}))
+
+    sorted_desc = [{'id': 2, 'major': 'CS', 'grad_year': 2020}, {'id': 1, 'major': 'CS', 'grad_year': 2015},
+                   {'id': 3, 'major': 'CS', 'grad_year': None}]
+    params = {'major': 'CS', 'sort': '-grad_year'}
+    assert load_test.check_filter(CTX, req(**params), response({'items': sorted_desc})) is None
+    assert load_test.check_filter(CTX, req(**params), response({'items': sorted_desc[::-1]}))
+
+
+def test_by_ids():
+    data = {'items': [{'id': 3}, {'id': 1}], 'missing': [9]}
+    assert load_test.check_by_ids(CTX, req(ids='3,9,1,3'), response(data)) is None
+    assert load_test.check_by_ids(CTX, req(ids='1,9,3'), response(data))
+    assert load_test.check_by_ids(CTX, req(ids='3,1'), response(data))
+
+
+def test_user_login_stats():
+    assert load_test.check_user(CTX, req('/api/users/5'), response({'id': 5})) is None
+    assert load_test.check_user(CTX, req('/api/users/5'), response({'id': 6}))
+    assert load_test.check_login(CTX, req(), response({'username': 'admin'})) is None
+    assert load_test.check_login(CTX, req(), response({'username': 'other'}))
+    stats = {'total': 3, 'dims': {'city': {}, 'grad_year': {}}}
+    assert load_test.check_stats(CTX, req('/api/stats'), response(stats)) is None
+    assert load_test.check_stats(CTX, req('/api/stats', dims='city,major'), response(stats))
+
+
+@pytest.mark.parametrize('name', ['users_list', 'users_filter', 'users_by_ids', 'users_get', 'stats', 'auth_login'])
+def test_read_scenarios_have_checks(name):
+    scenario = next(sc for sc in load_test.scenarios() if sc.name == name)
+    assert scenario.check is not None
@@ -0,0 +1,59 @@
+import pytest
+
+from services.pagination import (MAX_LIMIT, CountCache, PageArgsError, build_page, parse_fields, parse_ids,
+                                 parse_offset, parse_page_args)
+
+
+def test_page_args_defaults_and_cap():
+    assert parse_page_args({}) == (0, 50)
+    assert parse_page_args({'after': '10', 'limit': '20'}) == (10, 20)
+    assert parse_page_args({'limit': str(MAX_LIMIT * 10)}) == (0, MAX_LIMIT)
+
+
+@pytest.mark.parametrize('args', [{'after': 'x'}, {'limit': '1.5'}, {'after': '-1'}, {'limit': '0'}])
+def test_page_args_invalid(args):
+    with pytest.raises(PageArgsError):
+        parse_page_args(args)
+
+
+def test_offset():
+    assert parse_offset({}) == 0
+    assert parse_offset({'offset': '40'}) == 40
+    for bad in ('-1', '10001', 'abc'):
+        with pytest.raises(PageArgsError):
+            parse_offset({'offset': bad})
+
+
+def test_fields_keeps_allowed_order_and_adds_id():
+    allowed = ['id', 'name', 'city', 'bio']
+    assert parse_fields(None, allowed, ['id', 'name']) == ['id', 'name']
+    assert parse_fields('bio, name', allowed, []) == ['id', 'name', 'bio']
+    with pytest.raises(PageArgsError):
+        parse_fields('name,password', allowed, [])
+
+
+def test_ids_dedup_in_order():
+    assert parse_ids('3,1,3, 2') == [3, 1, 2]
+    assert parse_ids([5, '6', 5]) == [5, 6]
+    for bad in ('', '1,a', '0', [True], [1.5, 'x']):
+        with pytest.raises(PageArgsError):
+            parse_ids(bad)
+    with pytest.raises(PageArgsError):
+        parse_ids(list(range(1, 5)), max_ids=3)
+
+
+def test_build_page():
+    rows = [{'id': i} for i in (2, 5, 9)]
+    assert build_page(rows, 2) == {'items': rows[:2], 'next_cursor': 5, 'limit': 2}
+    assert build_page(rows, 3) == {'items': rows, 'next_cursor': None, 'limit': 3}
+    assert build_page([], 3)['next_cursor'] is None
+
+
+def test_count_cache_reuses_value():
+    cache = CountCache(ttl=60)
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+    assert cache.get_or_compute('k', compute) == 1
+    assert cache.get_or_compute('k', compute) == 1
+    cache.clear()
+    assert cache.get_or_compute('k', compute) == 2
@@ -0,0 +1,55 @@
+from services import prompt_builder as pb
+
+
+def row(i, bio):
+    return {'id': i, 'name': f'校友{i}', 'grad_year': 2015, 'degree': '硕士', 'major': '计算机', 'city': '北京',
+            'country': '中国', 'phone': '13800000000', 'email': f'u{i}@example.com', 'gender': '男', 'age': 30,
+            'bio': bio}
+
+
+def test_estimate_tokens():
+    assert pb.estimate_tokens('') == 0
+    assert pb.estimate_tokens('北京') == 2
+    assert pb.estimate_tokens('abcdefgh') == 2
+    assert pb.estimate_tokens('北京abcd') == 3
+
+
+def test_truncate_to_tokens():
+    assert pb.truncate_to_tokens('短文本', 10) == '短文本'
+    cut = pb.truncate_to_tokens('一二三四五六七八九十', 5)
+    assert cut.endswith('…') and pb.estimate_tokens(cut) <= 5
+    assert pb.truncate_to_tokens('一二三', 1) == ''
+
+
+def test_bio_cap_water_filling():
+    assert pb._bio_cap([5, 10, 20], 100) == 20
+    assert pb._bio_cap([5, 10, 20], 25) == 10
+    assert pb._bio_cap([], 10) == 0
+
+
+def test_prompt_omits_personal_info_and_fits_budget():
+    rows = [row(i, '长期从事分布式系统研发，' * 20) for i in range(1, 21)]
+    system, prompt, info = pb.build_rank_prompt('分布式', rows, budget=800)
+    assert system == pb.RANK_SYSTEM
+    assert prompt.startswith(pb.RANK_INSTRUCTIONS) and prompt.endswith('用户搜索：分布式')
+    assert '13800000000' not in prompt and 'example.com' not in prompt
+    assert info['prompt_tokens'] <= 800
+    assert info['candidates'] + info['dropped_candidates'] == 20
+    assert info['truncated_bios'] == info['candidates']
+    assert info['saved_tokens'] == info['baseline_tokens'] - info['prompt_tokens']
+
+
+def test_prompt_drops_candidates_when_budget_is_tiny():
+    rows = [row(i, '') for i in range(1, 6)]
+    fixed = pb.estimate_tokens(pb.RANK_SYSTEM) + pb.estimate_tokens(pb.RANK_INSTRUCTIONS)
+    _, prompt, info = pb.build_rank_prompt('q', rows, budget=fixed + 5)
+    assert info['candidates'] == 0 and info['dropped_candidates'] == 5
+    assert '（无）' in prompt
+
+
+def test_stats_snapshot():
+    stats = pb.RankPromptStats()
+    assert stats.snapshot()['requests'] == 0
+    stats.record({'prompt_tokens': 50, 'baseline_tokens': 100}, 20.0)
+    snap = stats.snapshot()
+    assert snap['saved_pct'] == 50.0 and snap['avg_llm_ms'] == 20.0
@@ -0,0 +1,197 @@
+import contextlib
+import time
+
+import pytest
+
+from services.kv_store import MemoryStore
+from services.read_cache import DbVersions, LIST_VERSION_KEY, ReadCache
+
+
+class FakeCursor:
+    """只实现 cache_version 的两条语句，表内容放在 db.versions 中"""
+    def __init__(self, db):
+        self.db = db
+        self.row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args):
+        if self.db.fail:
+            raise RuntimeError('db down')
+        self.db.queries += 1
+        name = args[0]
+        self.row = {'version': self.db.versions[name]} if name in self.db.versions else None
+
+    def fetchone(self):
+        return self.row
+
+    def executemany(self, sql, rows):
+        for (name,) in rows:
+            self.db.versions[name] = self.db.versions.get(name, 0) + 1
+
+
+class FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+
+class FakePool:
+    def __init__(self):
+        self.versions = {}
+        self.queries = 0
+        self.fail = False
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield FakeConn(self)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    return now
+
+
+def loader(value, calls):
+    def load():
+        calls.append(value)
+        return value
+    return load
+
+
+def test_user_hit_miss_and_invalidate():
+    cache = ReadCache(MemoryStore(), ttl=60)
+    calls = []
+    assert cache.get_user(1, loader({'id': 1, 'name': 'a'}, calls)) == {'id': 1, 'name': 'a'}
+    assert cache.get_user(1, loader({'id': 1, 'name': 'b'}, calls)) == {'id': 1, 'name': 'a'}
+    assert len(calls) == 1
+    cache.invalidate(1)
+    assert cache.get_user(1, loader({'id': 1, 'name': 'b'}, calls)) == {'id': 1, 'name': 'b'}
+    stats = cache.stats()
+    assert stats['user']['hits'] == 1 and stats['user']['misses'] == 2
+    assert stats['invalidations'] == 1
+
+
+def test_invalidate_only_touches_given_users_and_lists():
+    cache = ReadCache(MemoryStore(), ttl=60)
+    calls = []
+    cache.get_user(1, loader({'id': 1}, calls))
+    cache.get_user(2, loader({'id': 2}, calls))
+    cache.get_list({'page': 1}, loader([1, 2], calls))
+    version = cache.list_version()
+    cache.invalidate(2)
+    assert cache.list_version() == version + 1
+    calls.clear()
+    cache.get_user(1, loader({'id': 1}, calls))
+    cache.get_user(2, loader({'id': 2}, calls))
+    cache.get_list({'page': 1}, loader([1, 2], calls))
+    assert calls == [{'id': 2}, [1, 2]]
+
+
+def test_missing_user_is_not_cached():
+    cache = ReadCache(MemoryStore(), ttl=60)
+    calls = []
+    assert cache.get_user(9, loader(None, calls)) is None
+    assert cache.get_user(9, loader(None, calls)) is None
+    assert len(calls) == 2
+
+
+def test_list_params_are_part_of_key():
+    cache = ReadCache(MemoryStore(), ttl=60)
+    calls = []
+    assert cache.get_list({'page': 1}, loader('p1', calls)) == 'p1'
+    assert cache.get_list({'page': 2}, loader('p2', calls)) == 'p2'
+    assert cache.get_list({'page': 1}, loader('x', calls)) == 'p1'
+    assert calls == ['p1', 'p2']
+
+
+def test_disabled_cache_always_loads():
+    cache = ReadCache(MemoryStore(), ttl=0)
+    calls = []
+    cache.get_user(1, loader({'id': 1}, calls))
+    cache.get_user(1, loader({'id': 1}, calls))
+    assert len(calls) == 2
+
+
+def test_db_versions_memo_avoids_repeated_queries(clock):
+    db = FakePool()
+    versions = DbVersions(db, memo_ttl=1)
+    cache = ReadCache(MemoryStore(), ttl=60, versions=versions)
+    calls = []
+    for _ in range(5):
+        cache.get_user(1, loader({'id': 1}, calls))
+        cache.get_list({'page': 1}, loader([1], calls))
+    assert db.queries == 2
+    clock[0] += 1.5
+    cache.get_user(1, loader({'id': 1}, calls))
+    assert db.queries == 3
+    assert len(calls) == 2
+
+
+def test_db_versions_bump_is_immediate_in_same_worker(clock):
+    db = FakePool()
+    cache = ReadCache(MemoryStore(), ttl=60, versions=DbVersions(db, memo_ttl=1))
+    calls = []
+    cache.get_user(1, loader({'id': 1, 'name': 'a'}, calls))
+    cache.invalidate(1)
+    assert db.versions == {'user:1': 1, LIST_VERSION_KEY: 1}
+    assert cache.get_user(1, loader({'id': 1, 'name': 'b'}, calls))['name'] == 'b'
+
+
+def test_db_versions_other_worker_sees_bump_after_memo_ttl(clock):
+    db = FakePool()
+    worker_a = ReadCache(MemoryStore(), ttl=60, versions=DbVersions(db, memo_ttl=1))
+    worker_b = ReadCache(MemoryStore(), ttl=60, versions=DbVersions(db, memo_ttl=1))
+    calls = []
+    worker_a.get_user(1, loader({'name': 'a'}, calls))
+    worker_b.invalidate(1)
+    assert worker_a.get_user(1, loader({'name': 'b'}, calls))['name'] == 'a'
+    clock[0] += 1.5
+    assert worker_a.get_user(1, loader({'name': 'b'}, calls))['name'] == 'b'
+
+
+def test_db_versions_without_memo_query_every_time(clock):
+    db = FakePool()
+    versions = DbVersions(db, memo_ttl=0)
+    versions.get('user:1')
+    versions.get('user:1')
+    assert db.queries == 2
+
+
+def test_db_versions_read_error_is_a_miss(clock):
+    db = FakePool()
+    cache = ReadCache(MemoryStore(), ttl=60, versions=DbVersions(db, memo_ttl=1))
+    calls = []
+    cache.get_user(1, loader({'name': 'a'}, calls))
+    db.fail = True
+    clock[0] += 1.5
+    cache.get_user(1, loader({'name': 'a'}, calls))
+    assert len(calls) == 2
+    db.fail = False
+    assert DbVersions(db).get('user:1') == 0
+
+
+def test_db_versions_memo_is_bounded(clock):
+    versions = DbVersions(FakePool(), memo_ttl=1, max_entries=3)
+    for i in range(10):
+        versions.get(f"user:{i}")
+    assert len(versions._memo) <= 3
+
+
+def test_user_version_changes_only_for_that_user():
+    cache = ReadCache(MemoryStore(), ttl=0)
+    before = cache.user_version(1), cache.user_version(2)
+    cache.invalidate(1)
+    cache.invalidate(1)
+    assert (cache.user_version(1), cache.user_version(2)) == (before[0] + 2, before[1])
@@ -0,0 +1,133 @@
+import datetime
+
+import pytest
+
+from services.search_index import IndexUnavailable, InvertedIndex, SEARCH_FIELDS, _doc_tokens, _query_terms
+
+FIELDS = ['id'] + list(SEARCH_FIELDS)
+
+ROWS = [
+    {'id': 1, 'name': '张伟', 'phone': '13812345678', 'email': 'zhangwei@example.com', 'major': '计算机科学',
+     'city': '北京', 'country': '中国', 'bio': '分布式存储工程师'},
+    {'id': 2, 'name': 'Lucy Bernard', 'phone': '13900001111', 'email': 'lucy@sample.org', 'major': '经济学',
+     'city': 'London', 'country': 'UK', 'bio': 'Machine learning researcher'},
+    {'id': 3, 'name': '王伟', 'phone': None, 'email': None, 'major': '软件工程', 'city': '上海',
+     'country': '中国', 'bio': '存储系统'},
+]
+
+
+def like(keyword):
+    """LIKE '%kw%'（不区分大小写）的参照结果"""
+    kw = keyword.casefold()
+    return [r['id'] for r in ROWS if any(r[f] is not None and kw in str(r[f]).casefold() for f in SEARCH_FIELDS)]
+
+
+@pytest.fixture
+def index():
+    idx = InvertedIndex(FIELDS)
+    for row in ROWS:
+        idx.upsert(row)
+    idx.ready = True
+    return idx
+
+
+def ids(page):
+    return [item['id'] for item in page['items']]
+
+
+def test_tokens():
+    assert {'分布', '布式', '分', '布', '式'} <= _doc_tokens('分布式')
+    assert {'138', '381', '678'} <= _doc_tokens('13812345678')
+    assert _query_terms('分布式') == (['分布', '布式'], False)
+    assert _query_terms('伟') == (['伟'], False)
+    assert _query_terms('ai 存储') == (['存储'], True)
+
+
+@pytest.mark.parametrize('keyword', ['伟', '王伟', '存储', '1234', 'ample', 'BERN', 'machine learning', '不存在'])
+def test_matches_like_semantics(index, keyword):
+    assert ids(index.search(keyword, ['id', 'name'], limit=10)) == like(keyword)
+
+
+def test_short_alphanumeric_falls_back(index):
+    with pytest.raises(IndexUnavailable):
+        index.search('uk', ['id'])
+
+
+def test_cursor_pagination(index):
+    first = index.search('伟', ['id'], limit=1)
+    assert ids(first) == [1] and first['next_cursor'] == 1
+    second = index.search('伟', ['id'], limit=1, after=first['next_cursor'])
+    assert ids(second) == [3] and second['next_cursor'] is None
+
+
+def test_update_and_remove(index):
+    index.upsert(dict(ROWS[2], city='深圳'))
+    assert ids(index.search('上海', ['id'])) == []
+    assert ids(index.search('深圳', ['id'])) == [3]
+    index.remove(3)
+    assert ids(index.search('深圳', ['id'])) == []
+    assert index.stats()['docs'] == 2
+
+
+def test_not_ready_or_unknown_field():
+    idx = InvertedIndex(FIELDS)
+    with pytest.raises(IndexUnavailable):
+        idx.search('张伟', ['id'])
+    idx.ready = True
+    with pytest.raises(IndexUnavailable):
+        idx.search('张伟', ['id', 'age'])
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.args = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args):
+        self.args = args
+
+    def fetchall(self):
+        return [dict(r) for r in self.rows if r['_updated_at'] >= self.args[0]]
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.cursors = []
+        self.rows = rows
+
+    def cursor(self, *args):
+        self.cursors.append(FakeCursor(self.rows))
+        return self.cursors[-1]
+
+
+def test_poll_rereads_overlap_window(index):
+    t0 = datetime.datetime(2024, 7, 1, 8, 0, 0)
+    index.watermark = t0
+    late = dict(ROWS[2], city='深圳', _updated_at=t0 - datetime.timedelta(seconds=10))
+    conn = FakeConn([late])
+    assert index.poll(conn, interval=0) == 1
+    assert conn.cursors[0].args == (t0 - datetime.timedelta(seconds=30),)
+    assert ids(index.search('深圳', ['id'])) == [3]
+    assert index.watermark == t0
+    # 重复读到的记录不重复计数
+    assert index.poll(conn, interval=0) == 0
+
+
+def test_upsert_enforces_max_bytes():
+    idx = InvertedIndex(FIELDS, max_bytes=30000)
+    idx.ready = True
+    idx.upsert(ROWS[0])
+    assert idx.ready
+    for i in range(100, 200):
+        idx.upsert(dict(ROWS[1], id=i))
+    assert not idx.ready and '内存占用' in idx.disabled_reason
+    assert idx.stats()['docs'] == 0
+    assert idx.upsert(ROWS[0]) is False
+    with pytest.raises(IndexUnavailable):
+        idx.search('张伟', ['id'])
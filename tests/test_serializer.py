@@ -0,0 +1,59 @@
+import datetime
+import decimal
+import json
+import uuid
+
+import pytest
+from flask import Flask, jsonify
+
+from services import serializer
+
+BACKENDS = [serializer.JsonSerializer] + ([serializer.OrjsonSerializer] if serializer.orjson else [])
+
+ROW = {
+    'id': 7, 'name': '张伟', 'score': decimal.Decimal('1.50'), 'key': uuid.UUID(int=1),
+    'created_at': datetime.datetime(2024, 1, 2, 3, 4, 5), 'day': datetime.date(2024, 1, 2),
+    'aware': datetime.datetime(2024, 1, 2, 11, 4, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=8))),
+    'bio': None,
+}
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda cls: cls.name)
+def backend(request):
+    previous = serializer.get_serializer()
+    serializer.set_serializer(request.param())
+    yield serializer.get_serializer()
+    serializer.set_serializer(previous)
+
+
+def test_same_values_as_jsonify(backend):
+    app = Flask(__name__)
+    with app.app_context():
+        expected = json.loads(jsonify(ROW).get_data())
+    assert json.loads(backend.dumps(ROW)) == expected
+    assert '张伟'.encode('utf-8') in backend.dumps(ROW)
+
+
+def test_make_serializer():
+    assert serializer.make_serializer('json').name == 'json'
+    assert serializer.make_serializer(None).name == ('orjson' if serializer.orjson else 'json')
+    with pytest.raises(ValueError):
+        serializer.make_serializer('ujson')
+
+
+def test_envelope(backend):
+    assert json.loads(serializer.envelope({'a': 1}, '好', 201)) == {'code': 201, 'message': '好', 'data': {'a': 1}}
+
+
+@pytest.mark.parametrize('limit,total', [(3, 5), (5, 5), (5, 3), (2, 0)])
+def test_stream_matches_full_page(backend, limit, total):
+    rows = [dict(ROW, id=i) for i in range(1, total + 1)]
+    page = serializer.PageStream(iter(rows[:limit + 1]), limit)
+    chunks = list(serializer.iter_envelope(page, '获取列表成功', tail=lambda: {**page.tail(), 'total': total},
+                                           chunk_bytes=64))
+    has_more = total > limit
+    expected = {'items': rows[:limit], 'next_cursor': rows[limit - 1]['id'] if has_more else None,
+                'limit': limit, 'total': total}
+    assert b''.join(chunks) == serializer.envelope(expected, '获取列表成功')
+    if total > 1:
+        assert len(chunks) > 1
@@ -0,0 +1,170 @@
+import contextlib
+import datetime
+
+import pytest
+
+from services.sessions import AuthStats, RevocationIndex
+
+T0 = datetime.datetime(2024, 7, 1, 8, 0, 0)
+
+
+class FakeDb:
+    """auth_user 与 auth_session_revocation 两张表，now 为数据库时间"""
+    def __init__(self):
+        self.users = {}             # id -> (session_gen, is_active)
+        self.revocations = {}       # user_id -> (session_gen, is_active, updated_at)
+        self.now = T0
+        self.queries = []
+
+    def set_user(self, user_id, gen, active=True, updated_at=None):
+        self.users[user_id] = (gen, active)
+        self.revocations[user_id] = (gen, active, updated_at or self.now)
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield FakeConn(self)
+
+
+class FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args=None):
+        if 'NOW(3)' in sql:
+            self.result = [{'now': self.db.now}]
+        elif 'FROM auth_session_revocation' in sql:
+            self.db.queries.append('auth_session_revocation')
+            self.result = [{'user_id': uid, 'session_gen': gen, 'is_active': int(active)}
+                           for uid, (gen, active, ts) in self.db.revocations.items() if ts >= args[0]]
+        elif 'FROM auth_user' in sql:
+            self.db.queries.append('auth_user')
+            row = self.db.users.get(args[0])
+            self.result = [{'session_gen': row[0], 'is_active': int(row[1])}] if row else []
+        else:
+            raise AssertionError(sql)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+
+@pytest.fixture
+def db():
+    return FakeDb()
+
+
+def index_for(db):
+    idx = RevocationIndex(db, refresh_interval=0)
+    idx.refresh()
+    return idx
+
+
+def lookups(db):
+    return db.queries.count('auth_user')
+
+
+def test_unknown_user_triggers_lookup_once(db):
+    db.set_user(1, gen=3)
+    idx = index_for(db)
+    assert idx.is_valid({'id': 1, 'gen': 3})
+    assert idx.is_valid({'id': 1, 'gen': 3})
+    assert lookups(db) == 1
+    assert idx.stats()['lookups'] == 1 and idx.stats()['users'] == 1
+
+
+def test_missing_user_is_invalid(db):
+    idx = index_for(db)
+    assert not idx.is_valid({'id': 42, 'gen': 0})
+
+
+def test_revoked_generation_invalidates_session(db):
+    db.set_user(1, gen=3)
+    idx = index_for(db)
+    assert idx.is_valid({'id': 1, 'gen': 3})
+    # 另一个 worker 禁用了账户：session_gen +1 并写入吊销记录，下次刷新后生效
+    db.now += datetime.timedelta(seconds=2)
+    db.set_user(1, gen=4, active=False)
+    assert not idx.is_valid({'id': 1, 'gen': 3})
+    assert not idx.is_valid({'id': 1, 'gen': 4})
+    assert lookups(db) == 1
+
+
+def test_local_revoke_is_immediate(db):
+    db.set_user(1, gen=3)
+    idx = index_for(db)
+    idx.is_valid({'id': 1, 'gen': 3})
+    idx.revoke(1, active=True)
+    assert not idx.is_valid({'id': 1, 'gen': 3})
+    assert idx.is_valid({'id': 1, 'gen': 4})
+
+
+def test_stale_row_does_not_override_newer_generation(db):
+    db.set_user(1, gen=3)
+    idx = index_for(db)
+    idx.is_valid({'id': 1, 'gen': 3})
+    idx.revoke(1, active=True)
+    # 重叠窗口内仍能读到 gen=3 的旧记录
+    db.now += datetime.timedelta(seconds=2)
+    idx.refresh()
+    assert idx.is_valid({'id': 1, 'gen': 4})
+    assert not idx.is_valid({'id': 1, 'gen': 3})
+
+
+def test_refresh_rereads_overlap_window(db):
+    db.set_user(1, gen=3)
+    idx = index_for(db)
+    idx.is_valid({'id': 1, 'gen': 3})
+    # 事务在刷新之前取了 updated_at，刷新之后才提交
+    db.now += datetime.timedelta(seconds=5)
+    idx.refresh()
+    db.set_user(1, gen=4, active=False, updated_at=T0 + datetime.timedelta(seconds=4))
+    db.now += datetime.timedelta(seconds=5)
+    idx.refresh()
+    assert not idx.is_valid({'id': 1, 'gen': 3})
+
+
+def test_refresh_skips_users_not_seen(db):
+    idx = index_for(db)
+    db.now += datetime.timedelta(seconds=2)
+    db.set_user(7, gen=1)
+    idx.refresh()
+    assert idx.stats()['users'] == 0
+
+
+def test_refresh_error_keeps_serving(db, monkeypatch):
+    db.set_user(1, gen=3)
+    idx = index_for(db)
+    idx.is_valid({'id': 1, 'gen': 3})
+
+    def fail():
+        raise RuntimeError('db down')
+    monkeypatch.setattr(idx, 'refresh', fail)
+    assert idx.is_valid({'id': 1, 'gen': 3})
+    assert idx.stats()['refresh_errors'] == 1
+
+
+def test_auth_stats_snapshot():
+    stats = AuthStats(window=10)
+    for ms in (1, 2, 3, 4):
+        stats.record('login_check', ms / 1000)
+    stats.incr('logins')
+    snap = stats.snapshot()
+    assert snap['logins'] == 1
+    assert snap['login_check']['count'] == 4 and snap['login_check']['max_ms'] == 4.0
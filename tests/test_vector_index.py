@@ -0,0 +1,70 @@
+import datetime
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from services.vector_index import VectorIndex
+
+ROWS = [
+    {'id': 1, 'name': '张伟', 'major': '计算机科学', 'city': '北京', 'bio': '分布式存储工程师'},
+    {'id': 2, 'name': 'Lucy Bernard', 'major': '经济学', 'city': 'London', 'bio': 'Machine learning researcher'},
+]
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.args = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args):
+        self.args = args
+
+    def fetchall(self):
+        return [dict(r) for r in self.rows if r['_updated_at'] >= self.args[0]]
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursors = []
+
+    def cursor(self, *args):
+        self.cursors.append(FakeCursor(self.rows))
+        return self.cursors[-1]
+
+
+@pytest.fixture
+def index():
+    idx = VectorIndex(dim=64)
+    for row in ROWS:
+        idx.upsert(row)
+    idx.ready = True
+    idx.dirty = False
+    return idx
+
+
+def test_upsert_unchanged_row_is_a_no_op(index):
+    assert index.upsert(ROWS[0]) is False
+    assert not index.dirty
+    assert index.upsert(dict(ROWS[0], city='上海')) is True
+    assert index.dirty
+
+
+def test_poll_rereads_overlap_window(index):
+    t0 = datetime.datetime(2024, 7, 1, 8, 0, 0)
+    index.watermark = t0
+    late = dict(ROWS[1], bio='分布式存储', _updated_at=t0 - datetime.timedelta(seconds=10))
+    conn = FakeConn([late])
+    assert index.poll(conn, interval=0) == 1
+    assert conn.cursors[0].args == (t0 - datetime.timedelta(seconds=30),)
+    assert index.watermark == t0
+    index.dirty = False
+    assert index.poll(conn, interval=0) == 0
+    assert not index.dirty